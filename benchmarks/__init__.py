@@ -0,0 +1,19 @@
+"""Benchmarks for the textmate-grammar-python tokenization engine."""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+ROOT = Path(__file__).parents[1]
+
+
+def matlab_files() -> list[Path]:
+    """Returns the MATLAB source files available in the repository."""
+    files = sorted((ROOT / "syntaxes" / "matlab").glob("**/*.m"))
+    files += sorted((ROOT / "test" / "regression" / "matlab").glob("*.m"))
+    return files
+
+
+def markdown_files() -> list[Path]:
+    """Returns the Markdown source files available in the grammar submodule."""
+    return sorted((ROOT / "syntaxes" / "markdown").glob("**/*.md"))
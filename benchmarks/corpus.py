@@ -0,0 +1,176 @@
+"""Generates synthetic source files of a given number of lines for the benchmarks.
+
+The files are assembled from a fixed set of templates with a seeded random generator, such that
+every run of the benchmarks parses exactly the same content. Additionally, ``ADVERSARIAL`` contains
+generators of pathological inputs, such as unterminated blocks and very long lines, that are used
+to detect superlinear parse behavior.
+"""
+
+from __future__ import annotations
+
+import random
+from typing import Callable
+
+MATLAB_BLOCKS = [
+    """\
+% {name}  Computes the weighted sum of the input
+%   Longer help text of {name}.
+function [out, count] = {name}(x, weights)
+    arguments
+        x (1,:) double
+        weights (1,:) double = ones(size(x))
+    end
+    out = 0; count = 0;
+    for k = 1:numel(x)
+        if x(k) > {value} && ~isnan(x(k))
+            out = out + weights(k) * x(k)';
+            count = count + 1;
+        elseif x(k) < -{value}
+            warning("{name}:negative", 'Value %d is negative\\n', k);
+        else
+            continue
+        end
+    end
+end
+""",
+    """\
+function result = {name}(mode, data)
+    % Dispatches on the mode of the data
+    switch lower(mode)
+        case {{'sum', 'total'}}
+            result = sum(data(:));
+        case 'mean'
+            result = mean(data, 'all');
+        otherwise
+            error('{name}:mode', "Unknown mode %s", mode);
+    end
+    while result > {value}
+        result = result / 2;
+    end
+end
+""",
+    """\
+function s = {name}(varargin)
+    try
+        s = struct('name', "{name}", 'value', {value}, 'items', {{varargin{{:}}}});
+        s.values = [1, 2, 3; 4 5 6] .* {value}e-3;
+        f = @(t) t.^2 + pi*Inf - s.value;
+        s.result = f(s.values(end, 1:end-1));
+    catch err
+        disp(err.message)
+        s = [];
+    end
+end
+""",
+    """\
+%% Section {name}
+{name}_data = linspace(0, {value}, 100);  % sample points
+{name}_mask = {name}_data > 0.5 | {name}_data <= -1;
+{name}_text = ["first", "second"; 'third', 'fourth'];
+{name}_cell = {{1, 'two', [3 4 5], @sin}};
+if any({name}_mask) && numel({name}_cell) ~= 0
+    fprintf('%s: %d\\n', "{name}", sum({name}_mask));
+end
+{name}_total = sum({name}_data(1:2:end)) ...
+    + max({name}_data) ...
+    - min({name}_data);
+""",
+    """\
+%{{
+Block comment for {name}
+with {value} lines of explanation.
+%}}
+global {name}_state
+persistent {name}_count
+parfor idx = 1:{value}
+    {name}_state(idx) = idx ^ 2;
+end
+""",
+]
+
+MARKDOWN_BLOCKS = [
+    """\
+# {name}
+
+Some *emphasized* and **strong** text with `inline code` and a [link](https://example.com/{name}).
+A second line of the paragraph with {value} words.
+
+""",
+    """\
+## List of {name}
+
+- first item
+- second item with _emphasis_
+  - nested item {value}
+1. ordered item
+2. another ordered item
+
+""",
+    """\
+```python
+def {name}(x):
+    return x * {value}
+```
+
+> A quote about {name}
+> spanning two lines.
+
+""",
+    """\
+| column | value |
+| ------ | ----- |
+| {name} | {value} |
+
+---
+
+""",
+]
+
+TEMPLATES: dict[str, list[str]] = {"matlab": MATLAB_BLOCKS, "markdown": MARKDOWN_BLOCKS}
+
+
+def generate(language: str, lines: int, seed: int = 0) -> str:
+    """Generates a synthetic source file of a language.
+
+    :param language: The language of the file, either "matlab" or "markdown".
+    :param lines: The (minimal) number of lines of the file.
+    :param seed: The seed of the random generator. Defaults to 0.
+    :return: The content of the file.
+    """
+    blocks = TEMPLATES[language]
+    rng = random.Random(seed)
+    parts: list[str] = []
+    count = 0
+    index = 0
+    while count < lines:
+        block = rng.choice(blocks).format(name=f"item{index}", value=rng.randint(1, 1000))
+        parts.append(block)
+        count += block.count("\n")
+        index += 1
+    return "".join(parts)
+
+
+# Pathological inputs, each generated from a size that is expected to scale the parse time linearly
+ADVERSARIAL: dict[str, dict[str, Callable[[int], str]]] = {
+    "matlab": {
+        "unterminated-comment": lambda size: "%{\n" + "x = 1;\n" * size,
+        "unterminated-function": lambda size: "function f\n" + "x = 1;\n" * size,
+        "unterminated-if": lambda size: "if a\n" + "x = 1;\n" * size,
+        "unterminated-nested-if": lambda size: "if a\n" * size,
+        "unterminated-strings": lambda size: "s = 'abc\n" * size,
+        "unterminated-bracket": lambda size: "x = [1\n" + "2 3\n" * size,
+        "unterminated-brackets-retried": lambda size: "function f\n" + "x = 1; $ y = [\n" * size,
+        "blank-lines": lambda size: "a = 1;\n\n" * size,
+        "long-line-numbers": lambda size: "x = [" + "1.5 " * size + "];\n",
+        "long-line-strings": lambda size: "x = " + "'a' + " * size + "1;\n",
+        "long-line-comment": lambda size: "% " + "a " * size + "\n",
+    },
+    "markdown": {
+        "unterminated-fence": lambda size: "```\n" + "code\n" * size,
+        "unterminated-html-comment": lambda size: "<!--\n" + "text\n" * size,
+        "nested-quotes": lambda size: "".join("> " * level + "a\n" for level in range(size)),
+        "blank-lines": lambda size: "a\n\n" * size,
+        "long-line-emphasis": lambda size: "*a " * size + "\n",
+        "long-line-links": lambda size: "[a](b) " * size + "\n",
+    },
+}
@@ -0,0 +1,58 @@
+"""Counts the number of regex searches per line with and without keyword merging.
+
+Run with ``python -m benchmarks.regex_calls [files...]``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+from pathlib import Path
+
+from textmate_grammar.handler import ContentHandler
+from textmate_grammar.parsers.matlab import MatlabParser
+
+from . import matlab_files
+
+
+def count_searches(parser: MatlabParser, files: list[Path]) -> tuple[int, int]:
+    """Parses the files and returns the number of regex searches and the number of lines."""
+    searches = 0
+    search = ContentHandler.search
+
+    def counting_search(self, *args, **kwargs):
+        nonlocal searches
+        searches += 1
+        return search(self, *args, **kwargs)
+
+    lines = 0
+    ContentHandler.search = counting_search  # type: ignore
+    try:
+        for file in files:
+            content = file.read_text()
+            lines += content.count("\n") + 1
+            parser.parse_string(content)
+    finally:
+        ContentHandler.search = search  # type: ignore
+    return searches, lines
+
+
+def main() -> None:
+    argparser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    argparser.add_argument("files", nargs="*", type=Path, help="MATLAB files to parse")
+    args = argparser.parse_args()
+    files = args.files or matlab_files()
+
+    logging.getLogger("textmate_grammar").setLevel(logging.CRITICAL)
+
+    baseline, lines = count_searches(MatlabParser(merge_keywords=False), files)
+    merged, _ = count_searches(MatlabParser(merge_keywords=True), files)
+
+    print(f"files: {len(files)}, lines: {lines}")
+    print(f"regex searches per line without keyword merging: {baseline / lines:.2f}")
+    print(f"regex searches per line with keyword merging:    {merged / lines:.2f}")
+    print(f"removed per line: {(baseline - merged) / lines:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""Detects superlinear parse behavior on pathological inputs.
+
+For every adversarial input of ``benchmarks.corpus``, the input is generated at a series of doubling
+sizes and parsed with ``parse_string``. The growth exponent of the parse time is fitted as the slope
+of log(time) against log(size), which is 1 for linear and 2 for quadratic scaling. The harness exits
+with a non-zero status if any input scales worse than the threshold exponent.
+
+Inputs that are only linear with a recovery option of the language parser, such as a line budget for
+blocks without end, are parsed with the options of ``RECOVERY_OPTIONS``, such that the harness checks
+that these options bound the parse time.
+
+Run with ``python -m benchmarks.scaling [--languages matlab] [--cases blank-lines] [--threshold 1.3]``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import logging
+import math
+import sys
+from typing import Any, Callable
+
+from .corpus import ADVERSARIAL
+from .suite import LANGUAGES, best_of, create_parser
+
+# The sizes at which each input is generated, as multiples of the base size of the input
+FACTORS = (1, 2, 4, 8)
+BASE_SIZE = 100
+# Inputs that are parsed per character instead of per line are generated at a larger base size
+LONG_LINE_BASE_SIZE = 250
+
+# The options of the language parser with which an input is parsed, per language and input
+RECOVERY_OPTIONS: dict[str, dict[str, dict[str, Any]]] = {
+    "matlab": {
+        "unterminated-nested-if": {"block_line_budget": 20},
+        "unterminated-brackets-retried": {"block_line_budget": 20},
+        "long-line-numbers": {"max_line_length": 1000},
+        "long-line-strings": {"line_time_limit": 0.01},
+    },
+}
+
+
+def fit_exponent(sizes: list[int], times: list[float]) -> float:
+    """
+    Fits the growth exponent of the times as a function of the sizes.
+
+    :param sizes: The sizes of the inputs.
+    :param times: The parse times of the inputs.
+    :return: The least-squares slope of log(time) against log(size).
+    """
+    xs = [math.log(size) for size in sizes]
+    ys = [math.log(max(time, 1e-9)) for time in times]
+    x_mean = sum(xs) / len(xs)
+    y_mean = sum(ys) / len(ys)
+    covariance = sum((x - x_mean) * (y - y_mean) for x, y in zip(xs, ys))
+    variance = sum((x - x_mean) ** 2 for x in xs)
+    return covariance / variance
+
+
+def measure(
+    parser: Any, generate: Callable[[int], str], sizes: list[int], repeat: int
+) -> dict[str, Any]:
+    """
+    Measures the growth of the parse time of an input.
+
+    :param parser: The language parser.
+    :param generate: The generator of the input for a size.
+    :param sizes: The sizes at which to generate the input.
+    :param repeat: The number of runs per size, of which the fastest is used.
+    :return: The sizes, the parse times in seconds and the fitted exponent.
+    """
+    times = []
+    # As in timeit, the garbage collector is disabled while timing, as its collections at arbitrary
+    # sizes distort the fitted exponent
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for size in sizes:
+            content = generate(size)
+            time, _ = best_of(lambda: parser.parse_string(content), repeat)
+            times.append(time)
+            gc.collect()
+    finally:
+        if enabled:
+            gc.enable()
+    return {"sizes": sizes, "times": times, "exponent": fit_exponent(sizes, times)}
+
+
+def run(
+    languages: list[str], cases: list[str] | None = None, scale: int = 1, repeat: int = 3
+) -> dict[str, Any]:
+    """
+    Runs the scaling harness.
+
+    :param languages: The languages of which to parse the adversarial inputs.
+    :param cases: The names of the inputs to parse. Defaults to None, for all inputs.
+    :param scale: The multiplier of the base sizes of the inputs. Defaults to 1.
+    :param repeat: The number of runs per size. Defaults to 3.
+    :return: The measurements per language and input, or the error if the parser is unavailable.
+    """
+    results: dict[str, Any] = {}
+    for language in languages:
+        try:
+            parser = create_parser(language)
+        except Exception as err:
+            message = str(err).splitlines()[0] if str(err) else ""
+            results[language] = {"error": f"{err.__class__.__name__}: {message}"}
+            continue
+
+        results[language] = {}
+        for name, generate in ADVERSARIAL[language].items():
+            if cases and name not in cases:
+                continue
+            base = LONG_LINE_BASE_SIZE if name.startswith("long-line") else BASE_SIZE
+            sizes = [base * scale * factor for factor in FACTORS]
+            options = RECOVERY_OPTIONS.get(language, {}).get(name, {})
+            case_parser = create_parser(language, **options) if options else parser
+            results[language][name] = measure(case_parser, generate, sizes, repeat)
+            results[language][name]["options"] = options
+    return results
+
+
+def superlinear(results: dict[str, Any], threshold: float) -> list[str]:
+    """Returns the inputs of which the fitted exponent exceeds the threshold."""
+    return [
+        f"{language} {name}"
+        for language, measured in results.items()
+        if "error" not in measured
+        for name, result in measured.items()
+        if result["exponent"] > threshold
+    ]
+
+
+def format_results(results: dict[str, Any], threshold: float) -> str:
+    """Formats the results as a table, marking the inputs that scale worse than the threshold."""
+    rows = []
+    for language, measured in results.items():
+        if "error" in measured:
+            rows.append(f"{language}: parser unavailable, {measured['error']}")
+            continue
+        rows.append(f"{language}:")
+        rows.append(f"  {'input':<28} {'sizes':>16} {'largest':>9} {'exponent':>9}")
+        for name, result in measured.items():
+            sizes = f"{result['sizes'][0]}-{result['sizes'][-1]}"
+            mark = "  superlinear" if result["exponent"] > threshold else ""
+            options = ", ".join(f"{key}={value}" for key, value in result["options"].items())
+            rows.append(
+                f"  {name:<28} {sizes:>16} {result['times'][-1]:8.3f}s "
+                f"{result['exponent']:9.2f}{mark}" + (f"  ({options})" if options else "")
+            )
+    return "\n".join(rows)
+
+
+def main() -> None:
+    argparser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    argparser.add_argument(
+        "--languages", nargs="+", choices=list(LANGUAGES), default=list(LANGUAGES)
+    )
+    argparser.add_argument("--cases", nargs="+", help="names of the adversarial inputs")
+    argparser.add_argument("--scale", type=int, default=1, help="multiplier of the input sizes")
+    argparser.add_argument("--repeat", type=int, default=3, help="runs per size")
+    argparser.add_argument(
+        "--threshold", type=float, default=1.3, help="maximal accepted growth exponent"
+    )
+    args = argparser.parse_args()
+
+    logging.getLogger("textmate_grammar").setLevel(logging.CRITICAL)
+
+    results = run(args.languages, args.cases, scale=args.scale, repeat=args.repeat)
+    print(format_results(results, args.threshold))
+
+    failures = superlinear(results, args.threshold)
+    if failures:
+        print(f"\nsuperlinear inputs (exponent > {args.threshold}): {len(failures)}")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+"""Measures the throughput of the tokenization engine on real and synthetic source files.
+
+For every language, the suite times the construction of the parser and, for the files in the
+repository and synthetic files of each size, ``parse_string``, ``parse_file`` without and with a
+cached result, ``flatten``, ``findall`` and ``to_dict``. The peak memory of ``parse_string`` is
+measured in a separate run with tracemalloc, such that the timings are not affected by it.
+
+Run with ``python -m benchmarks.suite [--sizes 1000 10000] [--baseline FILE] [--save FILE]``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import importlib
+import json
+import logging
+import platform
+import tempfile
+import tracemalloc
+from functools import partial
+from pathlib import Path
+from time import perf_counter
+from typing import Any, Callable
+
+from textmate_grammar.utils.cache import SimpleCache
+
+from . import ROOT, markdown_files, matlab_files
+from .corpus import generate
+
+LANGUAGES: dict[str, tuple[str, str, Callable[[], list[Path]], str]] = {
+    "matlab": ("textmate_grammar.parsers.matlab", "MatlabParser", matlab_files, ".m"),
+    "markdown": ("textmate_grammar.parsers.markdown", "MarkdownParser", markdown_files, ".md"),
+}
+SIZES = (1_000, 10_000, 100_000)
+BASELINE = ROOT / "benchmarks" / "baseline.json"
+
+# Operations whose throughput is reported in lines per second
+PARSE_OPERATIONS = ("parse_string", "parse_file_cold")
+
+
+def best_of(function: Callable[[], Any], repeat: int) -> tuple[float, Any]:
+    """Calls a function a number of times and returns the fastest time and the last result."""
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = perf_counter()
+        result = function()
+        best = min(best, perf_counter() - start)
+    return best, result
+
+
+def peak_memory(function: Callable[[], Any]) -> int:
+    """Returns the peak memory in bytes that is allocated during a function call."""
+    tracemalloc.start()
+    try:
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def create_parser(language: str, **options: Any) -> Any:
+    """Imports and constructs the parser of a language, with the options of the language parser."""
+    module, name, _, _ = LANGUAGES[language]
+    return getattr(importlib.import_module(module), name)(**options)
+
+
+def benchmark_content(
+    parser: Any, content: str, suffix: str, repeat: int, memory: bool = True
+) -> dict[str, Any]:
+    """
+    Benchmarks the operations of a parser on a single source.
+
+    :param parser: The language parser.
+    :param content: The content of the source.
+    :param suffix: The file extension of the language.
+    :param repeat: The number of runs per operation, of which the fastest is reported.
+    :param memory: Whether to measure the peak memory of parsing. Defaults to True.
+    :return: The results, with the times in seconds and the peak memory in bytes.
+    """
+    lines = content.count("\n") + 1
+    times: dict[str, float] = {}
+
+    times["parse_string"], element = best_of(lambda: parser.parse_string(content), repeat)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / f"source{suffix}"
+        path.write_text(content)
+
+        def parse_file_cold():
+            parser._cache = SimpleCache()
+            return parser.parse_file(path)
+
+        times["parse_file_cold"], _ = best_of(parse_file_cold, repeat)
+        times["parse_file_cached"], _ = best_of(lambda: parser.parse_file(path), repeat)
+
+    if element is not None:
+        times["flatten"], _ = best_of(element.flatten, repeat)
+        times["findall"], _ = best_of(lambda: element.findall("*"), repeat)
+        times["to_dict"], _ = best_of(element.to_dict, repeat)
+
+    result: dict[str, Any] = {"lines": lines, "times": times}
+    result["lines_per_second"] = {
+        operation: lines / times[operation] for operation in PARSE_OPERATIONS if times[operation]
+    }
+    if memory:
+        result["peak_memory"] = peak_memory(lambda: parser.parse_string(content))
+    return result
+
+
+def run(
+    languages: list[str], sizes: list[int], repeat: int = 3, memory: bool = True
+) -> dict[str, Any]:
+    """
+    Runs the benchmark suite.
+
+    Languages of which the parser cannot be constructed are reported with the error, without
+    interrupting the other benchmarks.
+
+    :param languages: The languages to benchmark.
+    :param sizes: The numbers of lines of the synthetic files.
+    :param repeat: The number of runs per operation. Defaults to 3.
+    :param memory: Whether to measure the peak memory of parsing. Defaults to True.
+    :return: The results of the suite.
+    """
+    results: dict[str, Any] = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "languages": {},
+    }
+    for language in languages:
+        _, _, find_files, suffix = LANGUAGES[language]
+        try:
+            startup, parser = best_of(partial(create_parser, language), repeat)
+        except Exception as err:
+            message = str(err).splitlines()[0] if str(err) else ""
+            results["languages"][language] = {"error": f"{err.__class__.__name__}: {message}"}
+            continue
+
+        sources: dict[str, Any] = {}
+        files = find_files()
+        if files:
+            content = "\n".join(file.read_text() for file in files)
+            sources["repository"] = benchmark_content(parser, content, suffix, repeat, memory)
+            sources["repository"]["files"] = len(files)
+        for size in sizes:
+            # The largest files are only parsed once, as a single run already takes minutes
+            runs = repeat if size < 100_000 else 1
+            content = generate(language, size)
+            sources[f"synthetic-{size}"] = benchmark_content(parser, content, suffix, runs, memory)
+        results["languages"][language] = {"startup": startup, "sources": sources}
+    return results
+
+
+def compare(results: dict[str, Any], baseline: dict[str, Any], threshold: float) -> list[str]:
+    """
+    Compares the results against a baseline.
+
+    :param results: The results of the suite.
+    :param baseline: The results of an earlier run.
+    :param threshold: The relative slowdown above which an operation is reported as a regression.
+    :return: The regressed operations.
+    """
+    regressions = []
+    for language, current in results["languages"].items():
+        reference = baseline.get("languages", {}).get(language, {})
+        if "error" in current or "error" in reference or not reference:
+            continue
+        pairs = [("startup", current["startup"], reference["startup"])]
+        for source, measured in current["sources"].items():
+            if source not in reference["sources"]:
+                continue
+            for operation, time in measured["times"].items():
+                reference_time = reference["sources"][source]["times"].get(operation)
+                if reference_time:
+                    pairs.append((f"{source} {operation}", time, reference_time))
+        for name, time, reference_time in pairs:
+            ratio = time / reference_time
+            if ratio > 1 + threshold:
+                regressions.append(f"{language} {name}: {ratio:.2f}x slower than the baseline")
+    return regressions
+
+
+def format_results(results: dict[str, Any], baseline: dict[str, Any] | None = None) -> str:
+    """Formats the results as a table, with the relative time against the baseline if given."""
+    rows = []
+    for language, result in results["languages"].items():
+        if "error" in result:
+            rows.append(f"{language}: parser unavailable, {result['error']}")
+            continue
+        reference = (baseline or {}).get("languages", {}).get(language, {})
+        rows.append(f"{language}: startup {result['startup']:.4f}s")
+        rows.append(
+            f"  {'source':<20} {'operation':<18} {'lines':>7} {'time':>9} {'lines/s':>9} "
+            f"{'vs base':>8}"
+        )
+        for source, measured in result["sources"].items():
+            reference_times = reference.get("sources", {}).get(source, {}).get("times", {})
+            for operation, time in measured["times"].items():
+                rate = measured["lines_per_second"].get(operation)
+                ratio = (
+                    time / reference_times[operation] if reference_times.get(operation) else None
+                )
+                rows.append(
+                    f"  {source:<20} {operation:<18} {measured['lines']:7d} {time:9.4f} "
+                    f"{f'{rate:.0f}' if rate else '':>9} {f'{ratio:.2f}x' if ratio else '':>8}"
+                )
+            if "peak_memory" in measured:
+                rows.append(
+                    f"  {source:<20} {'peak memory':<18} {measured['lines']:7d} "
+                    f"{measured['peak_memory'] / 2**20:8.1f}M"
+                )
+    return "\n".join(rows)
+
+
+def main() -> None:
+    argparser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    argparser.add_argument(
+        "--languages", nargs="+", choices=list(LANGUAGES), default=list(LANGUAGES)
+    )
+    argparser.add_argument(
+        "--sizes", nargs="*", type=int, default=list(SIZES), help="lines of the synthetic files"
+    )
+    argparser.add_argument("--repeat", type=int, default=3, help="runs per operation")
+    argparser.add_argument("--no-memory", action="store_true", help="skip the memory runs")
+    argparser.add_argument("--baseline", type=Path, default=BASELINE, help="baseline JSON file")
+    argparser.add_argument("--save", type=Path, help="save the results as a JSON file")
+    argparser.add_argument(
+        "--threshold", type=float, default=0.2, help="relative slowdown reported as regression"
+    )
+    args = argparser.parse_args()
+
+    logging.getLogger("textmate_grammar").setLevel(logging.CRITICAL)
+
+    results = run(args.languages, args.sizes, repeat=args.repeat, memory=not args.no_memory)
+
+    baseline = None
+    if args.baseline.exists():
+        baseline = json.loads(args.baseline.read_text())
+    print(format_results(results, baseline))
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.threshold)
+        print(f"\nregressions against {args.baseline.name}: {len(regressions)}")
+        for regression in regressions:
+            print(f"  {regression}")
+
+    if args.save:
+        args.save.write_text(json.dumps(results, indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main()
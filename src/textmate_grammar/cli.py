@@ -0,0 +1,250 @@
+from __future__ import annotations
+
+import argparse
+import glob
+import json
+import logging
+import struct
+import sys
+from array import array
+from pathlib import Path
+from time import perf_counter
+from typing import IO, Any, Iterable
+
+from .daemon import compact_tokens
+from .elements import ContentElement
+from .parsers import LANGUAGES, load_parser
+from .parsers.base import LanguageParser
+from .utils.cache import TextmateCache, init_cache
+from .utils.exceptions import IncompatibleFileType
+from .utils.keys import CacheKeys, ContentKeys, GitKeys
+
+FORMATS = ("jsonl", "dict", "binary")
+CACHES = ("none", "simple", "shelve")
+KEYS = ("mtime", "content", "git")
+
+# The number of slowest files reported by --stats
+SLOWEST = 5
+
+
+class _CountingCache(TextmateCache):
+    """A cache that counts the elements that are loaded from another cache."""
+
+    def __init__(self, cache: TextmateCache) -> None:
+        self.cache = cache
+        self.hits = 0
+
+    def cache_valid(self, filepath: Path) -> bool:
+        return self.cache.cache_valid(filepath)
+
+    def load(self, filepath: Path) -> ContentElement:
+        self.hits += 1
+        return self.cache.load(filepath)
+
+    def save(self, filePath: Path, element: ContentElement) -> None:
+        self.cache.save(filePath, element)
+
+    def load_previous(self, filepath: Path) -> ContentElement | None:
+        return self.cache.load_previous(filepath)
+
+
+def collect_paths(patterns: Iterable[str], file_types: list[str]) -> list[Path]:
+    """
+    Collects the files to tokenize from paths of files and directories, and glob patterns.
+
+    Directories are searched recursively. Files in directories and of glob patterns are only collected
+    if their file type is supported by the language.
+
+    :param patterns: The paths and glob patterns.
+    :param file_types: The file types of the language.
+    :return: The resolved paths, without duplicates, in the order in which they are found.
+    :raises IncompatibleFileType: If an explicitly given file has an unsupported file type.
+    :raises FileNotFoundError: If a path does not exist, or a glob pattern matches no supported files.
+    """
+    paths: dict[Path, None] = {}
+    for pattern in patterns:
+        path = Path(pattern)
+        if path.is_dir():
+            found = sorted(path.rglob("*"))
+        elif glob.has_magic(pattern):  # type: ignore
+            found = sorted(Path(match) for match in glob.glob(pattern, recursive=True))
+        elif path.is_file():
+            if path.suffix.split(".")[-1] not in file_types:
+                raise IncompatibleFileType(extensions=file_types)
+            found = [path]
+        else:
+            raise FileNotFoundError(f"No such file, directory or matches: {pattern}")
+        supported = [
+            match
+            for match in found
+            if match.is_file() and match.suffix.split(".")[-1] in file_types
+        ]
+        if not supported and not path.is_dir():
+            raise FileNotFoundError(f"No such file, directory or matches: {pattern}")
+        for match in supported:
+            paths[match.resolve()] = None
+    return list(paths)
+
+
+def write_binary(stream: IO[bytes], path: Path, element: ContentElement | None) -> None:
+    """
+    Writes the compact tokens of a file as a binary record.
+
+    A record is a little-endian unsigned 32-bit length and a JSON header with the path and the scopes
+    table, followed by an unsigned 32-bit token count and four signed 32-bit integers per token: the
+    line, column, length and index in the scopes table.
+
+    :param stream: The binary output stream.
+    :param path: The path of the file.
+    :param element: The parsed element of the file.
+    """
+    tokens = compact_tokens(element) if element is not None else {"scopes": [], "tokens": []}
+    header = json.dumps({"path": str(path), "scopes": tokens["scopes"]}).encode()
+    values = array("i", [value for token in tokens["tokens"] for value in token])
+    if sys.byteorder == "big":
+        values.byteswap()
+    stream.write(struct.pack("<I", len(header)))
+    stream.write(header)
+    stream.write(struct.pack("<I", len(tokens["tokens"])))
+    stream.write(values.tobytes())
+
+
+def write_element(
+    stream: IO[bytes], path: Path, element: ContentElement | None, format: str
+) -> None:
+    """Writes the tokens of a file in the output format, one of ``FORMATS``."""
+    if format == "binary":
+        write_binary(stream, path, element)
+        return
+    record: dict[str, Any] = {"path": str(path)}
+    if format == "jsonl":
+        record["tokens"] = element.flatten() if element is not None else []
+    else:
+        record["element"] = element.to_dict() if element is not None else None
+    stream.write(json.dumps(record).encode() + b"\n")
+
+
+def tokenize(
+    parser: LanguageParser,
+    paths: list[Path],
+    stream: IO[bytes],
+    format: str = "jsonl",
+    jobs: int = 1,
+) -> dict[str, Any]:
+    """
+    Tokenizes files and writes the tokens to a stream.
+
+    :param parser: The language parser.
+    :param paths: The paths of the files.
+    :param stream: The binary output stream.
+    :param format: The output format, one of ``FORMATS``. Defaults to "jsonl".
+    :param jobs: The number of worker processes. Defaults to 1.
+    :return: The throughput statistics.
+    """
+    cache = _CountingCache(parser._cache)
+    parser._cache = cache
+    timings: dict[Path, float] = {}
+    lines = 0
+    started = perf_counter()
+    try:
+        for path, element in parser.parse_files(paths, workers=jobs, timings=timings):
+            if element is not None and element.characters:
+                lines += next(reversed(element.characters))[0] + 1
+            write_element(stream, path, element, format)
+    finally:
+        parser._cache = cache.cache
+    elapsed = perf_counter() - started
+
+    slowest = sorted(timings.items(), key=lambda item: item[1], reverse=True)[:SLOWEST]
+    return {
+        "files": len(paths),
+        "lines": lines,
+        "seconds": elapsed,
+        "files_per_second": len(paths) / elapsed if elapsed else None,
+        "lines_per_second": lines / elapsed if elapsed else None,
+        "cache_hits": cache.hits,
+        "cache_hit_rate": cache.hits / len(paths) if paths else None,
+        "slowest": [(str(path), seconds) for path, seconds in slowest],
+    }
+
+
+def format_stats(stats: dict[str, Any]) -> str:
+    """Formats the throughput statistics as a summary."""
+    summary = [
+        f"files: {stats['files']} in {stats['seconds']:.3f}s "
+        f"({stats['files_per_second'] or 0:.1f} files/s)",
+        f"lines: {stats['lines']} ({stats['lines_per_second'] or 0:.1f} lines/s)",
+        f"cache hit rate: {100 * (stats['cache_hit_rate'] or 0):.1f}% "
+        f"({stats['cache_hits']}/{stats['files']})",
+    ]
+    if stats["slowest"]:
+        summary.append("slowest files:")
+        summary.extend(f"  {seconds:8.3f}s  {path}" for path, seconds in stats["slowest"])
+    return "\n".join(summary)
+
+
+def main(argv: list[str] | None = None) -> int:
+    argparser = argparse.ArgumentParser(
+        prog="textmate-grammar",
+        description="Tokenize files, directories or glob patterns with a language grammar.",
+    )
+    argparser.add_argument("paths", nargs="+", help="files, directories or glob patterns")
+    argparser.add_argument(
+        "-l", "--language", choices=list(LANGUAGES), default="matlab", help="language of the files"
+    )
+    argparser.add_argument(
+        "-j", "--jobs", type=int, default=1, help="number of worker processes (default: 1)"
+    )
+    argparser.add_argument(
+        "-c", "--cache", choices=CACHES, default="none", help="cache backend (default: none)"
+    )
+    argparser.add_argument(
+        "-k",
+        "--cache-keys",
+        choices=KEYS,
+        default="mtime",
+        help="validate cache entries by path and modification time, by content hash, or by git blob ID "
+        "from the index of the working tree of the current directory (default: mtime)",
+    )
+    argparser.add_argument(
+        "-f",
+        "--format",
+        choices=FORMATS,
+        default="jsonl",
+        help="output format: JSON lines of flattened tokens, JSON lines of element dictionaries, "
+        "or compact binary records (default: jsonl)",
+    )
+    argparser.add_argument("-o", "--output", help="output file, instead of stdout")
+    argparser.add_argument(
+        "--stats", action="store_true", help="report the throughput and slowest files on stderr"
+    )
+    args = argparser.parse_args(argv)
+
+    logging.getLogger("textmate_grammar").setLevel(logging.ERROR)
+
+    parser = load_parser(args.language)
+    keys: CacheKeys | None = None
+    if args.cache_keys == "content":
+        keys = ContentKeys()
+    elif args.cache_keys == "git":
+        keys = GitKeys()
+    parser._cache = init_cache(args.cache, keys)
+    try:
+        paths = collect_paths(args.paths, parser.file_types)
+    except (IncompatibleFileType, FileNotFoundError) as err:
+        argparser.error(str(err))
+
+    if args.output:
+        with open(args.output, "wb") as stream:
+            stats = tokenize(parser, paths, stream, args.format, args.jobs)
+    else:
+        stats = tokenize(parser, paths, sys.stdout.buffer, args.format, args.jobs)
+        sys.stdout.buffer.flush()
+
+    if args.stats:
+        print(format_stats(stats), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
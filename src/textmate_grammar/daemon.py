@@ -0,0 +1,351 @@
+from __future__ import annotations
+
+import argparse
+import hashlib
+import inspect
+import io
+import json
+import logging
+import socketserver
+import sys
+import threading
+from collections import Counter, OrderedDict, defaultdict, deque
+from pathlib import Path
+from time import monotonic, perf_counter
+from typing import IO, Any, Callable, Sized
+
+from .elements import ContentElement
+from .parsers import LANGUAGES, load_parser
+from .parsers.base import LanguageParser
+
+# JSON-RPC error codes
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+SERVER_ERROR = -32000
+
+FORMATS = ("flatten", "compact", "dict")
+
+
+class RequestError(Exception):
+    """Exception raised when a request cannot be handled, with its JSON-RPC error code."""
+
+    def __init__(self, code: int, message: str) -> None:
+        """
+        Initialize the exception.
+
+        :param code: The JSON-RPC error code.
+        :param message: The error message.
+        """
+        super().__init__(message)
+        self.code = code
+
+
+def compact_tokens(element: ContentElement) -> dict[str, list]:
+    """
+    Converts an element to compact tokens.
+
+    Each token is a list of its line, column, length and the index of its scopes in the scopes table.
+
+    :param element: The parsed element.
+    :return: The scopes table and the tokens.
+    """
+    scopes: dict[tuple[str, ...], int] = {}
+    tokens = []
+    for (line, column), content, keys in element.flatten():
+        index = scopes.setdefault(tuple(keys), len(scopes))
+        tokens.append([line, column, len(content), index])
+    return {"scopes": [list(keys) for keys in scopes], "tokens": tokens}
+
+
+def format_element(element: ContentElement | None, format: str) -> Any:
+    """Converts an element to the output format, one of ``FORMATS``."""
+    if element is None:
+        return None
+    if format == "flatten":
+        return element.flatten()
+    if format == "compact":
+        return compact_tokens(element)
+    return element.to_dict()
+
+
+def percentiles(values: list[float]) -> dict[str, float]:
+    """Returns the median, 90th and 99th percentile and maximum of the values, in milliseconds."""
+    if not values:
+        return {}
+    ordered = sorted(values)
+
+    def rank(fraction: float) -> float:
+        return 1000 * ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    return {"p50": rank(0.5), "p90": rank(0.9), "p99": rank(0.99), "max": 1000 * ordered[-1]}
+
+
+class Daemon:
+    """A long-running tokenization server, which keeps the language parsers and caches in memory.
+
+    Requests and responses are JSON-RPC 2.0 messages, one per line, over stdio or a Unix domain socket.
+    The methods are ``parse``, ``stats`` and ``shutdown``. Files are cached by the caches of the language
+    parsers, and contents by their hash in a cache of the most recently parsed contents.
+    """
+
+    def __init__(self, content_cache_size: int = 256, latency_window: int = 10_000) -> None:
+        """
+        Initialize a new instance of the Daemon class.
+
+        :param content_cache_size: The number of parsed contents to keep in memory. Defaults to 256.
+        :param latency_window: The number of most recent requests per method of which the latencies are
+            reported. Defaults to 10 000.
+        """
+        self.parsers: dict[str, LanguageParser] = {}
+        self.content_cache_size = content_cache_size
+        self.running = True
+        self._contents: OrderedDict[tuple[str, str], ContentElement | None] = OrderedDict()
+        self._latencies: dict[str, deque[float]] = defaultdict(lambda: deque(maxlen=latency_window))
+        self._counters: Counter[str] = Counter()
+        self._started = monotonic()
+        self._lock = threading.Lock()
+        self._parser_locks: dict[str, threading.Lock] = {}
+        self._server: socketserver.BaseServer | None = None
+        self.methods: dict[str, Callable[..., Any]] = {
+            "parse": self.parse,
+            "stats": self.stats,
+            "shutdown": self.shutdown,
+        }
+
+    def parser(self, language: str) -> LanguageParser:
+        """Returns the language parser of a language, which is constructed on first use."""
+        with self._lock:
+            if language in self.parsers:
+                return self.parsers[language]
+            lock = self._parser_locks.setdefault(language, threading.Lock())
+        # The construction takes seconds, so it holds a lock of the language only, instead of the lock of
+        # the counters and caches that every connection uses
+        with lock:
+            if language not in self.parsers:
+                try:
+                    parser = load_parser(language)
+                except ValueError as err:
+                    raise RequestError(INVALID_PARAMS, str(err)) from err
+                with self._lock:
+                    self.parsers[language] = parser
+            return self.parsers[language]
+
+    def _count(self, counter: str) -> None:
+        with self._lock:
+            self._counters[counter] += 1
+
+    def parse(
+        self,
+        language: str = "matlab",
+        path: str | None = None,
+        content: str | None = None,
+        format: str = "flatten",
+        timeout: float | None = None,
+    ) -> Any:
+        """
+        Parses a file or content.
+
+        :param language: The name of the language. Defaults to "matlab".
+        :param path: The path of the file to parse.
+        :param content: The content to parse, if no path is given.
+        :param format: The output format, one of "flatten", "compact" or "dict". Defaults to "flatten".
+        :param timeout: The time in seconds after which the parse is cancelled. Defaults to None.
+        :return: The tokens of the parsed element, or None if nothing was parsed.
+        """
+        if (path is None) == (content is None):
+            raise RequestError(INVALID_PARAMS, "Either a path or a content is required")
+        if format not in FORMATS:
+            raise RequestError(INVALID_PARAMS, f"Unknown format {format}")
+        parser = self.parser(language)
+
+        if path is not None:
+            file_path = parser._check_path(path)
+            hit = file_path.exists() and parser._cache.cache_valid(file_path)
+            self._count("file_hits" if hit else "file_misses")
+            element = parser.parse_file(file_path, timeout=timeout)
+        else:
+            key = (language, hashlib.sha256(content.encode()).hexdigest())  # type: ignore
+            with self._lock:
+                hit = key in self._contents
+                if hit:
+                    self._contents.move_to_end(key)
+                    element = self._contents[key]
+            self._count("content_hits" if hit else "content_misses")
+            if not hit:
+                element = parser.parse_string(content, timeout=timeout)  # type: ignore
+                with self._lock:
+                    self._contents[key] = element
+                    while len(self._contents) > self.content_cache_size:
+                        self._contents.popitem(last=False)
+        return format_element(element, format)
+
+    def stats(self) -> dict[str, Any]:
+        """
+        Reports the latencies of the requests and the metrics of the caches.
+
+        :return: The uptime, the request counts and latency percentiles in milliseconds per method, and
+            the hits, misses and entries of the file and content caches.
+        """
+        with self._lock:
+            latencies = {method: list(values) for method, values in self._latencies.items()}
+            counters = dict(self._counters)
+            contents = len(self._contents)
+            parsers = dict(self.parsers)
+        files = sum(
+            len(parser._cache) for parser in parsers.values() if isinstance(parser._cache, Sized)
+        )
+        cache = {}
+        for kind, entries in [("file", files), ("content", contents)]:
+            hits, misses = counters.get(f"{kind}_hits", 0), counters.get(f"{kind}_misses", 0)
+            cache[kind] = {
+                "hits": hits,
+                "misses": misses,
+                "hit_rate": hits / (hits + misses) if hits + misses else None,
+                "entries": entries,
+            }
+        return {
+            "uptime": monotonic() - self._started,
+            "languages": list(parsers),
+            "requests": {
+                method: {"count": counters.get(f"{method}_requests", 0), **percentiles(values)}
+                for method, values in latencies.items()
+            },
+            "errors": counters.get("errors", 0),
+            "cache": cache,
+        }
+
+    def shutdown(self) -> None:
+        """Stops the server after the response to this request."""
+        self.running = False
+        if self._server is not None:
+            threading.Thread(target=self._server.shutdown).start()
+
+    def handle(self, request: Any) -> dict[str, Any] | None:
+        """
+        Handles a JSON-RPC request.
+
+        :param request: The decoded request.
+        :return: The response, or None for a notification without id.
+        """
+        identifier = request.get("id") if isinstance(request, dict) else None
+        started = perf_counter()
+        method = None
+        try:
+            if not isinstance(request, dict) or not isinstance(request.get("method"), str):
+                raise RequestError(INVALID_REQUEST, "Invalid request")
+            method = request["method"]
+            if method not in self.methods:
+                raise RequestError(METHOD_NOT_FOUND, f"Method not found: {method}")
+            params = request.get("params", {})
+            function = self.methods[method]
+            try:
+                signature = inspect.signature(function)
+                bound = (
+                    signature.bind(**params)
+                    if isinstance(params, dict)
+                    else signature.bind(*params)
+                )
+            except TypeError as err:
+                raise RequestError(INVALID_PARAMS, str(err)) from err
+            response: dict[str, Any] = {"result": function(*bound.args, **bound.kwargs)}
+        except RequestError as err:
+            response = {"error": {"code": err.code, "message": str(err)}}
+        except Exception as err:
+            response = {
+                "error": {
+                    "code": SERVER_ERROR,
+                    "message": str(err),
+                    "data": {"type": err.__class__.__name__},
+                }
+            }
+
+        with self._lock:
+            if method in self.methods:
+                self._latencies[method].append(perf_counter() - started)
+                self._counters[f"{method}_requests"] += 1
+            if "error" in response:
+                self._counters["errors"] += 1
+        if identifier is None and isinstance(request, dict) and "id" not in request:
+            return None
+        return {"jsonrpc": "2.0", "id": identifier, **response}
+
+    def handle_line(self, line: str) -> str | None:
+        """Handles a request that is encoded as a line of JSON, and returns the encoded response."""
+        try:
+            request = json.loads(line)
+        except json.JSONDecodeError as err:
+            self._count("errors")
+            response: dict[str, Any] | None = {
+                "jsonrpc": "2.0",
+                "id": None,
+                "error": {"code": PARSE_ERROR, "message": str(err)},
+            }
+        else:
+            response = self.handle(request)
+        return json.dumps(response) if response is not None else None
+
+    def serve(self, input: IO[str], output: IO[str]) -> None:
+        """Handles the requests of a stream until it ends or the daemon is shut down."""
+        for line in input:
+            if not line.strip():
+                continue
+            response = self.handle_line(line)
+            if response is not None:
+                output.write(response + "\n")
+                output.flush()
+            if not self.running:
+                break
+
+    def serve_socket(self, path: str | Path) -> None:
+        """Handles the requests of the connections to a Unix domain socket until the daemon is shut down."""
+        daemon = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self) -> None:
+                daemon.serve(
+                    io.TextIOWrapper(self.rfile, encoding="utf-8"),  # type: ignore
+                    io.TextIOWrapper(self.wfile, encoding="utf-8", write_through=True),  # type: ignore
+                )
+
+        with socketserver.ThreadingUnixStreamServer(str(path), Handler) as server:
+            server.daemon_threads = True
+            self._server = server
+            try:
+                server.serve_forever()
+            finally:
+                self._server = None
+                Path(path).unlink(missing_ok=True)
+
+
+def main() -> None:
+    argparser = argparse.ArgumentParser(
+        description="Tokenization daemon with a JSON-RPC protocol over stdio or a Unix domain socket."
+    )
+    argparser.add_argument("--socket", help="path of the Unix domain socket, instead of stdio")
+    argparser.add_argument(
+        "--preload",
+        nargs="*",
+        choices=list(LANGUAGES),
+        default=[],
+        help="languages to load on start",
+    )
+    argparser.add_argument(
+        "--content-cache-size", type=int, default=256, help="number of parsed contents to keep"
+    )
+    args = argparser.parse_args()
+
+    logging.getLogger("textmate_grammar").setLevel(logging.ERROR)
+
+    daemon = Daemon(content_cache_size=args.content_cache_size)
+    for language in args.preload:
+        daemon.parser(language)
+    if args.socket:
+        daemon.serve_socket(args.socket)
+    else:
+        daemon.serve(sys.stdin, sys.stdout)
+
+
+if __name__ == "__main__":
+    main()
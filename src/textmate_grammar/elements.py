@@ -1,16 +1,18 @@
 from __future__ import annotations
 
+import gc
 from abc import ABC
 from collections import defaultdict
+from contextlib import contextmanager
 from itertools import groupby
 from pprint import pprint
-from typing import TYPE_CHECKING, Generator
+from typing import TYPE_CHECKING, Any, Generator, Iterator
 
-from .handler import POS, ContentHandler, Match, Pattern
-from .utils.logger import LOGGER
+from .handler import POS, ContentHandler, Diagnostic, Match, Pattern
 
 if TYPE_CHECKING:
     from .parser import GrammarParser
+    from .utils.incremental import Snapshot
 
 
 TOKEN_DICT = dict[POS, list[str]]
@@ -80,8 +82,9 @@ class Capture:
         elements = []
         for group_id, parser in self.parsers.items():
             if group_id > self.pattern.number_of_captures():
-                LOGGER.warning(
-                    f"The capture group {group_id} does not exist in pattern {self.pattern._pattern}"
+                self.handler.diagnose(
+                    "missing_capture",
+                    f"The capture group {group_id} does not exist in pattern {self.pattern._pattern}",
                 )
                 continue
 
@@ -99,12 +102,14 @@ class Capture:
                 and group_starting == self.starting
                 and group_boundary == self.boundary
             ):
-                LOGGER.warning("Parser loop detected, continuing...", self, self.starting)
+                self.handler.diagnose(
+                    "parser_loop", "Parser loop detected, continuing...", parser, self.starting
+                )
                 continue
 
             # Dispatch the parse
             self.kwargs.pop("greedy", None)
-            parsed, captured_elements, _ = parser._parse(
+            parsed, captured_elements, _ = parser.parse(
                 self.handler,
                 starting=group_starting,
                 boundary=group_boundary,
@@ -122,13 +127,19 @@ class Capture:
 def _dispatch_list(
     pending_elements: list[Capture | ContentElement], parent: ContentElement | None = None
 ) -> list[ContentElement]:
-    """Dispatches all captured parsers in the list."""
-    elements = []
-    for item in pending_elements:
-        if isinstance(item, Capture):
-            captured_elements: list[ContentElement] = _dispatch_list(item.dispatch())
-            elements.extend(captured_elements)
-        elif item != parent:
+    """Dispatches all captured parsers in the list.
+
+    Captures are replaced in place by their dispatched elements, which may contain captures themselves.
+    """
+    elements: list[ContentElement] = []
+    stack = [iter(pending_elements)]
+    while stack:
+        item = next(stack[-1], None)
+        if item is None:
+            stack.pop()
+        elif isinstance(item, Capture):
+            stack.append(iter(item.dispatch()))
+        elif len(stack) > 1 or item != parent:
             elements.append(item)
     for element in elements:
         element.parent = parent
@@ -145,6 +156,14 @@ def _str_to_list(input: str | list[str]) -> list[str]:
 class ContentElement:
     """The parsed grammar element."""
 
+    #: The diagnostics of the parse, only set on the root element returned by the language parser.
+    diagnostics: list[Diagnostic] | None = None
+    #: The snapshot of the parse, from which a changed source is parsed again, only set on the root
+    #: element returned by ``parse_file``.
+    _snapshot: Snapshot | None = None
+    #: The attributes that refer to other elements of the tree, which are pickled as indices.
+    _element_attributes: tuple[str, ...] = ("parent", "_children")
+
     def __init__(
         self,
         token: str,
@@ -199,12 +218,27 @@ class ContentElement:
         """
         if self._dispatched:
             return
+        steps = self._dispatch_steps()
+        if not nested:
+            for _ in steps:
+                pass
+            return
+
+        # Dispatch the nested elements depth-first, from an explicit stack of suspended elements
+        stack = [steps]
+        while stack:
+            element = next(stack[-1], None)
+            if element is None:
+                stack.pop()
+            elif not element._dispatched:
+                stack.append(element._dispatch_steps())
+
+    def _dispatch_steps(self) -> Generator[ContentElement, None, None]:
+        """Dispatches the captures of the content element, yielding the elements to dispatch next."""
         self._dispatched = True
         self._children: list[ContentElement] = _dispatch_list(self._children_captures, parent=self)
         self._children_captures = []
-        if nested:
-            for child in self._children:
-                child._dispatch(True)
+        yield from self._children
 
     def __eq__(self, other):
         if not isinstance(other, ContentElement):
@@ -233,38 +267,47 @@ class ContentElement:
             stack = []
         stack += [self.token]
 
-        start_found = not start_tokens
-
-        if depth:
-            depth -= 1
-            children: list[ContentElement] = getattr(self, attribute, self._subelements)
-            for child in children:
-                if stop_tokens and (
-                    child.token in stop_tokens
-                    or (stop_tokens == ["*"] and child.token not in tokens)
-                ):
-                    return None
-
-                if not start_found and child.token in start_tokens:
-                    start_found = True
-                    start_tokens = []
-
-                if (
-                    start_found
-                    and (child.token in tokens or tokens == ["*"])
-                    and child.token not in hide_tokens
-                ):
-                    yield child, [e for e in stack]
-                if depth:
-                    nested_generator = child._find(
-                        tokens,
-                        start_tokens=start_tokens,
-                        hide_tokens=hide_tokens,
-                        stop_tokens=stop_tokens,
-                        depth=depth - 1,
-                        stack=[e for e in stack],
-                    )
-                    yield from nested_generator
+        if not depth:
+            return None
+
+        # Search the nested elements depth-first, from an explicit stack of levels. Each level holds the
+        # iterator of its children, its remaining depth, its stack of tokens and its start tokens
+        children: list[ContentElement] = getattr(self, attribute, self._subelements)
+        levels: list[list[Any]] = [[iter(children), depth - 1, stack, start_tokens]]
+        while levels:
+            level = levels[-1]
+            child = next(level[0], None)
+            if child is None:
+                levels.pop()
+                continue
+            _, level_depth, level_stack, level_start_tokens = level
+
+            if stop_tokens and (
+                child.token in stop_tokens or (stop_tokens == ["*"] and child.token not in tokens)
+            ):
+                levels.pop()
+                continue
+
+            if level_start_tokens and child.token in level_start_tokens:
+                level[3] = level_start_tokens = []
+
+            if (
+                not level_start_tokens
+                and (child.token in tokens or tokens == ["*"])
+                and child.token not in hide_tokens
+            ):
+                yield child, [e for e in level_stack]
+            # The nested level is searched with the depth of the level minus one, and loses one more
+            # depth when entered
+            if level_depth and level_depth - 1:
+                levels.append(
+                    [
+                        iter(child._subelements),
+                        level_depth - 2,
+                        level_stack + [child.token],
+                        level_start_tokens,
+                    ]
+                )
         return None
 
     def find(
@@ -345,12 +388,34 @@ class ContentElement:
 
         :return: The converted dictionary representation of the object.
         """
-        out_dict = {"token": self.token}
+        # Convert the nested elements depth-first, from an explicit stack of suspended conversions
+        stack = [self._to_dict_steps(depth=depth, all_content=all_content, **kwargs)]
+        converted: Any = None
+        while stack:
+            try:
+                element, element_kwargs = stack[-1].send(converted)
+            except StopIteration as stopped:
+                stack.pop()
+                converted = stopped.value
+            else:
+                stack.append(element._to_dict_steps(**element_kwargs))
+                converted = None
+        return converted
+
+    def _to_dict_steps(
+        self, depth: int = -1, all_content: bool = False, **kwargs
+    ) -> Generator[tuple[ContentElement, dict], dict, dict]:
+        """Converts the element to a dictionary, yielding the nested elements to convert first."""
+        out_dict: dict = {"token": self.token}
         if all_content or not self.children:
             out_dict["content"] = self.content
         if self.children:
             out_dict["children"] = (
-                self._list_property_to_dict("children", depth=depth - 1, all_content=all_content)
+                (
+                    yield from self._list_property_steps(
+                        "children", depth=depth - 1, all_content=all_content
+                    )
+                )
                 if depth
                 else self.children
             )
@@ -410,9 +475,9 @@ class ContentElement:
             )
 
     def _token_by_index(self, token_dict: TOKEN_DICT | None = None) -> TOKEN_DICT:
-        """Recursively tokenize every index between start and close.
+        """Tokenize every index between start and close.
 
-        This method recursively tokenizes every index between the start and close positions of the element.
+        This method tokenizes every index between the start and close positions of the element.
         It populates a dictionary, `token_dict`, with the tokens corresponding to each index.
 
         :param token_dict: A dictionary to store the tokens. If None, a new dictionary is created.
@@ -422,20 +487,42 @@ class ContentElement:
         """
         if token_dict is None:
             token_dict = defaultdict(list)
-        for pos in self.characters:
-            token_dict[pos].append(self.token)
 
-        # Tokenize child elements
-        for element in self.children:
-            element._token_by_index(token_dict)
+        # Tokenize the element and its child elements in depth-first order
+        stack: list[ContentElement] = [self]
+        while stack:
+            element = stack.pop()
+            for pos in element.characters:
+                token_dict[pos].append(element.token)
+            stack.extend(reversed(element._nested_elements))
         return token_dict
 
-    def _list_property_to_dict(self, prop: str, **kwargs):
-        """Makes a dictionary from a property."""
-        return [
-            item.to_dict(**kwargs) if isinstance(item, ContentElement) else item
-            for item in getattr(self, prop, [])
-        ]
+    @property
+    def _nested_elements(self) -> list[ContentElement]:
+        return self.children
+
+    def _list_property_steps(
+        self, prop: str, **kwargs
+    ) -> Generator[tuple[ContentElement, dict], dict, list]:
+        """Makes a dictionary from a property, yielding the elements to convert."""
+        items = []
+        for item in getattr(self, prop, []):
+            items.append((yield item, kwargs) if isinstance(item, ContentElement) else item)
+        return items
+
+    def __getstate__(self) -> dict:
+        # The captures are dispatched before pickling, as they refer to the parser and content handler
+        self._dispatch()
+        return self.__dict__
+
+    def __reduce__(self):
+        # The elements of the tree are pickled as a flat list, such that deeply nested trees are not
+        # limited by the recursion limit of the pickler
+        root = self
+        while root.parent is not None:
+            root = root.parent
+        nodes, indices = _flatten_tree(root)
+        return _restore_tree, (nodes, indices[id(self)])
 
     def __repr__(self) -> str:
         content = self.content if len(self.content) < 15 else self.content[:15] + "..."
@@ -445,6 +532,8 @@ class ContentElement:
 class ContentBlockElement(ContentElement):
     """A parsed element with a begin and a end"""
 
+    _element_attributes = ContentElement._element_attributes + ("_begin", "_end")
+
     def __init__(
         self,
         *args,
@@ -499,39 +588,29 @@ class ContentBlockElement(ContentElement):
             self._dispatch()
         return self._end
 
-    def _dispatch(self, nested: bool = False):
-        if self._dispatched:
-            return
-        super()._dispatch(nested)
+    def _dispatch_steps(self) -> Generator[ContentElement, None, None]:
+        yield from super()._dispatch_steps()
         self._begin: list[ContentElement] = _dispatch_list(self._begin_captures, parent=self)
         self._end: list[ContentElement] = _dispatch_list(self._end_captures, parent=self)
         self._begin_captures, self._end_captures = [], []
-        if nested:
-            for item in self._begin:
-                item._dispatch(True)
-            for item in self._end:
-                item._dispatch(True)
-
-    def to_dict(self, depth: int = -1, all_content: bool = False, **kwargs) -> dict:
-        """
-        Converts the element to a dictionary representation.
-
-        :param depth: The depth of the conversion. Defaults to -1.
-        :param all_content: Whether to include all content. Defaults to False.
-        :param **kwargs: Additional keyword arguments.
+        yield from self._begin
+        yield from self._end
 
-        :return: The dictionary representation of the element.
-        """
-        out_dict = super().to_dict(depth=depth, all_content=all_content, **kwargs)
+    def _to_dict_steps(
+        self, depth: int = -1, all_content: bool = False, **kwargs
+    ) -> Generator[tuple[ContentElement, dict], dict, dict]:
+        out_dict = yield from super()._to_dict_steps(depth=depth, all_content=all_content, **kwargs)
         if self.begin:
             out_dict["begin"] = (
-                self._list_property_to_dict("begin", depth=depth - 1, **kwargs)
+                (yield from self._list_property_steps("begin", depth=depth - 1, **kwargs))
                 if depth
                 else self.begin
             )
         if self.end:
             out_dict["end"] = (
-                self._list_property_to_dict("end", depth=depth - 1, **kwargs) if depth else self.end
+                (yield from self._list_property_steps("end", depth=depth - 1, **kwargs))
+                if depth
+                else self.end
             )
 
         ordered_keys = [
@@ -540,13 +619,129 @@ class ContentBlockElement(ContentElement):
         ordered_dict = {key: out_dict[key] for key in ordered_keys}
         return ordered_dict
 
-    def _token_by_index(self, token_dict: TOKEN_DICT | None = None) -> TOKEN_DICT:
-        """Converts the object to a flattened array of tokens."""
-        if token_dict is None:
-            token_dict = defaultdict(list)
-        super()._token_by_index(token_dict)
-        for element in self.begin:
-            element._token_by_index(token_dict)
-        for element in self.end:
-            element._token_by_index(token_dict)
-        return token_dict
+    @property
+    def _nested_elements(self) -> list[ContentElement]:
+        return self.children + self.begin + self.end
+
+
+class LazyBlockElement(ContentBlockElement):
+    """A parsed element with a begin and a end, of which the contents are parsed when first accessed.
+
+    The leading children that are anchored to the begin pattern are parsed with the element. The
+    remaining contents are parsed by the capture of the contents, when the children are first accessed.
+    """
+
+    _element_attributes = ContentBlockElement._element_attributes + ("_leading",)
+
+    def __init__(self, *args, contents: Capture | None = None, **kwargs) -> None:
+        """
+        Initialize a new instance of the Element class.
+
+        :param contents: The capture that parses the remaining contents of the element. Defaults to None.
+        :param **kwargs: Additional keyword arguments to be passed to the parent class constructor.
+
+        :return: None
+        """
+        super().__init__(*args, **kwargs)
+        self._contents = contents
+
+    @property
+    def parsed(self) -> bool:
+        """Whether the contents of the element have been parsed."""
+        return self._contents is None
+
+    @property
+    def leading(self) -> list[ContentElement]:
+        """
+        Returns the leading children that are anchored to the begin pattern, such as a declaration.
+
+        The leading children are parsed with the element, such that the contents are not parsed.
+
+        :return: A list of ContentElement objects representing the leading children elements.
+        """
+        if not self._dispatched:
+            self._dispatch()
+        return self._children if self._contents is not None else self._leading
+
+    @property
+    def children(self) -> list[ContentElement]:
+        """
+        Returns a list of children elements.
+
+        If the contents have not been parsed yet, this method will parse and dispatch them before returning.
+
+        :return: A list of ContentElement objects representing the children elements.
+        """
+        if not self._dispatched:
+            self._dispatch()
+        if self._contents is not None:
+            contents, self._contents = self._contents, None
+            self._leading = self._children
+            self._children = self._leading + _dispatch_list([contents], parent=self)
+        return self._children
+
+    def __getstate__(self) -> dict:
+        # The contents are parsed before pickling, as their capture refers to the parser and content handler
+        _ = self.children
+        return super().__getstate__()
+
+
+@contextmanager
+def _paused_gc() -> Iterator[None]:
+    """Pauses the garbage collector, which otherwise traverses the whole tree while its states are built."""
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def _flatten_tree(
+    root: ContentElement,
+) -> tuple[list[tuple[type[ContentElement], dict, dict]], dict[int, int]]:
+    """Gets the states of the elements of a tree, of which the references to elements are indices.
+
+    :param root: The root element of the tree.
+    :return: The class, state and references of every element, and the index of every element by id.
+    """
+    elements = [root]
+    indices = {id(root): 0}
+
+    def index(element: ContentElement) -> int:
+        if id(element) not in indices:
+            indices[id(element)] = len(elements)
+            elements.append(element)
+        return indices[id(element)]
+
+    nodes = []
+    with _paused_gc():
+        for element in elements:
+            state = dict(element.__getstate__())
+            references: dict[str, int | list[int]] = {}
+            for key in element._element_attributes:
+                value = state.get(key)
+                if isinstance(value, ContentElement):
+                    references[key] = index(state.pop(key))
+                elif isinstance(value, list):
+                    references[key] = [index(item) for item in state.pop(key)]
+            nodes.append((element.__class__, state, references))
+    return nodes, indices
+
+
+def _restore_tree(
+    nodes: list[tuple[type[ContentElement], dict, dict]], index: int
+) -> ContentElement:
+    """Restores the elements of a tree from their states, and returns the element at an index."""
+    with _paused_gc():
+        elements = [cls.__new__(cls) for cls, _, _ in nodes]
+        for element, (_, state, references) in zip(elements, nodes):
+            element.__dict__.update(state)
+            for key, reference in references.items():
+                element.__dict__[key] = (
+                    elements[reference]
+                    if isinstance(reference, int)
+                    else [elements[item] for item in reference]
+                )
+    return elements[index]
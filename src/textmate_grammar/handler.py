@@ -1,18 +1,38 @@
 from __future__ import annotations
 
+import re
 from pathlib import Path
-from typing import Callable
+from time import monotonic, perf_counter
+from typing import TYPE_CHECKING, Callable, NamedTuple
 
 import charset_normalizer as charset
-from onigurumacffi import _Match as Match
-from onigurumacffi import _Pattern as Pattern
 from onigurumacffi import compile
 
-from .utils.exceptions import FileNotFound, ImpossibleSpan
+from .utils.exceptions import DeadlineExceeded, FileNotFound, ImpossibleSpan, ParseCancelled
 from .utils.logger import LOGGER
+from .utils.regex import Match, Pattern
+
+if TYPE_CHECKING:
+    from .utils.cancellation import CancellationToken
+    from .utils.profiler import Profiler
+    from .utils.stop import StopCheck
 
 POS = tuple[int, int]
 
+LEADING_WHITESPACE = re.compile(r"\s*")
+
+# The number of lines after which the parse loops check for cancellation
+CHECK_INTERVAL = 100
+
+
+class Diagnostic(NamedTuple):
+    """A problem encountered during a parse, such as content that could not be parsed."""
+
+    kind: str
+    message: str
+    position: POS | None
+    rule: str
+
 
 def _dummy_pre_processor(input: str) -> str:
     return input
@@ -44,6 +64,19 @@ class ContentHandler:
         :ivar lines: A list of lines in the source code, with a newline character at the end of each line.
         :ivar line_lengths: A list of lengths of each line in the source code.
         :ivar anchor: The current position in the source code.
+        :ivar diagnostics: The diagnostics collected during the parse.
+        :ivar profiler: The profiler of the parse, if profiling is enabled.
+        :ivar hooks: The parse hooks, which are notified when a rule starts and finishes a parse attempt.
+        :ivar skipped_lines: The lines that are not tokenized, as they are too long or exceeded the time limit.
+        :ivar line_time_limit: The time in seconds spent searching a line, after which the tokenization
+            of the line is aborted.
+        :ivar check_line: The line from which the parse loops next check for cancellation.
+        :ivar progress: The callback of the number of parsed lines and the total number of lines.
+        :ivar unterminated_blocks: The results of begin/end blocks that did not find their end pattern,
+            by rule, begin span and boundary, such that these blocks are only scanned once.
+        :ivar stop_position: The position at which the parse loops stop, closing the open blocks.
+        :ivar stop_check: The check of the stop condition on the elements accepted by the parse loops.
+        :ivar lazy_blocks: Whether the contents of lazy blocks are located rather than parsed.
         """
         # Proprocess the content, replace all newline characters with \n
         prepared_content = pre_processor(content.replace("\r\n", "\n").replace("\r", "\n"))
@@ -52,6 +85,23 @@ class ContentHandler:
         self.lines = [line + "\n" for line in prepared_content.split("\n")]
         self.line_lengths = [len(line) for line in self.lines]
         self.anchor: int = 0
+        self.diagnostics: list[Diagnostic] = []
+        self.profiler: Profiler | None = None
+        self.hooks: list = []
+        self._line_chars: dict[int, frozenset[str]] = {}
+        self.skipped_lines: set[int] = set()
+        self.line_time_limit: float | None = None
+        self.check_line: float = float("inf")
+        self.unterminated_blocks: dict[tuple, tuple] = {}
+        self.stop_position: POS | None = None
+        self.stop_check: StopCheck | None = None
+        self.lazy_blocks = True
+        self._cancel: CancellationToken | None = None
+        self._deadline: float | None = None
+        self.progress: Callable[[int, int], None] | None = None
+        self._check_interval = CHECK_INTERVAL
+        self._line_spent: dict[int, float] = {}
+        self._next_content_lines: list[int | None] | None = None
 
     @classmethod
     def from_path(cls, file_path: Path, **kwargs) -> ContentHandler:
@@ -65,6 +115,114 @@ class ContentHandler:
 
         return cls(content, **kwargs)
 
+    def diagnose(
+        self,
+        kind: str,
+        message: str,
+        parser: object | None = None,
+        position: POS | None = None,
+        depth: int = 0,
+    ) -> None:
+        """Records a diagnostic of the parse, which is also logged as a warning.
+
+        :param kind: The kind of the diagnostic, such as "skipped" or "not_parsed".
+        :param message: The description of the diagnostic.
+        :param parser: The grammar parser that encountered the diagnostic. Defaults to None.
+        :param position: The position of the diagnostic. Defaults to None.
+        :param depth: The depth of the parser, used for logging. Defaults to 0.
+        """
+        self.diagnostics.append(Diagnostic(kind, message, position, repr(parser) if parser else ""))
+        if __debug__ and LOGGER.warning_enabled:
+            LOGGER.warning(message, parser, position, depth)  # type: ignore
+
+    def watch(
+        self,
+        cancel: CancellationToken | None = None,
+        deadline: float | None = None,
+        progress: Callable[[int, int], None] | None = None,
+        interval: int = CHECK_INTERVAL,
+    ) -> None:
+        """Enables the cancellation and progress checks of the parse loops.
+
+        :param cancel: The token that cancels the parse. Defaults to None.
+        :param deadline: The time of ``time.monotonic`` after which the parse is cancelled. Defaults to None.
+        :param progress: A callback of the number of parsed lines and the total number of lines. Defaults to None.
+        :param interval: The number of lines between the checks. Defaults to CHECK_INTERVAL.
+        """
+        self._cancel = cancel
+        self._deadline = deadline
+        self.progress = progress
+        self._check_interval = interval
+        if cancel is not None or deadline is not None or progress is not None:
+            self.check_line = 0
+
+    def check(self, pos: POS) -> None:
+        """Checks whether the parse is cancelled and reports its progress.
+
+        The parse loops call this method once the position has reached ``check_line``.
+
+        :param pos: The current position of the parse.
+        :raises ParseCancelled: If the cancellation token is cancelled.
+        :raises DeadlineExceeded: If the deadline has passed.
+        """
+        if self._cancel is not None and self._cancel.cancelled:
+            raise ParseCancelled(pos)
+        if self._deadline is not None and monotonic() > self._deadline:
+            raise DeadlineExceeded(pos)
+        if self.progress is not None:
+            self.progress(pos[0], len(self.lines))
+        self.check_line = pos[0] + self._check_interval
+
+    def stop(self, position: POS) -> None:
+        """Stops the parse at a position, or at the earlier position at which it was already stopped.
+
+        The parse loops stop once they reach the position, and the open blocks are closed at the position
+        of each loop, such that the result is the partial element tree of the content before the position.
+
+        :param position: The position at which to stop the parse.
+        """
+        if self.stop_position is None or position < self.stop_position:
+            self.stop_position = position
+
+    def stopped(self, pos: POS) -> bool:
+        """Returns whether the parse loops stop at a position."""
+        return self.stop_position is not None and pos >= self.stop_position
+
+    def limit_lines(self, max_length: int | None = None, time_limit: float | None = None) -> None:
+        """Limits the tokenization of long lines and of lines that take too long.
+
+        Lines that are not tokenized are skipped by the parsers, such that their content is only part
+        of the enclosing elements. The time limit is checked before each regex search, and cannot
+        interrupt a single search.
+
+        :param max_length: The maximal number of characters of a tokenized line. Defaults to None.
+        :param time_limit: The time in seconds spent searching a line, after which the remainder of
+            the line is not tokenized. Defaults to None.
+        """
+        self.line_time_limit = time_limit
+        if max_length is None:
+            return
+        for ln, length in enumerate(self.line_lengths):
+            if length - 1 > max_length:
+                self.skipped_lines.add(ln)
+                self.diagnose(
+                    "line_too_long",
+                    f"Line of {length - 1} characters exceeds the maximum of {max_length}, not tokenized",
+                    position=(ln, 0),
+                )
+
+    def _exceeds_time_limit(self, pos: POS) -> bool:
+        """Checks whether the tokenization of a line exceeded the time limit, and skips the line if so."""
+        if self._line_spent.get(pos[0], 0.0) <= self.line_time_limit:  # type: ignore
+            return False
+        self.skipped_lines.add(pos[0])
+        self.diagnose(
+            "line_time_limit",
+            f"Line exceeded the time limit of {self.line_time_limit}s, remainder not tokenized",
+            position=pos,
+        )
+        return True
+
     def _check_pos(self, pos: POS):
         if pos[0] > len(self.lines) or pos[1] > self.line_lengths[pos[0]]:
             raise ImpossibleSpan
@@ -133,8 +291,16 @@ class ContentHandler:
         :param close: The closing position of the range.
         :return: A dictionary mapping each position within the range to the corresponding source character.
         """
-        indices = self.range(start, close)
-        return {pos: self.read(pos) for pos in indices}
+        characters: dict[POS, str] = {}
+        for ln in range(start[0], close[0] + 1):
+            line = self.lines[ln]
+            first = start[1] if ln == start[0] else 0
+            last = close[1] if ln == close[0] else self.line_lengths[ln]
+            characters.update(((ln, lp), line[lp]) for lp in range(first, last))
+            if last == self.line_lengths[ln] and last > first:
+                # The newline character is read as an empty string
+                characters[(ln, last - 1)] = ""
+        return characters
 
     def read_pos(self, start_pos: POS, close_pos: POS, skip_newline: bool = True) -> str:
         """Reads the content between the start and end positions.
@@ -214,6 +380,53 @@ class ContentHandler:
 
         return readout
 
+    def next_content_line(self, line: int) -> int | None:
+        """Returns the first line after a line that contains more than the newline character.
+
+        The lines are indexed once per handler, such that skipping blank lines does not copy the
+        remaining line lengths on every call.
+
+        :param line: The line number after which to search.
+        :return: The line number of the next line with content, or None if there is none.
+        """
+        if self._next_content_lines is None:
+            following: int | None = None
+            next_content_lines: list[int | None] = [None] * len(self.lines)
+            for ln in range(len(self.lines) - 1, -1, -1):
+                next_content_lines[ln] = following
+                if self.line_lengths[ln] > 1:
+                    following = ln
+            self._next_content_lines = next_content_lines
+        return self._next_content_lines[line]
+
+    def start_chars(
+        self, pos: POS, boundary: POS | None = None, greedy: bool = False
+    ) -> frozenset[str]:
+        """Returns the characters at which a search from the position can start its match.
+
+        Without greedy matching, only leading whitespace may be skipped, such that a match can start on
+        any of the leading whitespace characters or on the first non-whitespace character. With greedy
+        matching the match can start anywhere on the line.
+
+        :param pos: The starting position of the search.
+        :param boundary: The boundary position of the search. Defaults to None.
+        :param greedy: Whether the search is greedy. Defaults to False.
+        :return: The set of characters at which a match can start.
+        """
+        if pos[0] >= len(self.lines) or pos[0] in self.skipped_lines:
+            return frozenset()
+        if greedy:
+            chars = self._line_chars.get(pos[0])
+            if chars is None:
+                chars = self._line_chars[pos[0]] = frozenset(self.lines[pos[0]])
+            return chars
+
+        line = self.lines[pos[0]]
+        if boundary and pos[0] == boundary[0]:
+            line = line[: boundary[1]]
+        leading_end = LEADING_WHITESPACE.match(line, pos[1]).end()  # type: ignore
+        return frozenset(line[pos[1] : leading_end + 1])
+
     def search(
         self,
         pattern: Pattern,
@@ -248,6 +461,11 @@ class ContentHandler:
                 - `2`: any character allowed.
         """
 
+        if self.skipped_lines and starting[0] in self.skipped_lines:
+            return None, None
+        if self.line_time_limit is not None and self._exceeds_time_limit(starting):
+            return None, None
+
         if pattern._pattern in ["\\z", "\\Z"]:
             greedy = True
 
@@ -261,7 +479,14 @@ class ContentHandler:
         init_pos = self.anchor if "\\G" in pattern._pattern else starting[1]
 
         # Find begin of line and search starting from the initial position
-        matching = pattern.search(line, start=init_pos)
+        if self.line_time_limit is not None:
+            # Only the time spent searching the line counts towards its time limit
+            searched = perf_counter()
+            matching = pattern.search(line, start=init_pos)
+            spent = self._line_spent.get(starting[0], 0.0) + perf_counter() - searched
+            self._line_spent[starting[0]] = spent
+        else:
+            matching = pattern.search(line, start=init_pos)
 
         # Check that no charaters are skipped in case ws-only is enabled
         if matching:
@@ -280,7 +505,8 @@ class ContentHandler:
             return None, None
 
         if leading_string and not leading_string.isspace() and greedy:
-            LOGGER.warning(
+            self.diagnose(
+                "skipped",
                 f"skipping < {leading_string} >",
                 position=start_pos,
                 depth=kwargs.get("depth", 0),
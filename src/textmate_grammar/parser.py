@@ -1,22 +1,34 @@
 from __future__ import annotations
 
 from abc import ABC, abstractmethod
-from typing import TYPE_CHECKING
-
-import onigurumacffi as re
-
-from .elements import Capture, ContentBlockElement, ContentElement
-from .handler import POS, ContentHandler, Pattern
+from typing import TYPE_CHECKING, Any, Callable, Generator
+
+from .elements import (
+    Capture,
+    ContentBlockElement,
+    ContentElement,
+    LazyBlockElement,
+    _dispatch_list,
+)
+from .handler import LEADING_WHITESPACE, POS, ContentHandler, Pattern
 from .utils.exceptions import IncludedParserNotFound
-from .utils.logger import LOGGER, track_depth
+from .utils.logger import LOGGER
+from .utils.prefilter import WORD, CharFilter, PatternIndex, first_chars, keyword_spec
+from .utils.regex import compile_pattern
 
 if TYPE_CHECKING:
     from .parsers.base import LanguageParser
 
+PARSE_RESULT = tuple[bool, list[Capture | ContentElement], tuple[POS, POS] | None]
+PARSE_STEPS = Generator[tuple[Any, POS, dict], Any, PARSE_RESULT]
+
 
 class GrammarParser(ABC):
     """The abstract grammar parser object"""
 
+    prefilter: CharFilter | None = None
+    has_patterns = False
+
     @staticmethod
     def initialize(grammar: dict, **kwargs):
         """
@@ -74,6 +86,10 @@ class GrammarParser(ABC):
     def disabled(self) -> bool:
         return self.grammar.get("disabled", False)
 
+    def _compile(self, pattern: str) -> Pattern:
+        """Compiles a pattern with the regex backend of the language."""
+        return compile_pattern(pattern, getattr(self.language_parser, "regex_backend", "auto"))
+
     def __repr__(self) -> str:
         return f"{self.__class__.__name__}:<{self.key}>"
 
@@ -104,8 +120,9 @@ class GrammarParser(ABC):
         self,
         handler: ContentHandler,
         starting: POS,
+        *args,
         **kwargs,
-    ) -> tuple[bool, list[Capture | ContentElement], tuple[int, int] | None]:
+    ) -> PARSE_RESULT:
         """The abstract method which all parsers much implement
 
         The ``_parse`` method is called by ``parse``, which will additionally parse any nested Capture elements.
@@ -132,7 +149,7 @@ class GrammarParser(ABC):
         starting: POS = (0, 0),
         boundary: POS | None = None,
         **kwargs,
-    ) -> tuple[bool, list[Capture | ContentElement], tuple[int, int] | None]:
+    ) -> PARSE_RESULT:
         """
         The method to parse a handler using the current grammar.
 
@@ -148,6 +165,13 @@ class GrammarParser(ABC):
         """
         if not self.initialized and self.language_parser is not None:
             self.language_parser._initialize_repository()
+        if handler.hooks and not self.has_patterns:
+            for hook in handler.hooks:
+                hook.enter(self, starting, kwargs.get("depth", 0))
+            result = self._parse(handler, starting, boundary=boundary, **kwargs)
+            for hook in handler.hooks:
+                hook.exit(self, result)
+            return result
         parsed, elements, span = self._parse(handler, starting, boundary=boundary, **kwargs)
         return parsed, elements, span
 
@@ -212,7 +236,6 @@ class TokenParser(GrammarParser):
     def __repr__(self) -> str:
         return f"{self.__class__.__name__}:{self.token}"
 
-    @track_depth
     def _parse(
         self,
         handler: ContentHandler,
@@ -234,12 +257,13 @@ class TokenParser(GrammarParser):
             )
         ]
         handler.anchor = boundary[1]
-        LOGGER.info(
-            f"{self.__class__.__name__} found < {repr(content)} >",
-            self,
-            starting,
-            kwargs.get("depth", 0),
-        )
+        if __debug__ and LOGGER.info_enabled:
+            LOGGER.info(
+                f"{self.__class__.__name__} found < {repr(content)} >",
+                self,
+                starting,
+                kwargs.get("depth", 0),
+            )
         return True, elements, (starting, boundary)
 
 
@@ -248,7 +272,8 @@ class MatchParser(GrammarParser):
 
     def __init__(self, grammar: dict, **kwargs) -> None:
         super().__init__(grammar, **kwargs)
-        self.exp_match = re.compile(grammar["match"])
+        self.exp_match = self._compile(grammar["match"])
+        self.prefilter = first_chars(grammar["match"])
         self.parsers = self._init_captures(grammar, key="captures")
         if "\\G" in grammar["match"]:
             self.anchored = True
@@ -270,7 +295,6 @@ class MatchParser(GrammarParser):
             if not parser.initialized:
                 parser._initialize_repository()
 
-    @track_depth
     def _parse(
         self,
         handler: ContentHandler,
@@ -290,20 +314,22 @@ class MatchParser(GrammarParser):
         )
 
         if span is None:
-            LOGGER.debug(
-                f"{self.__class__.__name__} no match",
+            if __debug__ and LOGGER.debug_enabled:
+                LOGGER.debug(
+                    f"{self.__class__.__name__} no match",
+                    self,
+                    starting,
+                    kwargs.get("depth", 0),
+                )
+            return False, [], None
+
+        if __debug__ and LOGGER.info_enabled:
+            LOGGER.info(
+                f"{self.__class__.__name__} found < {repr(content)} >",
                 self,
                 starting,
                 kwargs.get("depth", 0),
             )
-            return False, [], None
-
-        LOGGER.info(
-            f"{self.__class__.__name__} found < {repr(content)} >",
-            self,
-            starting,
-            kwargs.get("depth", 0),
-        )
 
         if self.token:
             elements: list[Capture | ContentElement] = [
@@ -321,13 +347,210 @@ class MatchParser(GrammarParser):
         return True, elements, span
 
 
+class KeywordsParser(GrammarParser):
+    """The merged parser of adjacent match rules that are plain keyword alternations.
+
+    Rules such as ``\\b(break|continue)\\b`` without any captures are merged into a single parser that
+    looks up the word at the current position in a trie, instead of calling the regex engine for each
+    of the rules. The elements are constructed by the original rule that matched.
+    """
+
+    def __init__(self, rules: list[MatchParser], **kwargs) -> None:
+        super().__init__({}, language_parser=rules[0].language_parser, **kwargs)
+        self.rules = rules
+        self.specs = [keyword_spec(rule.exp_match._pattern) for rule in rules]
+        self.initialized = True
+        self._trie: dict = {}
+        for rule_index, spec in enumerate(self.specs):
+            for word_index, word in enumerate(spec.words):  # type: ignore
+                node = self._trie
+                for char in word:
+                    node = node.setdefault(char, {})
+                node.setdefault(None, []).append((rule_index, word_index))
+        self.prefilter = CharFilter(char for char in self._trie if char is not None)
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}:{'|'.join(repr(rule) for rule in self.rules)}"
+
+    def match(self, line: str, position: int) -> dict[int, int]:
+        """Matches the keywords at a position of a line.
+
+        :param line: The line to match.
+        :param position: The position at which the match must start.
+        :return: A dictionary mapping the index of each matching rule to its closing position.
+        :raises ValueError: If non-ASCII characters around the match prevent an exact decision.
+        """
+        previous = line[position - 1] if position else ""
+        if previous and ord(previous) > 127:
+            raise ValueError
+
+        matches: dict[int, tuple[int, int]] = {}
+        node: dict | None = self._trie
+        closing = position
+        while closing < len(line):
+            node = node.get(line[closing])  # type: ignore
+            if node is None:
+                break
+            closing += 1
+            for rule_index, word_index in node.get(None, ()):
+                if rule_index in matches and matches[rule_index][0] < word_index:
+                    continue
+                spec = self.specs[rule_index]
+                if spec.guard is not None and previous == spec.guard:  # type: ignore
+                    continue
+                if spec.left_boundary and (previous in WORD) == (line[position] in WORD):  # type: ignore
+                    continue
+                if spec.right_boundary:  # type: ignore
+                    following = line[closing] if closing < len(line) else ""
+                    if following and ord(following) > 127:
+                        raise ValueError
+                    if (following in WORD if following else False) == (line[closing - 1] in WORD):
+                        continue
+                matches[rule_index] = (word_index, closing)
+        return {rule_index: closing for rule_index, (_, closing) in matches.items()}
+
+    def search(self, line: str, position: int) -> dict[int, tuple[int, int]]:
+        """Finds the leftmost match of each of the rules in a line, starting from a position.
+
+        :param line: The line to search.
+        :param position: The position from which to search.
+        :return: A dictionary mapping the index of each matching rule to its span in the line.
+        :raises ValueError: If non-ASCII characters around a match prevent an exact decision.
+        """
+        found: dict[int, tuple[int, int]] = {}
+        for starting in range(position, len(line)):
+            if line[starting] in self._trie:
+                for rule_index, closing in self.match(line, starting).items():
+                    found.setdefault(rule_index, (starting, closing))
+                if len(found) == len(self.rules):
+                    break
+        return found
+
+    def _parse(
+        self,
+        handler: ContentHandler,
+        starting: POS,
+        boundary: POS,
+        greedy: bool = False,
+        **kwargs,
+    ) -> tuple[bool, list[Capture | ContentElement], tuple[POS, POS] | None]:
+        """The parse method for merged keyword rules.
+
+        Lines for which the trie cannot decide on a match are delegated to the original rules.
+        """
+        line = handler.lines[starting[0]]
+        if boundary and starting[0] == boundary[0]:
+            line = line[: boundary[1]]
+
+        try:
+            if greedy:
+                found = self.search(line, starting[1])
+            else:
+                position = LEADING_WHITESPACE.match(line, starting[1]).end()  # type: ignore
+                found = {
+                    rule_index: (position, closing)
+                    for rule_index, closing in self.match(line, position).items()
+                }
+        except ValueError:
+            return self._parse_rules(handler, starting, boundary, greedy=greedy, **kwargs)
+
+        if not found:
+            return False, [], None
+
+        for position, _ in (found[index] for index in sorted(found)):
+            leading_string = line[starting[1] : position]
+            if leading_string and not leading_string.isspace():
+                handler.diagnose(
+                    "skipped",
+                    f"skipping < {leading_string} >",
+                    position=(starting[0], position),
+                    depth=kwargs.get("depth", 0),
+                )
+
+        # The separate rules are tried in order, the last successful rule sets the anchor
+        rule_index = min(found, key=lambda index: (found[index][0], index))
+        position, closing = found[rule_index]
+        handler.anchor = found[max(found)][1] if greedy else closing
+
+        rule = self.rules[rule_index]
+        span = ((starting[0], position), (starting[0], closing))
+        content = line[position:closing]
+        if __debug__ and LOGGER.info_enabled:
+            LOGGER.info(
+                f"{rule.__class__.__name__} found < {repr(content)} >",
+                rule,
+                starting,
+                kwargs.get("depth", 0),
+            )
+
+        if rule.token:
+            elements: list[Capture | ContentElement] = [
+                ContentElement(
+                    token=rule.token,
+                    grammar=rule.grammar,
+                    content=content,
+                    characters=handler.chars(*span),
+                )
+            ]
+        else:
+            elements = []
+        return True, elements, span
+
+    def _parse_rules(
+        self,
+        handler: ContentHandler,
+        starting: POS,
+        boundary: POS,
+        greedy: bool = False,
+        **kwargs,
+    ) -> tuple[bool, list[Capture | ContentElement], tuple[POS, POS] | None]:
+        """Parses with the original rules, choosing the same match as the separate rules would."""
+        options: list[tuple] = []
+        for rule in self.rules:
+            parsed, elements, span = rule._parse(
+                handler, starting, boundary=boundary, greedy=greedy, **kwargs
+            )
+            if parsed:
+                if not greedy:
+                    return parsed, elements, span
+                options.append((span[0], len(options), elements, span))  # type: ignore
+        if not options:
+            return False, [], None
+        _, _, elements, span = min(options)
+        return True, elements, span
+
+
+def _merge_keyword_rules(parsers: list) -> list:
+    """Merges runs of adjacent capture-free keyword match rules into KeywordsParser objects."""
+    merged: list = []
+    run: list[MatchParser] = []
+    for parser in parsers + [None]:
+        if (
+            type(parser) is MatchParser
+            and not parser.parsers
+            and not parser.anchored
+            and keyword_spec(parser.exp_match._pattern) is not None
+        ):
+            run.append(parser)
+            continue
+        if run:
+            merged.append(KeywordsParser(run, key=run[0].key))
+            run = []
+        if parser is not None:
+            merged.append(parser)
+    return merged
+
+
 class ParserHasPatterns(GrammarParser, ABC):
+    has_patterns = True
+
     def __init__(self, grammar: dict, **kwargs) -> None:
         super().__init__(grammar, **kwargs)
         self.patterns = [
             self.initialize(pattern, language_parser=self.language_parser)
             for pattern in grammar.get("patterns", [])
         ]
+        self._index = PatternIndex([])
 
     def _initialize_repository(self):
         """When the grammar has patterns, this method should called to initialize its inclusions."""
@@ -354,50 +577,162 @@ class ParserHasPatterns(GrammarParser, ABC):
             elif self.is_capture:
                 self.patterns.append(injection_pattern)
 
+        patterns = [parser for parser in self.patterns if not parser.disabled]
+        if getattr(self.language_parser, "merge_keywords", False):
+            patterns = _merge_keyword_rules(patterns)
+        self._index = PatternIndex(patterns)
+
+    def _parse(
+        self,
+        handler: ContentHandler,
+        starting: POS,
+        **kwargs,
+    ) -> PARSE_RESULT:
+        """Parses by driving the parse steps of this and all nested parsers from an explicit stack."""
+        return _drive(self, handler, starting, kwargs)
+
+    @abstractmethod
+    def _parse_steps(self, handler: ContentHandler, starting: POS, *args, **kwargs) -> PARSE_STEPS:
+        """The parse method of parsers with nested patterns, as a generator of parse steps.
+
+        Instead of calling the ``_parse`` method of a nested parser, the generator yields a tuple of the
+        nested parser, its starting position and its keyword arguments. The result of the nested parse
+        is sent back into the generator. The return value of the generator is the parse result.
+        """
+        pass
+
+
+def _drive(
+    parser: ParserHasPatterns, handler: ContentHandler, starting: POS, kwargs: dict
+) -> PARSE_RESULT:
+    """Runs the parse steps of a parser and all of its nested parsers.
+
+    Nested parsers with patterns are pushed as suspended generators onto an explicit stack, such that
+    the nesting depth of the parsed content is not limited by the recursion limit of Python. All other
+    parsers do not nest and are called directly.
+    """
+    if handler.hooks:
+        return _drive_hooked(parser, handler, starting, kwargs)
+
+    depth = kwargs.pop("depth", -1) + 1
+    stack = [(parser._parse_steps(handler, starting, depth=depth, **kwargs), depth)]
+    result: Any = None
+    while True:
+        steps, depth = stack[-1]
+        try:
+            nested_parser, nested_starting, nested_kwargs = steps.send(result)
+        except StopIteration as stop:
+            stack.pop()
+            if not stack:
+                return stop.value
+            result = stop.value
+            continue
+
+        nested_kwargs["depth"] = depth + 1
+        if nested_parser.has_patterns:
+            stack.append(
+                (nested_parser._parse_steps(handler, nested_starting, **nested_kwargs), depth + 1)
+            )
+            result = None
+        else:
+            result = nested_parser._parse(handler, nested_starting, **nested_kwargs)
+
+
+def _drive_hooked(
+    parser: ParserHasPatterns, handler: ContentHandler, starting: POS, kwargs: dict
+) -> PARSE_RESULT:
+    """Runs the parse steps as ``_drive``, while notifying the parse hooks of the handler.
+
+    The hooks, such as a profiler or tracer, are notified whenever a rule starts and finishes a parse
+    attempt. As the attempts are nested, the hooks can keep track of the rule stack themselves.
+    """
+    hooks = handler.hooks
+    depth = kwargs.pop("depth", -1) + 1
+    for hook in hooks:
+        hook.enter(parser, starting, depth)
+    stack = [(parser._parse_steps(handler, starting, depth=depth, **kwargs), depth, parser)]
+    result: Any = None
+    while True:
+        steps, depth, current = stack[-1]
+        try:
+            nested_parser, nested_starting, nested_kwargs = steps.send(result)
+        except StopIteration as stop:
+            stack.pop()
+            for hook in hooks:
+                hook.exit(current, stop.value)
+            if not stack:
+                return stop.value
+            result = stop.value
+            continue
+
+        nested_kwargs["depth"] = depth + 1
+        for hook in hooks:
+            hook.enter(nested_parser, nested_starting, depth + 1)
+        if nested_parser.has_patterns:
+            steps = nested_parser._parse_steps(handler, nested_starting, **nested_kwargs)
+            stack.append((steps, depth + 1, nested_parser))
+            result = None
+        else:
+            result = nested_parser._parse(handler, nested_starting, **nested_kwargs)
+            for hook in hooks:
+                hook.exit(nested_parser, result)
+
 
 class PatternsParser(ParserHasPatterns):
     """The parser for grammars for which several patterns are provided."""
 
-    @track_depth
-    def _parse(
+    def _parse_steps(
         self,
         handler: ContentHandler,
         starting: POS,
         boundary: POS | None = None,
         greedy: bool = False,
         find_one: bool = True,
+        until: Callable[[POS, int], bool] | None = None,
         **kwargs,
-    ) -> tuple[bool, list[Capture | ContentElement], tuple[POS, POS]]:
-        """The parse method for grammars for which a match pattern is provided."""
+    ) -> PARSE_STEPS:
+        """The parse method for grammars for which a match pattern is provided.
+
+        The optional until callback is called with the current position and the number of found elements
+        before each search round, and stops the parse when it returns True. It is not passed on to the
+        nested parsers.
+        """
 
         if boundary is None:
             boundary = (len(handler.lines) - 1, handler.line_lengths[-1])
 
         parsed = False
         elements: list[Capture | ContentElement] = []
-        patterns = [parser for parser in self.patterns if not parser.disabled]
 
         current = (starting[0], starting[1])
 
         while current < boundary:
+            if current[0] >= handler.check_line:
+                handler.check(current)
+            if handler.stopped(current) or until is not None and until(current, len(elements)):
+                break
+
+            # Only try the parsers that can start a match at the current position
+            patterns = self._index.select(handler.start_chars(current, boundary, greedy=greedy))
             for parser in patterns:
                 # Try to find patterns
-                parsed, captures, span = parser._parse(
-                    handler,
+                parsed, captures, span = yield (
+                    parser,
                     current,
-                    boundary=boundary,
-                    greedy=greedy,
-                    **kwargs,
+                    dict(kwargs, boundary=boundary, greedy=greedy),
                 )
                 if parsed:
                     if find_one:
-                        LOGGER.info(
-                            f"{self.__class__.__name__} found single element",
-                            self,
-                            current,
-                            kwargs.get("depth", 0),
-                        )
+                        if __debug__ and LOGGER.info_enabled:
+                            LOGGER.info(
+                                f"{self.__class__.__name__} found single element",
+                                self,
+                                current,
+                                kwargs.get("depth", 0),
+                            )
                         return True, captures, span
+                    if handler.stop_check is not None:
+                        handler.stop_check.accept(captures, span, kwargs.get("depth") == 0)
                     elements.extend(captures)
                     current = span[1]
                     break
@@ -407,24 +742,32 @@ class PatternsParser(ParserHasPatterns):
 
             if not parsed and not greedy:
                 # Try again if previously allowed no leading white space charaters, only when multple patterns are to be found
-                options_span, options_elements = {}, {}
+                if handler.profiler is not None:
+                    handler.profiler.rule(self).greedy_fallbacks += 1
+                # The parse is only stopped within the chosen option
+                options_span, options_elements, options_stop = {}, {}, {}
+                stop_position = handler.stop_position
+                patterns = self._index.select(handler.start_chars(current, boundary, greedy=True))
                 for parser in patterns:
-                    parsed, captures, span = parser._parse(
-                        handler,
+                    parsed, captures, span = yield (
+                        parser,
                         current,
-                        boundary=boundary,
-                        greedy=True,
-                        **kwargs,
+                        dict(kwargs, boundary=boundary, greedy=True),
+                    )
+                    options_stop[parser], handler.stop_position = (
+                        handler.stop_position,
+                        stop_position,
                     )
                     if parsed:
                         options_span[parser] = span
                         options_elements[parser] = captures
-                        LOGGER.debug(
-                            f"{self.__class__.__name__} found pattern choice",
-                            self,
-                            current,
-                            kwargs.get("depth", 0),
-                        )
+                        if __debug__ and LOGGER.debug_enabled:
+                            LOGGER.debug(
+                                f"{self.__class__.__name__} found pattern choice",
+                                self,
+                                current,
+                                kwargs.get("depth", 0),
+                            )
 
                 if options_span:
                     parser = sorted(
@@ -435,19 +778,26 @@ class PatternsParser(ParserHasPatterns):
                         ),
                     )[0]
                     current = options_span[parser][1]
+                    handler.stop_position = options_stop[parser]
+                    if handler.stop_check is not None:
+                        handler.stop_check.accept(
+                            options_elements[parser], options_span[parser], kwargs.get("depth") == 0
+                        )
                     elements.extend(options_elements[parser])
-                    LOGGER.info(
-                        f"{self.__class__.__name__} chosen pattern of {parser}",
-                        self,
-                        current,
-                        kwargs.get("depth", 0),
-                    )
+                    if __debug__ and LOGGER.info_enabled:
+                        LOGGER.info(
+                            f"{self.__class__.__name__} chosen pattern of {parser}",
+                            self,
+                            current,
+                            kwargs.get("depth", 0),
+                        )
                 elif self != self.language_parser:
                     break
                 else:
                     remainder = handler.read_line(current)
-                    if not remainder.isspace():
-                        LOGGER.warning(
+                    if not remainder.isspace() and current[0] not in handler.skipped_lines:
+                        handler.diagnose(
+                            "not_parsed",
                             f"{self.__class__.__name__} remainder of line not parsed: {remainder}",
                             self,
                             current,
@@ -456,16 +806,18 @@ class PatternsParser(ParserHasPatterns):
                     if current[0] + 1 <= len(handler.lines):
                         current = (current[0] + 1, 0)
                     else:
-                        LOGGER.debug(
-                            f"{self.__class__.__name__} EOF encountered",
-                            self,
-                            current,
-                            kwargs.get("depth", 0),
-                        )
+                        if __debug__ and LOGGER.debug_enabled:
+                            LOGGER.debug(
+                                f"{self.__class__.__name__} EOF encountered",
+                                self,
+                                current,
+                                kwargs.get("depth", 0),
+                            )
                         break
 
             if current == starting:
-                LOGGER.warning(
+                handler.diagnose(
+                    "no_progress",
                     f"{self.__class__.__name__} handler did not move after a search round",
                     self,
                     starting,
@@ -475,21 +827,19 @@ class PatternsParser(ParserHasPatterns):
 
             line_length = handler.line_lengths[current[0]]
             if current[1] in [line_length, line_length - 1]:
-                try:
-                    empty_lines = next(
-                        i for i, v in enumerate(handler.line_lengths[current[0] + 1 :]) if v > 1
-                    )
-                    current = (current[0] + 1 + empty_lines, 0)
-                except StopIteration:
+                next_line = handler.next_content_line(current[0])
+                if next_line is None:
                     break
+                current = (next_line, 0)
 
         if self.token:
+            closing = current if handler.stopped(current) else boundary
             elements = [
                 ContentElement(
                     token=self.token,
                     grammar=self.grammar,
-                    content=handler.read_pos(starting, boundary),
-                    characters=handler.chars(starting, boundary),
+                    content=handler.read_pos(starting, closing),
+                    characters=handler.chars(starting, closing),
                     children=elements,
                 )
             ]
@@ -509,10 +859,14 @@ class BeginEndParser(ParserHasPatterns):
             self.token = grammar.get("name")
             self.between_content = False
         self.apply_end_pattern_last = grammar.get("applyEndPatternLast", False)
-        self.exp_begin = re.compile(grammar["begin"])
-        self.exp_end = re.compile(grammar["end"])
+        self.exp_begin = self._compile(grammar["begin"])
+        self.exp_end = self._compile(grammar["end"])
+        self.prefilter = first_chars(grammar["begin"])
         self.parsers_begin = self._init_captures(grammar, key="beginCaptures")
         self.parsers_end = self._init_captures(grammar, key="endCaptures")
+        self._index_unanchored = PatternIndex([])
+        self.line_budget: int | None = None
+        self.lazy = False
         if "\\G" in grammar["begin"]:
             self.anchored = True
 
@@ -527,6 +881,12 @@ class BeginEndParser(ParserHasPatterns):
         """When the grammar has patterns, this method should called to initialize its inclusions."""
         self.initialized = True
         super()._initialize_repository()
+        self._index_unanchored = PatternIndex(
+            [parser for parser in self._index.parsers if not parser.anchored]
+        )
+        if self.language_parser is not None:
+            self.line_budget = self.language_parser._block_line_budget(self)
+            self.lazy = bool(self.token) and self.language_parser._lazy_block(self)
         for key, value in self.parsers_end.items():
             if not isinstance(value, GrammarParser):
                 self.parsers_end[key] = self._find_include(value)
@@ -540,16 +900,19 @@ class BeginEndParser(ParserHasPatterns):
             if not parser.initialized:
                 parser._initialize_repository()
 
-    @track_depth
-    def _parse(
+    def _parse_steps(
         self,
         handler: ContentHandler,
         starting: POS,
         boundary: POS,
         greedy: bool = False,
+        expand: bool = False,
         **kwargs,
-    ) -> tuple[bool, list[Capture | ContentElement], tuple[POS, POS] | None]:
-        """The parse method for grammars for which a begin/end pattern is provided."""
+    ) -> PARSE_STEPS:
+        """The parse method for grammars for which a begin/end pattern is provided.
+
+        The contents of a lazy block are only located, unless it is expanded, see ``_parse_lazy_steps``.
+        """
 
         begin_span, _, begin_elements = self.match_and_capture(
             handler,
@@ -562,52 +925,100 @@ class BeginEndParser(ParserHasPatterns):
         )
 
         if not begin_span:
-            LOGGER.debug(
-                f"{self.__class__.__name__} no begin match",
+            if __debug__ and LOGGER.debug_enabled:
+                LOGGER.debug(
+                    f"{self.__class__.__name__} no begin match",
+                    self,
+                    starting,
+                    kwargs.get("depth", 0),
+                )
+            return False, [], None
+        if __debug__ and LOGGER.info_enabled:
+            LOGGER.info(
+                f"{self.__class__.__name__} found begin",
                 self,
                 starting,
                 kwargs.get("depth", 0),
             )
-            return False, [], None
-        LOGGER.info(
-            f"{self.__class__.__name__} found begin",
-            self,
-            starting,
-            kwargs.get("depth", 0),
-        )
 
         # Get initial and boundary positions
         current = begin_span[1]
         if boundary is None:
             boundary = (len(handler.lines) - 1, handler.line_lengths[-1])
 
+        # A block that did not find its end pattern is not scanned again when it is retried. The result
+        # depends on the parent capture through its equality, see ``match_and_capture``
+        parent_capture = kwargs.get("parent_capture")
+        capture_key = parent_capture and (
+            parent_capture.key,
+            parent_capture.starting,
+            parent_capture.matching.group(),
+        )
+        checkpoint = (self, begin_span, boundary, capture_key)
+        if checkpoint in handler.unterminated_blocks:
+            result, handler.anchor = handler.unterminated_blocks[checkpoint]
+            return result
+
+        if self.lazy and handler.lazy_blocks and not expand:
+            result = yield from self._parse_lazy_steps(
+                handler, begin_span, begin_elements, boundary, **kwargs
+            )
+            if result is not None:
+                return result
+
         # Define loop parameters
         end_elements: list[Capture | ContentElement] = []
         mid_elements: list[Capture | ContentElement] = []
-        patterns = [parser for parser in self.patterns if not parser.disabled]
+        index = self._index
         first_run = True
+        unterminated = False
+        end_span: tuple[POS, POS] | None = None
+
+        # Close the block after its line budget, such that the remainder is parsed once. The nested blocks
+        # without end are closed within the budget as well, as they are bounded by the block
+        budget_boundary = None
+        if self.line_budget is not None:
+            last_line = begin_span[1][0] + self.line_budget
+            if last_line < boundary[0]:
+                budget_boundary = boundary = (last_line, handler.line_lengths[last_line])
 
         while current <= boundary:
+            if current[0] >= handler.check_line:
+                handler.check(current)
+
+            if handler.stopped(current):
+                # Close the block at the current position, as the parse is stopped
+                closing = current
+                end_span = (current, current)
+                end_elements = []
+                break
+
             parsed = False
+            # The parse is only stopped within the patterns that are accepted
+            stop_position = handler.stop_position
 
             # Create boolean that is enabled when a parser is recursively called. In this its end pattern should
             # be applied last, otherwise the same span will be recognzed as the end pattern by the upper level parser
             apply_end_pattern_last = False
 
             # Try to find patterns first with no leading whitespace charaters allowed
+            patterns = index.select(handler.start_chars(current, boundary))
             for parser in patterns:
-                parsed, capture_elements, capture_span = parser._parse(
-                    handler, current, boundary=boundary, greedy=False, **kwargs
+                parsed, capture_elements, capture_span = yield (
+                    parser,
+                    current,
+                    dict(kwargs, boundary=boundary, greedy=False),
                 )
                 if parsed:
                     if parser == self:
                         apply_end_pattern_last = True
-                    LOGGER.debug(
-                        f"{self.__class__.__name__} found pattern (no ws)",
-                        self,
-                        current,
-                        kwargs.get("depth", 0),
-                    )
+                    if __debug__ and LOGGER.debug_enabled:
+                        LOGGER.debug(
+                            f"{self.__class__.__name__} found pattern (no ws)",
+                            self,
+                            current,
+                            kwargs.get("depth", 0),
+                        )
                     break
 
             # Try to find the end pattern with no leading whitespace charaters allowed
@@ -623,32 +1034,39 @@ class BeginEndParser(ParserHasPatterns):
 
             if not parsed and not end_span:
                 # Try to find the patterns and end pattern allowing for leading whitespace charaters
+                if handler.profiler is not None:
+                    handler.profiler.rule(self).greedy_fallbacks += 1
 
-                LOGGER.info(
-                    f"{self.__class__.__name__} getting all pattern options",
-                    self,
-                    current,
-                    kwargs.get("depth", 0),
-                )
+                if __debug__ and LOGGER.info_enabled:
+                    LOGGER.info(
+                        f"{self.__class__.__name__} getting all pattern options",
+                        self,
+                        current,
+                        kwargs.get("depth", 0),
+                    )
 
-                options_span, options_elements = {}, {}
+                options_span, options_elements, options_stop = {}, {}, {}
+                patterns = index.select(handler.start_chars(current, boundary, greedy=True))
                 for parser in patterns:
-                    parsed, capture_elements, capture_span = parser._parse(
-                        handler,
+                    parsed, capture_elements, capture_span = yield (
+                        parser,
                         current,
-                        boundary=boundary,
-                        greedy=True,
-                        **kwargs,
+                        dict(kwargs, boundary=boundary, greedy=True),
+                    )
+                    options_stop[parser], handler.stop_position = (
+                        handler.stop_position,
+                        stop_position,
                     )
                     if parsed:
                         options_span[parser] = capture_span
                         options_elements[parser] = capture_elements
-                        LOGGER.debug(
-                            f"{self.__class__.__name__} found pattern choice",
-                            self,
-                            current,
-                            kwargs.get("depth", 0),
-                        )
+                        if __debug__ and LOGGER.debug_enabled:
+                            LOGGER.debug(
+                                f"{self.__class__.__name__} found pattern choice",
+                                self,
+                                current,
+                                kwargs.get("depth", 0),
+                            )
 
                 if options_span:
                     parsed = True
@@ -661,16 +1079,18 @@ class BeginEndParser(ParserHasPatterns):
                     )[0]
                     capture_span = options_span[parser]
                     capture_elements = options_elements[parser]
+                    handler.stop_position = options_stop[parser]
 
                     if parser == self:
                         apply_end_pattern_last = True
 
-                    LOGGER.info(
-                        f"{self.__class__.__name__} chosen pattern of {parser}",
-                        self,
-                        current,
-                        kwargs.get("depth", 0),
-                    )
+                    if __debug__ and LOGGER.info_enabled:
+                        LOGGER.info(
+                            f"{self.__class__.__name__} chosen pattern of {parser}",
+                            self,
+                            current,
+                            kwargs.get("depth", 0),
+                        )
 
                 end_span, end_content, end_elements = self.match_and_capture(
                     handler,
@@ -701,80 +1121,97 @@ class BeginEndParser(ParserHasPatterns):
                     if pattern_at_end and (end_before_pattern or empty_span_end):
                         if empty_span_end:
                             # Both found capture pattern and end pattern are accepted, break pattern search
-                            LOGGER.debug(
-                                f"{self.__class__.__name__} capture+end: both accepted, break",
-                                self,
-                                current,
-                                kwargs.get("depth", 0),
-                            )
+                            if __debug__ and LOGGER.debug_enabled:
+                                LOGGER.debug(
+                                    f"{self.__class__.__name__} capture+end: both accepted, break",
+                                    self,
+                                    current,
+                                    kwargs.get("depth", 0),
+                                )
+                            if handler.stop_check is not None:
+                                handler.stop_check.accept(capture_elements, capture_span)
                             mid_elements.extend(capture_elements)
                             closing = end_span[0] if self.between_content else end_span[1]
                             break
                         elif not self.apply_end_pattern_last and not apply_end_pattern_last:
                             # End pattern prioritized over capture pattern, break pattern search
-                            LOGGER.debug(
-                                f"{self.__class__.__name__} capture+end: end prioritized, break",
-                                self,
-                                current,
-                                kwargs.get("depth", 0),
-                            )
+                            if __debug__ and LOGGER.debug_enabled:
+                                LOGGER.debug(
+                                    f"{self.__class__.__name__} capture+end: end prioritized, break",
+                                    self,
+                                    current,
+                                    kwargs.get("depth", 0),
+                                )
+                            handler.stop_position = stop_position
                             closing = end_span[0] if self.between_content else end_span[1]
                             break
                         else:
                             # Capture pattern prioritized over end pattern, continue pattern search
-                            LOGGER.debug(
-                                f"{self.__class__.__name__} capture+end: capture prioritized, continue",
-                                self,
-                                current,
-                                kwargs.get("depth", 0),
-                            )
+                            if __debug__ and LOGGER.debug_enabled:
+                                LOGGER.debug(
+                                    f"{self.__class__.__name__} capture+end: capture prioritized, continue",
+                                    self,
+                                    current,
+                                    kwargs.get("depth", 0),
+                                )
+                            if handler.stop_check is not None:
+                                handler.stop_check.accept(capture_elements, capture_span)
                             mid_elements.extend(capture_elements)
                             current = capture_span[1]
 
                     elif capture_span[0] < end_span[0]:
                         # Capture pattern found before end pattern, continue pattern search
-                        LOGGER.debug(
-                            f"{self.__class__.__name__} capture<end: leading capture, continue",
-                            self,
-                            current,
-                            kwargs.get("depth", 0),
-                        )
+                        if __debug__ and LOGGER.debug_enabled:
+                            LOGGER.debug(
+                                f"{self.__class__.__name__} capture<end: leading capture, continue",
+                                self,
+                                current,
+                                kwargs.get("depth", 0),
+                            )
+                        if handler.stop_check is not None:
+                            handler.stop_check.accept(capture_elements, capture_span)
                         mid_elements.extend(capture_elements)
                         current = capture_span[1]
                     else:
                         # End pattern found before capture pattern, break pattern search
+                        if __debug__ and LOGGER.debug_enabled:
+                            LOGGER.debug(
+                                f"{self.__class__.__name__} end<capture: leading end, break",
+                                self,
+                                current,
+                                kwargs.get("depth", 0),
+                            )
+                        handler.stop_position = stop_position
+                        closing = end_span[0] if self.between_content else end_span[1]
+                        break
+                else:
+                    # No capture pattern found, accept end pattern and break pattern search
+                    if __debug__ and LOGGER.debug_enabled:
                         LOGGER.debug(
-                            f"{self.__class__.__name__} end<capture: leading end, break",
+                            f"{self.__class__.__name__} end: break",
                             self,
                             current,
                             kwargs.get("depth", 0),
                         )
-                        closing = end_span[0] if self.between_content else end_span[1]
-                        break
-                else:
-                    # No capture pattern found, accept end pattern and break pattern search
-                    LOGGER.debug(
-                        f"{self.__class__.__name__} end: break",
-                        self,
-                        current,
-                        kwargs.get("depth", 0),
-                    )
                     closing = end_span[0] if self.between_content else end_span[1]
                     break
             else:  # No end pattern found
                 if parsed:
                     # Append found capture pattern and find next starting position
+                    if handler.stop_check is not None:
+                        handler.stop_check.accept(capture_elements, capture_span)
                     mid_elements.extend(capture_elements)
 
                     if handler.read(capture_span[1], skip_newline=False) == "\n":
                         # Next character after capture pattern is newline
 
-                        LOGGER.debug(
-                            f"{self.__class__.__name__} capture: next is newline, continue",
-                            self,
-                            current,
-                            kwargs.get("depth", 0),
-                        )
+                        if __debug__ and LOGGER.debug_enabled:
+                            LOGGER.debug(
+                                f"{self.__class__.__name__} capture: next is newline, continue",
+                                self,
+                                current,
+                                kwargs.get("depth", 0),
+                            )
 
                         end_span, _, _ = self.match_and_capture(
                             handler,
@@ -793,19 +1230,21 @@ class BeginEndParser(ParserHasPatterns):
                             # Skip the newline character in the next pattern search round
                             current = handler.next(capture_span[1])
                     else:
-                        LOGGER.debug(
-                            f"{self.__class__.__name__} capture: continue",
-                            self,
-                            current,
-                            kwargs.get("depth", 0),
-                        )
+                        if __debug__ and LOGGER.debug_enabled:
+                            LOGGER.debug(
+                                f"{self.__class__.__name__} capture: continue",
+                                self,
+                                current,
+                                kwargs.get("depth", 0),
+                            )
                         current = capture_span[1]
                 else:
                     # No capture patterns nor end patterns found. Skip the current line.
                     line = handler.read_line(current)
 
-                    if line and not line.isspace():
-                        LOGGER.warning(
+                    if line and not line.isspace() and current[0] not in handler.skipped_lines:
+                        handler.diagnose(
+                            "not_parsed",
                             f"No patterns found in line, skipping < {repr(line)} >",
                             self,
                             current,
@@ -818,22 +1257,35 @@ class BeginEndParser(ParserHasPatterns):
 
             if first_run:
                 # Skip all parsers that were anchored to the begin pattern after the first round
-                patterns = [parser for parser in patterns if not parser.anchored]
+                index = self._index_unanchored
                 first_run = False
         else:
             # Did not break out of while loop, set closing to boundary
             closing = boundary
             end_span = ((0, 0), boundary)
+            unterminated = True
+            if boundary == budget_boundary:
+                closing = handler.next(boundary)
+                end_span = (closing, closing)
+                handler.diagnose(
+                    "recovered",
+                    f"{self.__class__.__name__} end not found within {self.line_budget} lines, "
+                    f"closing block at {closing}",
+                    self,
+                    begin_span[0],
+                    kwargs.get("depth", 0),
+                )
 
         start = begin_span[1] if self.between_content else begin_span[0]
 
         content = handler.read_pos(start, closing)
-        LOGGER.info(
-            f"{self.__class__.__name__} found < {repr(content)} >",
-            self,
-            start,
-            kwargs.get("depth", 0),
-        )
+        if __debug__ and LOGGER.info_enabled:
+            LOGGER.info(
+                f"{self.__class__.__name__} found < {repr(content)} >",
+                self,
+                start,
+                kwargs.get("depth", 0),
+            )
 
         # Construct output elements
         if self.token:
@@ -851,8 +1303,155 @@ class BeginEndParser(ParserHasPatterns):
         else:
             elements = begin_elements + mid_elements + end_elements
 
+        if unterminated:
+            handler.unterminated_blocks[checkpoint] = (
+                (True, elements, (begin_span[0], end_span[1])),
+                handler.anchor,
+            )
         return True, elements, (begin_span[0], end_span[1])
 
+    def _parse_lazy_steps(
+        self,
+        handler: ContentHandler,
+        begin_span: tuple[POS, POS],
+        begin_elements: list[Capture | ContentElement],
+        boundary: POS,
+        **kwargs,
+    ) -> Generator[tuple[Any, POS, dict], Any, PARSE_RESULT | None]:
+        """Parses a lazy block, of which the contents are parsed when its children are first accessed.
+
+        A pattern that is anchored to the begin pattern, such as a declaration, is parsed with the block.
+        The end pattern of the remaining contents is located by the language parser, without parsing the
+        contents. If it cannot be located, None is returned and the block is parsed in full.
+        """
+        current, anchor = begin_span[1], handler.anchor
+        leading: list[Capture | ContentElement] = []
+        for parser in self._index.select(handler.start_chars(current, boundary)):
+            parsed, capture_elements, capture_span = yield (
+                parser,
+                current,
+                dict(kwargs, boundary=boundary, greedy=False),
+            )
+            if parsed:
+                if parser.anchored:
+                    leading, current = capture_elements, capture_span[1]
+                break
+
+        located = self.language_parser._skim_block(  # type: ignore
+            self, handler, begin_span, current, boundary
+        )
+        end_span: tuple[POS, POS] | None = None
+        end_elements: list[Capture | ContentElement] = []
+        if located is not None:
+            end_span, _, end_elements = self.match_and_capture(
+                handler,
+                self.exp_end,
+                located,
+                boundary=boundary,
+                parsers=self.parsers_end,
+                greedy=False,
+                **kwargs,
+            )
+        if not end_span:
+            # The contents are parsed from the begin pattern, to which the leading pattern is anchored
+            handler.anchor = anchor
+            return None
+
+        start = begin_span[1] if self.between_content else begin_span[0]
+        closing = end_span[0] if self.between_content else end_span[1]
+        content = handler.read_pos(start, closing)
+        if __debug__ and LOGGER.info_enabled:
+            LOGGER.info(
+                f"{self.__class__.__name__} located < {repr(content)} >",
+                self,
+                start,
+                kwargs.get("depth", 0),
+            )
+
+        span = (begin_span[0], end_span[1])
+        contents = _LazyContents(handler, self, span, boundary, len(leading), **kwargs)
+        contents.element = element = LazyBlockElement(
+            token=self.token,
+            grammar=self.grammar,
+            content=content,
+            characters=handler.chars(start, closing),
+            children=leading,
+            begin=begin_elements,
+            end=end_elements,
+            contents=contents,
+        )
+        return True, [element], span
+
+
+class _LazyContents(Capture):
+    """The contents of a lazy block, which are parsed by parsing the block in full when dispatched."""
+
+    def __init__(
+        self,
+        handler: ContentHandler,
+        parser: BeginEndParser,
+        span: tuple[POS, POS],
+        boundary: POS,
+        leading: int,
+        **kwargs,
+    ) -> None:
+        self.handler = handler
+        self.parser = parser
+        self.span = span
+        self.boundary = boundary
+        self.leading = leading
+        self.kwargs = kwargs
+        self.element: LazyBlockElement | None = None
+        # The lines that were not tokenized when the block was located are not tokenized either
+        self.skipped_lines = {
+            line for line in handler.skipped_lines if span[0][0] <= line <= span[1][0]
+        }
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, _LazyContents) and (self.parser, self.span) == (
+            other.parser,
+            other.span,
+        )
+
+    def __repr__(self) -> str:
+        return f"@contents<{self.parser.key}>"
+
+    def dispatch(self) -> list[Capture | ContentElement]:
+        handler = self.handler
+        # The block is parsed after the parse of the content, without its cancellation and progress checks
+        check_line, anchor = handler.check_line, handler.anchor
+        skipped_lines = self.skipped_lines - handler.skipped_lines
+        handler.check_line = float("inf")
+        handler.skipped_lines.update(skipped_lines)
+        try:
+            parsed, elements, span = self.parser.parse(
+                handler, self.span[0], boundary=self.boundary, expand=True, **self.kwargs
+            )
+        finally:
+            handler.check_line, handler.anchor = check_line, anchor
+            handler.skipped_lines.difference_update(skipped_lines)
+
+        if span != self.span:
+            handler.diagnose(
+                "lazy_mismatch",
+                f"{self.parser.__class__.__name__} parsed the block at {span}, "
+                f"but located it at {self.span}",
+                self.parser,
+                self.span[0],
+            )
+        if not parsed or not isinstance(elements[0], ContentBlockElement):
+            return []
+        block = elements[0]
+        if span != self.span and self.element is not None:
+            # The element takes the content and end of the block as it is parsed in full
+            element = self.element
+            element.content, element.characters = block.content, block.characters
+            if element._dispatched:
+                element._end = _dispatch_list(block._end_captures, parent=element)
+            else:
+                element._end_captures = block._end_captures
+        return block._children_captures[self.leading :]
+
 
 class BeginWhileParser(PatternsParser):
     """The parser for grammars for which a begin/end pattern is provided."""
@@ -865,8 +1464,8 @@ class BeginWhileParser(PatternsParser):
         else:
             self.token = grammar.get("name")
             self.between_content = False
-        self.exp_begin = re.compile(grammar["begin"])
-        self.exp_while = re.compile(grammar["while"])
+        self.exp_begin = self._compile(grammar["begin"])
+        self.exp_while = self._compile(grammar["while"])
         self.parsers_begin = self._init_captures(grammar, key="beginCaptures")
         self.parsers_while = self._init_captures(grammar, key="whileCaptures")
 
@@ -894,11 +1493,12 @@ class BeginWhileParser(PatternsParser):
             if not parser.initialized:
                 parser._initialize_repository()
 
-    def _parse(
+    def _parse_steps(
         self,
         handler: ContentHandler,
         starting: POS,
+        *args,
         **kwargs,
-    ):
+    ) -> PARSE_STEPS:
         """The parse method for grammars for which a begin/while pattern is provided."""
         raise NotImplementedError
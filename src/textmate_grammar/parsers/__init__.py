@@ -0,0 +1,28 @@
+from __future__ import annotations
+
+import importlib
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .base import LanguageParser
+
+#: The module and class name of the language parser of each language.
+LANGUAGES: dict[str, tuple[str, str]] = {
+    "matlab": ("textmate_grammar.parsers.matlab", "MatlabParser"),
+    "markdown": ("textmate_grammar.parsers.markdown", "MarkdownParser"),
+}
+
+
+def load_parser(language: str, **kwargs) -> LanguageParser:
+    """
+    Imports and constructs the language parser of a language.
+
+    :param language: The name of the language, one of ``LANGUAGES``.
+    :param kwargs: The keyword arguments of the language parser.
+    :return: The language parser.
+    :raises ValueError: If the language is unknown.
+    """
+    if language not in LANGUAGES:
+        raise ValueError(f"Unknown language {language}, expected one of {', '.join(LANGUAGES)}")
+    module, name = LANGUAGES[language]
+    return getattr(importlib.import_module(module), name)(**kwargs)
@@ -1,13 +1,30 @@
 from __future__ import annotations
 
+import asyncio
+import os
+import threading
+from concurrent.futures import Executor
+from functools import cached_property
 from pathlib import Path
+from time import monotonic
+from typing import AsyncIterator, Callable, Iterable, Iterator
 
 from ..elements import Capture, ContentElement
 from ..handler import POS, ContentHandler
-from ..parser import GrammarParser, PatternsParser
+from ..parser import PARSE_STEPS, BeginEndParser, GrammarParser, PatternsParser
+from ..utils.aio import aparse_file, aparse_files, aparse_string
 from ..utils.cache import TextmateCache, init_cache
-from ..utils.exceptions import IncompatibleFileType
+from ..utils.cancellation import CancellationToken
+from ..utils.chunks import parse_chunked
+from ..utils.exceptions import IncompatibleFileType, ParseCancelled
+from ..utils.incremental import parse_incremental
 from ..utils.logger import LOGGER
+from ..utils.pool import parse_files
+from ..utils.profiler import Profiler, ProfileReport
+from ..utils.regex import BackendDecision, decide_backend
+from ..utils.stop import StopCondition, stop_parse
+from ..utils.tokens import grammar_table
+from ..utils.tracer import Tracer
 
 LANGUAGE_PARSERS = {}
 
@@ -16,25 +33,76 @@ class DummyParser(GrammarParser):
     """A dummy parser object"""
 
     def __init__(self):
+        self.grammar = {}
         self.key = "DummyLanguage"
+        self.token = ""
         self.initialized = True
+        self.anchored = False
 
     def _initialize_repository(self):
         pass
 
     def _parse(self, *args, **kwargs):
-        pass
+        return False, [], None
 
 
 class LanguageParser(PatternsParser):
     """The parser of a language grammar."""
 
-    def __init__(self, grammar: dict, **kwargs):
+    def __new__(cls, *args, **kwargs):
+        # Store the constructor arguments, such that the parser can be pickled by reconstructing it
+        parser = super().__new__(cls)
+        parser._init_args = (args, kwargs)
+        return parser
+
+    def __reduce__(self):
+        args, kwargs = self._init_args
+        return _rebuild_language_parser, (self.__class__, args, kwargs)
+
+    def __init__(
+        self,
+        grammar: dict,
+        merge_keywords: bool = True,
+        regex_backend: str = "auto",
+        profile: bool = False,
+        tracer: Tracer | None = None,
+        block_line_budget: int | dict[str, int] | None = None,
+        max_line_length: int | None = None,
+        line_time_limit: float | None = None,
+        lazy_blocks: Iterable[str] | None = None,
+        **kwargs,
+    ):
         """
         Initialize a Language object.
 
         :param grammar: The grammar definition for the language.
         :type grammar: dict
+        :param merge_keywords: Whether to merge adjacent keyword rules into trie-backed parsers.
+        :type merge_keywords: bool
+        :param regex_backend: The regex backend, "auto" to match compatible patterns with Python's re
+            module, or "oniguruma" to match all patterns with oniguruma.
+        :type regex_backend: str
+        :param profile: Whether to record per-rule profiling counters during each parse.
+        :type profile: bool
+        :param tracer: A tracer that records the parse attempts of the rules during each parse.
+        :type tracer: Tracer | None
+        :param block_line_budget: The maximal number of lines that a begin/end block spans when its end
+            pattern is not found, after which the block is closed and a "recovered" diagnostic is recorded.
+            Either a single budget for all rules, or a budget per rule scope name or repository key.
+            Defaults to None, for blocks that continue up to their boundary.
+        :type block_line_budget: int | dict[str, int] | None
+        :param max_line_length: The maximal number of characters of a line to tokenize. Longer lines are
+            only part of their enclosing elements, and a "line_too_long" diagnostic is recorded.
+        :type max_line_length: int | None
+        :param line_time_limit: The time in seconds spent searching a line, after which the tokenization
+            of the line is aborted. The remainder of the line is only part of its enclosing elements, and
+            a "line_time_limit" diagnostic is recorded.
+        :type line_time_limit: float | None
+        :param lazy_blocks: The scope names or repository keys of the begin/end block rules of which the
+            contents are only located when parsed, and parsed when the children of the block are first
+            accessed. Only blocks of which the language parser can locate the end are lazy. Defaults to
+            None, for blocks that are parsed in full.
+        :type lazy_blocks: Iterable[str] | None
         :param pre_processor: A pre-processor to use on the input string of the parser
         :type pre_processor: BasePreProcessor
         :param kwargs: Additional keyword arguments.
@@ -47,6 +115,11 @@ class LanguageParser(PatternsParser):
         :ivar injections: The list of injection rules for the language.
         :ivar _cache: The cache object for the language.
         """
+        self.regex_backend = regex_backend
+        self.block_line_budget = block_line_budget
+        self.max_line_length = max_line_length
+        self.line_time_limit = line_time_limit
+        self.lazy_blocks = frozenset(lazy_blocks or ())
 
         super().__init__(
             grammar, key=grammar.get("name", "myLanguage"), language_parser=self, **kwargs
@@ -59,6 +132,11 @@ class LanguageParser(PatternsParser):
         self.repository = {}
         self.injections: list[dict] = []
         self._cache: TextmateCache = init_cache()
+        self.merge_keywords = merge_keywords
+        self.profile = profile
+        # The profiling reports are kept per thread, as a parser can be shared by several threads
+        self._profile_reports = threading.local()
+        self.tracer = tracer
 
         # Initialize grammars in repository
         for repo in _gen_repositories(grammar):
@@ -84,6 +162,65 @@ class LanguageParser(PatternsParser):
     def __repr__(self) -> str:
         return f"{self.__class__.__name__}:{self.key}"
 
+    @property
+    def profile_report(self) -> ProfileReport | None:
+        """The per-rule profiling report of the last parse in the current thread, if profiling is enabled."""
+        return getattr(self._profile_reports, "report", None)
+
+    def backend_report(self) -> list[BackendDecision]:
+        """
+        Reports the regex backend that is used for each pattern of the grammar.
+
+        :return: A list of backend decisions, one for each compiled pattern.
+        """
+        report = []
+        for parser in _gen_parsers(self):
+            for attribute in ["exp_match", "exp_begin", "exp_end", "exp_while"]:
+                pattern = getattr(parser, attribute, None)
+                if pattern is not None:
+                    report.append(decide_backend(f"{parser!r}.{attribute}", pattern))
+        return report
+
+    def _block_line_budget(self, parser: GrammarParser) -> int | None:
+        """Returns the line budget of a begin/end block rule."""
+        if isinstance(self.block_line_budget, dict):
+            return self.block_line_budget.get(
+                parser.token, self.block_line_budget.get(parser.key, None)
+            )
+        return self.block_line_budget
+
+    def _lazy_block(self, parser: GrammarParser) -> bool:
+        """Returns whether the contents of a begin/end block rule are parsed lazily."""
+        return parser.token in self.lazy_blocks or parser.key in self.lazy_blocks
+
+    def _skim_block(
+        self,
+        parser: BeginEndParser,
+        handler: ContentHandler,
+        begin_span: tuple[POS, POS],
+        starting: POS,
+        boundary: POS,
+    ) -> POS | None:
+        """
+        Locates the end pattern of a lazy begin/end block, without parsing its contents.
+
+        This method can be overloaded in language specific parsers with a scan of the block structure.
+
+        :param parser: The parser of the block.
+        :param handler: The content handler.
+        :param begin_span: The span of the begin pattern of the block.
+        :param starting: The position from which the contents are located.
+        :param boundary: The boundary position of the block.
+        :return: The position at which the end pattern of the block matches, or None to parse the
+            block in full.
+        """
+        return None
+
+    @cached_property
+    def _grammar_table(self) -> list[dict]:
+        """The nested grammars of the language, by which token arrays refer to the grammars of elements."""
+        return grammar_table(self.grammar)
+
     @staticmethod
     def _find_include_scopes(key: str):
         return LANGUAGE_PARSERS.get(key, DummyParser())
@@ -112,69 +249,330 @@ class LanguageParser(PatternsParser):
 
         super()._initialize_repository()
 
-    def parse_file(self, filePath: str | Path, **kwargs) -> ContentElement | None:
+    def parse_file(
+        self,
+        filePath: str | Path,
+        cancel: CancellationToken | None = None,
+        timeout: float | None = None,
+        progress: Callable[[int, int], None] | None = None,
+        stop_when: StopCondition | None = None,
+        **kwargs,
+    ) -> ContentElement | None:
         """
         Parses an entire file with the current grammar.
 
         :param filePath: The path to the file to be parsed.
+        :param cancel: A token to cancel the parse. Defaults to None.
+        :param timeout: The time in seconds after which the parse is cancelled. Defaults to None.
+        :param progress: A callback of the number of parsed lines and the total number of lines. Defaults to None.
+        :param stop_when: A condition at which the parse stops, returning the partial element tree: the
+            number of lines to parse, the scope names of the rules of which the first element stops the
+            parse, or a predicate on the top-level elements. A partial element tree is not cached, while a
+            cached file is loaded in full. Defaults to None, to parse the entire file.
         :param kwargs: Additional keyword arguments to be passed to the parser.
         :return: The parsed element if successful, None otherwise.
+        :raises ParseCancelled: If the parse is cancelled, or DeadlineExceeded if the timeout has passed.
         """
-        if not isinstance(filePath, Path):
-            filePath = Path(filePath).resolve()
+        deadline = monotonic() + timeout if timeout is not None else None
+        filePath = self._check_path(filePath)
 
-        if filePath.suffix.split(".")[-1] not in self.file_types:
-            raise IncompatibleFileType(extensions=self.file_types)
-
-        if self._cache.cache_valid(filePath):
+        element: ContentElement | None
+        if self._cache.cache_valid(filePath) and not (self.profile or self.tracer):
             element = self._cache.load(filePath)
+        elif stop_when is not None:
+            element = self._parse_path(
+                filePath, cancel, deadline, progress, stop_when=stop_when, **kwargs
+            )
         else:
-            handler = ContentHandler.from_path(filePath, pre_processor=self.pre_process, **kwargs)
-            if handler.content == "":
-                return None
-
-            # Configure logger
-            LOGGER.configure(self, height=len(handler.lines), width=max(handler.line_lengths))
-            element = self._parse_language(handler, **kwargs)  # type: ignore
-
+            # The previous parse of a changed file is reused where the file did not change
+            previous = self._cache.load_previous(filePath)
+            element = self._parse_path(
+                filePath, cancel, deadline, progress, previous=previous, incremental=True, **kwargs
+            )
             if element is not None:
                 self._cache.save(filePath, element)
         return element
 
-    def parse_string(self, input: str, **kwargs) -> ContentElement | None:
+    def parse_files(
+        self,
+        paths: Iterable[str | Path],
+        workers: int | None = None,
+        ordered: bool = True,
+        start_method: str | None = None,
+        timings: dict[Path, float] | None = None,
+    ) -> Iterator[tuple[Path, ContentElement | None]]:
+        """
+        Parses many files in a pool of worker processes.
+
+        Each worker constructs the parser once. Cached files are loaded from the cache of this parser,
+        and the parsed files are saved to it. The largest files are scheduled first.
+
+        :param paths: The paths to the files to be parsed.
+        :param workers: The number of worker processes. Defaults to the number of CPUs.
+        :param ordered: Whether to yield the results in the order of the paths, or as they complete.
+            Defaults to True.
+        :param start_method: The multiprocessing start method, such as "fork" or "forkserver". Defaults
+            to the default start method of the platform.
+        :param timings: A dictionary to which the parse time in seconds of every file that is not
+            cached is written. Defaults to None.
+        :return: An iterator of the resolved paths and their parsed elements.
+        """
+        return parse_files(
+            self,
+            paths,
+            workers=workers,
+            ordered=ordered,
+            start_method=start_method,
+            timings=timings,
+        )
+
+    def parse_file_chunked(
+        self, filePath: str | Path, workers: int | None = None, start_method: str | None = None
+    ) -> ContentElement | None:
+        """
+        Parses a large file in chunks in a pool of worker processes.
+
+        The file is split at lines where the language is likely to return to its root scope, such as
+        blank lines between top-level functions. The chunks are parsed speculatively, and any part of a
+        chunk that does not continue the parse of the preceding content is parsed again, such that the
+        result is the same as of ``parse_file``.
+
+        :param filePath: The path to the file to be parsed.
+        :param workers: The number of worker processes. Defaults to the number of CPUs.
+        :param start_method: The multiprocessing start method. Defaults to the platform default.
+        :return: The parsed element if successful, None otherwise.
+        """
+        filePath = self._check_path(filePath)
+        if self._cache.cache_valid(filePath):
+            return self._cache.load(filePath)
+
+        handler = ContentHandler.from_path(filePath, pre_processor=self.pre_process)
+        if handler.content == "":
+            return None
+        LOGGER.configure(self, height=len(handler.lines), width=max(handler.line_lengths))
+
+        element = parse_chunked(self, handler, workers or os.cpu_count() or 1, start_method)
+        if element is not None:
+            self._cache.save(filePath, element)
+        return element
+
+    def _check_path(self, filePath: str | Path) -> Path:
+        """Resolves a path and checks that its file type is supported by the language."""
+        if not isinstance(filePath, Path):
+            filePath = Path(filePath).resolve()
+
+        if filePath.suffix.split(".")[-1] not in self.file_types:
+            raise IncompatibleFileType(extensions=self.file_types)
+        return filePath
+
+    def _parse_path(
+        self,
+        filePath: Path,
+        cancel: CancellationToken | None = None,
+        deadline: float | None = None,
+        progress: Callable[[int, int], None] | None = None,
+        previous: ContentElement | None = None,
+        incremental: bool = False,
+        stop_when: StopCondition | None = None,
+        **kwargs,
+    ) -> ContentElement | None:
+        """Parses a file without using the cache.
+
+        If incremental, the elements of the previous parse of the file are reused where it did not change.
+        """
+        handler = ContentHandler.from_path(filePath, pre_processor=self.pre_process, **kwargs)
+        if handler.content == "":
+            return None
+        handler.watch(cancel, deadline, progress)
+
+        # Configure logger
+        LOGGER.configure(self, height=len(handler.lines), width=max(handler.line_lengths))
+        if incremental and not (self.profile or self.tracer is not None or kwargs):
+            return parse_incremental(self, handler, previous)
+        return self._parse_language(handler, stop_when=stop_when, **kwargs)
+
+    def parse_string(
+        self,
+        input: str,
+        cancel: CancellationToken | None = None,
+        timeout: float | None = None,
+        progress: Callable[[int, int], None] | None = None,
+        stop_when: StopCondition | None = None,
+        **kwargs,
+    ) -> ContentElement | None:
         """
         Parses an input string.
 
         :param input: The input string to be parsed.
+        :param cancel: A token to cancel the parse. Defaults to None.
+        :param timeout: The time in seconds after which the parse is cancelled. Defaults to None.
+        :param progress: A callback of the number of parsed lines and the total number of lines. Defaults to None.
+        :param stop_when: A condition at which the parse stops, returning the partial element tree, see
+            ``parse_file``. Defaults to None, to parse the entire string.
         :param kwargs: Additional keyword arguments.
         :return: The result of parsing the input string.
+        :raises ParseCancelled: If the parse is cancelled, or DeadlineExceeded if the timeout has passed.
         """
+        deadline = monotonic() + timeout if timeout is not None else None
         handler = ContentHandler(input, pre_processor=self.pre_process, **kwargs)
+        handler.watch(cancel, deadline, progress)
 
         # Configure logger
         LOGGER.configure(self, height=len(handler.lines), width=max(handler.line_lengths))
 
-        element = self._parse_language(handler, **kwargs)
+        element = self._parse_language(handler, stop_when=stop_when, **kwargs)
 
         return element
 
-    def _parse_language(self, handler: ContentHandler, **kwargs) -> ContentElement | None:
-        """Parses the current stream with the language scope."""
+    async def aparse_file(
+        self,
+        filePath: str | Path,
+        executor: Executor | None = None,
+        limiter: asyncio.Semaphore | None = None,
+        cancel: CancellationToken | None = None,
+        timeout: float | None = None,
+        progress: Callable[[int, int], None] | None = None,
+        **kwargs,
+    ) -> ContentElement | None:
+        """
+        Parses an entire file in an executor, without blocking the event loop.
 
-        parsed, elements, _ = self.parse(handler, (0, 0), **kwargs)
+        The file is decoded and parsed in the executor, and the cache is accessed in the default executor
+        of the event loop. When the awaiting task is cancelled, the parse is cancelled as well, except in a
+        process executor, which must be created by ``worker_pool`` and only stops waiting for the result.
 
-        if parsed:
-            element = elements[0]
-            element._dispatch(nested=True)  # type: ignore
-        else:
-            element = None
+        :param filePath: The path to the file to be parsed.
+        :param executor: The executor of the parse. Defaults to None, for the default executor.
+        :param limiter: A semaphore that is shared by concurrent calls, such as the request handlers of a
+            server, to bound the number of parses in flight. Defaults to None.
+        :param cancel: A token to cancel the parse. Defaults to None.
+        :param timeout: The time in seconds after which the parse is cancelled. Defaults to None.
+        :param progress: A callback of the number of parsed lines and the total number of lines, which is
+            called from the executor. Defaults to None.
+        :param kwargs: Additional keyword arguments to be passed to the parser.
+        :return: The parsed element if successful, None otherwise.
+        :raises ParseCancelled: If the parse is cancelled, or DeadlineExceeded if the timeout has passed.
+        """
+        deadline = monotonic() + timeout if timeout is not None else None
+        return await aparse_file(
+            self,
+            filePath,
+            executor,
+            limiter,
+            cancel=cancel,
+            deadline=deadline,
+            progress=progress,
+            **kwargs,
+        )
+
+    async def aparse_string(
+        self,
+        input: str,
+        executor: Executor | None = None,
+        limiter: asyncio.Semaphore | None = None,
+        cancel: CancellationToken | None = None,
+        timeout: float | None = None,
+        progress: Callable[[int, int], None] | None = None,
+        **kwargs,
+    ) -> ContentElement | None:
+        """
+        Parses an input string in an executor, without blocking the event loop.
+
+        :param input: The input string to be parsed.
+        :param executor: The executor of the parse. Defaults to None, for the default executor.
+        :param limiter: A semaphore that is shared by concurrent calls to bound the number of parses in
+            flight. Defaults to None.
+        :param cancel: A token to cancel the parse. Defaults to None.
+        :param timeout: The time in seconds after which the parse is cancelled. Defaults to None.
+        :param progress: A callback of the number of parsed lines and the total number of lines, which is
+            called from the executor. Defaults to None.
+        :param kwargs: Additional keyword arguments.
+        :return: The result of parsing the input string.
+        :raises ParseCancelled: If the parse is cancelled, or DeadlineExceeded if the timeout has passed.
+        """
+        return await aparse_string(
+            self,
+            input,
+            executor,
+            limiter,
+            cancel=cancel,
+            timeout=timeout,
+            progress=progress,
+            **kwargs,
+        )
+
+    def aparse_files(
+        self,
+        paths: Iterable[str | Path],
+        executor: Executor | None = None,
+        limiter: asyncio.Semaphore | None = None,
+        concurrency: int = 4,
+        ordered: bool = True,
+    ) -> AsyncIterator[tuple[Path, ContentElement | None]]:
+        """
+        Parses many files in an executor, with a bounded number of parses in flight.
+
+        A parse is only started when a result is consumed, such that a burst of files does not hold the
+        results of all files in memory.
+
+        :param paths: The paths to the files to be parsed.
+        :param executor: The executor of the parses. Defaults to None, for the default executor.
+        :param limiter: A semaphore that is shared by concurrent calls to bound the number of parses in
+            flight. Defaults to None.
+        :param concurrency: The maximal number of parses in flight of this call. Defaults to 4.
+        :param ordered: Whether to yield the results in the order of the paths, or as they complete.
+            Defaults to True.
+        :return: An asynchronous iterator of the resolved paths and their parsed elements.
+        """
+        return aparse_files(
+            self, paths, executor, limiter, concurrency=concurrency, ordered=ordered
+        )
+
+    def _parse_language(
+        self, handler: ContentHandler, stop_when: StopCondition | None = None, **kwargs
+    ) -> ContentElement | None:
+        """Parses the current stream with the language scope, up to the stop condition if given."""
+        if stop_when is not None:
+            stop_parse(handler, stop_when)
+        if self.profile:
+            Profiler().attach(handler)
+        if self.tracer is not None:
+            self.tracer.attach(handler)
+        handler.limit_lines(self.max_line_length, self.line_time_limit)
+
+        try:
+            parsed, elements, _ = self.parse(handler, (0, 0), **kwargs)
+
+            # The captures of the elements are dispatched without limits, as they only span a part of a line
+            handler.skipped_lines.clear()
+            handler.line_time_limit = None
+
+            if parsed:
+                element = elements[0]
+                element._dispatch(nested=True)  # type: ignore
+                element.diagnostics = handler.diagnostics  # type: ignore
+            else:
+                element = None
+        except ParseCancelled:
+            if self.tracer is not None:
+                self.tracer.abort()
+            raise
+
+        if handler.progress is not None:
+            handler.progress(len(handler.lines), len(handler.lines))
+
+        if handler.profiler is not None:
+            self._profile_reports.report = handler.profiler.report()
         return element  # type: ignore
 
-    def _parse(
-        self, handler: ContentHandler, starting: POS, **kwargs
-    ) -> tuple[bool, list[Capture | ContentElement], tuple[int, int]]:
-        kwargs.pop("find_one", None)
-        return super()._parse(handler, starting, find_one=False, **kwargs)
+    def _parse_steps(self, handler: ContentHandler, starting: POS, *args, **kwargs) -> PARSE_STEPS:
+        kwargs["find_one"] = False
+        return super()._parse_steps(handler, starting, *args, **kwargs)
+
+
+def _rebuild_language_parser(cls: type, args: tuple, kwargs: dict) -> LanguageParser:
+    """Reconstructs a pickled language parser from its constructor arguments"""
+    return cls(*args, **kwargs)
 
 
 def _gen_repositories(grammar, key="repository"):
@@ -190,3 +588,19 @@ def _gen_repositories(grammar, key="repository"):
                 for d in v:
                     for result in _gen_repositories(d, key):
                         yield result
+
+
+def _gen_parsers(parser, seen: set[int] | None = None):
+    """Recursively gets all grammar parsers that are reachable from a parser"""
+    if seen is None:
+        seen = set()
+    if not isinstance(parser, GrammarParser) or id(parser) in seen:
+        return
+    seen.add(id(parser))
+    yield parser
+    for attribute in ["patterns", "rules"]:
+        for nested in getattr(parser, attribute, []):
+            yield from _gen_parsers(nested, seen)
+    for attribute in ["repository", "parsers", "parsers_begin", "parsers_end", "parsers_while"]:
+        for nested in getattr(parser, attribute, {}).values():
+            yield from _gen_parsers(nested, seen)
@@ -6,8 +6,27 @@ from pathlib import Path
 
 import yaml
 
+from ...handler import POS, ContentHandler
+from ...parser import BeginEndParser
 from ..base import LanguageParser
 
+# The keywords that open a block closed by ``end`` when they start a statement
+_BLOCK_KEYWORDS = frozenset(["for", "if", "parfor", "spmd", "switch", "try", "while"])
+# The keywords that open a block closed by ``end`` when they start a line, within their enclosing block
+_SECTION_KEYWORDS = {
+    "function": None,
+    "classdef": None,
+    "properties": "classdef",
+    "methods": "classdef",
+    "events": "classdef",
+    "enumeration": "classdef",
+    "arguments": "function",
+}
+_WORD = re.compile(r"[a-zA-Z]\w*")
+_TRANSPOSABLE = re.compile(r"[\w)\]}.']")
+_COMMENT_BEGIN = re.compile(r"\s*%\{[^\S\n]*\n")
+_COMMENT_END = re.compile(r"\s*%\}[^\S\n]*(?:\n|$)")
+
 
 class MatlabParser(LanguageParser):
     """
@@ -56,6 +75,106 @@ class MatlabParser(LanguageParser):
             input = self._remove_line_continuations(input)
         return input
 
+    def _skim_block(
+        self,
+        parser: BeginEndParser,
+        handler: ContentHandler,
+        begin_span: tuple[POS, POS],
+        starting: POS,
+        boundary: POS,
+    ) -> POS | None:
+        """
+        Locates the ``end`` keyword that closes a block, by matching the keywords that open and close
+        blocks at the start of statements, outside of comments, strings and brackets.
+        """
+        if "(end)" not in parser.grammar["end"]:
+            return None
+        opened = _WORD.search(handler.read_pos(*begin_span))
+        blocks = [opened.group() if opened else ""]
+        brackets: list[str] = []
+        comments = 0
+        statement = True
+        line_number, index = starting
+
+        while line_number <= boundary[0]:
+            line = handler.lines[line_number]
+            if index == 0 and _COMMENT_BEGIN.fullmatch(line):
+                comments += 1
+            elif comments:
+                comments -= bool(_COMMENT_END.fullmatch(line))
+            else:
+                first = index == 0 or not line[:index].strip()
+                length = len(line) if line_number < boundary[0] else boundary[1]
+                continued = False
+                while index < length:
+                    char = line[index]
+                    if char == "%":
+                        break
+                    elif line.startswith("...", index):
+                        continued = True
+                        break
+                    elif char in "([{":
+                        brackets.append(char)
+                        statement = False
+                    elif char in ")]}":
+                        if brackets:
+                            brackets.pop()
+                    elif char in ",;":
+                        if not brackets:
+                            statement, first = True, False
+                    elif char == '"' or (
+                        char == "'" and not (index and _TRANSPOSABLE.match(line[index - 1]))
+                    ):
+                        # Skip the string, of which the quotes are escaped by doubling them
+                        closing = line.find(char, index + 1)
+                        while closing != -1 and line.startswith(char, closing + 1):
+                            closing = line.find(char, closing + 2)
+                        if closing == -1 or closing >= length:
+                            # The grammar continues an unterminated string on the next lines
+                            return None
+                        index = closing
+                        statement = False
+                    elif char.isalpha():
+                        word = _WORD.match(line, index)
+                        index = word.end() - 1  # type: ignore
+                        keyword = word.group()  # type: ignore
+                        if statement and not brackets:
+                            following = line[index + 1 : index + 2]
+                            if keyword == "end":
+                                blocks.pop()
+                                if not blocks:
+                                    return (line_number, word.start())  # type: ignore
+                            elif (
+                                keyword in _BLOCK_KEYWORDS
+                                and (keyword != "switch" or following.isspace())
+                            ) or (
+                                keyword in _SECTION_KEYWORDS
+                                and first
+                                and _SECTION_KEYWORDS[keyword] in (None, blocks[-1])
+                                and (following.isspace() or keyword not in ("function", "classdef"))
+                            ):
+                                blocks.append(keyword)
+                        elif (
+                            not brackets
+                            and (keyword == "end" or keyword in _BLOCK_KEYWORDS)
+                            and (not word.start() or line[word.start() - 1] in " \t,;")  # type: ignore
+                        ):
+                            # The grammar opens or closes a block where a statement continues with
+                            # the keyword, such as in command syntax, so the block is parsed in full
+                            return None
+                        statement = False
+                    elif not char.isspace():
+                        statement = False
+                    index += 1
+
+                if not continued:
+                    # Parentheses are closed at the end of the line, brackets and braces span lines
+                    while brackets and brackets[-1] == "(":
+                        brackets.pop()
+                    statement = not brackets
+            line_number, index = line_number + 1, 0
+        return None
+
     def _remove_line_continuations(self, input: str) -> str:
         """
         Removes line continuations from the input text.
@@ -0,0 +1,389 @@
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+from pathlib import Path
+from typing import Any, NamedTuple
+
+from ...elements import ContentBlockElement, ContentElement
+from ...utils.cache import NullCache
+from . import MatlabParser
+
+# The number of parsed files that are written to the index per transaction
+BATCH_FILES = 256
+
+# The version of the schema of the index, which is rebuilt if it differs
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    mtime INTEGER NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS classes (
+    path TEXT NOT NULL REFERENCES files(path) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    line INTEGER NOT NULL,
+    attributes TEXT NOT NULL,
+    superclasses TEXT NOT NULL,
+    help TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS functions (
+    path TEXT NOT NULL REFERENCES files(path) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    class TEXT,
+    line INTEGER NOT NULL,
+    attributes TEXT NOT NULL,
+    inputs TEXT NOT NULL,
+    outputs TEXT NOT NULL,
+    help TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS properties (
+    path TEXT NOT NULL REFERENCES files(path) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    class TEXT,
+    line INTEGER NOT NULL,
+    attributes TEXT NOT NULL,
+    type TEXT,
+    comment TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS comments (
+    path TEXT NOT NULL REFERENCES files(path) ON DELETE CASCADE,
+    line INTEGER NOT NULL,
+    column INTEGER NOT NULL,
+    text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS classes_path ON classes(path);
+CREATE INDEX IF NOT EXISTS functions_path ON functions(path);
+CREATE INDEX IF NOT EXISTS properties_path ON properties(path);
+CREATE INDEX IF NOT EXISTS comments_path ON comments(path);
+CREATE INDEX IF NOT EXISTS classes_name ON classes(name);
+CREATE INDEX IF NOT EXISTS functions_name ON functions(name);
+"""
+
+#: The columns of each table of extracted structures, of which the lists and dictionaries are stored as JSON.
+TABLES: dict[str, tuple[str, ...]] = {
+    "classes": ("name", "line", "attributes", "superclasses", "help"),
+    "functions": ("name", "class", "line", "attributes", "inputs", "outputs", "help"),
+    "properties": ("name", "class", "line", "attributes", "type", "comment"),
+    "comments": ("line", "column", "text"),
+}
+_JSON_COLUMNS = {"attributes", "superclasses", "inputs", "outputs"}
+
+# The prefixes of the tokens of attribute names, of which any other token is the value
+_ATTRIBUTE_KEYS = (
+    "storage.modifier.class.",
+    "storage.modifier.properties.",
+    "storage.modifier.methods.",
+    "storage.modifier.events.",
+)
+
+
+class IndexUpdate(NamedTuple):
+    """The files of which the index was updated."""
+
+    added: list[str]
+    changed: list[str]
+    removed: list[str]
+    unchanged: int
+
+
+def scan(root: str | Path, file_types: list[str]) -> dict[str, tuple[int, int]]:
+    """
+    Walks a directory tree and stats the files of the given file types.
+
+    Hidden files and directories, of which the name starts with a dot, are skipped.
+
+    :param root: The root directory.
+    :param file_types: The file types to collect.
+    :return: The modification time in nanoseconds and the size of every file, by path.
+    """
+    suffixes = tuple(f".{file_type}" for file_type in file_types)
+    files: dict[str, tuple[int, int]] = {}
+    stack = [str(root)]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.name.startswith("."):
+                        continue
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.name.endswith(suffixes) and entry.is_file():
+                        stat = entry.stat()
+                        files[entry.path] = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            continue
+    return files
+
+
+def _line(element: ContentElement) -> int:
+    """Gets the line of the first character of an element."""
+    return next(iter(element.characters))[0] if element.characters else 0
+
+
+def _contents(element: ContentElement, token: str) -> list[str]:
+    """Gets the contents of the nested elements with a token."""
+    return [found.content for found, _ in element.find(token)]
+
+
+def _attributes(elements: list[ContentElement]) -> dict[str, str | bool]:
+    """Gets the attributes of a class, properties or methods block, from the tokens of its declaration."""
+    attributes: dict[str, str | bool] = {}
+    key = None
+    for element in elements:
+        if element.token.startswith("punctuation.section.parens.end"):
+            break
+        if element.token.startswith(_ATTRIBUTE_KEYS):
+            key = element.content
+            attributes[key] = True
+        elif key is not None and not element.token.startswith(
+            ("punctuation.", "keyword.operator.")
+        ):
+            attributes[key] = element.content
+            key = None
+    return attributes
+
+
+def _help(elements: list[ContentElement], declaration: str) -> str:
+    """Gets the help text, which is the block of comments that directly follows a declaration."""
+    lines: list[str] = []
+    declared = False
+    for element in elements:
+        if element.token == declaration:
+            declared = True
+        elif not declared or element.token.startswith("punctuation.whitespace.comment"):
+            continue
+        elif element.token.startswith("comment."):
+            lines.extend(
+                line.lstrip().lstrip("%{}").rstrip() for line in element.content.splitlines()
+            )
+        else:
+            break
+    return "\n".join(line[1:] if line.startswith(" ") else line for line in lines).strip("\n")
+
+
+def extract(element: ContentElement | None) -> dict[str, list[dict[str, Any]]]:
+    """
+    Extracts the classes, functions, properties and comments of a parsed MATLAB file.
+
+    :param element: The parsed element of the file.
+    :return: The rows of every table of ``TABLES``.
+    """
+    structures: dict[str, list[dict[str, Any]]] = {table: [] for table in TABLES}
+    if element is None:
+        return structures
+
+    def walk(parent: ContentElement, cls: str | None, attributes: dict[str, str | bool]) -> None:
+        nested: list[ContentElement] = list(parent.children)
+        if isinstance(parent, ContentBlockElement):
+            nested = parent.begin + nested + parent.end
+        for child in nested:
+            token = child.token
+            if token.startswith("comment."):
+                line, column = next(iter(child.characters), (0, 0))
+                structures["comments"].append(
+                    {"line": line, "column": column, "text": child.content}
+                )
+            elif token == "meta.class.matlab":
+                declaration = next(child.find("meta.class.declaration.matlab", depth=1), None)
+                elements = declaration[0].children if declaration else []
+                name = (
+                    _contents(declaration[0], "entity.name.type.class.matlab")
+                    if declaration
+                    else []
+                )
+                superclasses = [
+                    "".join(part.content for part in inherited.children)
+                    for inherited, _ in (
+                        declaration[0].find("meta.inherited-class.matlab") if declaration else []
+                    )
+                ]
+                structures["classes"].append(
+                    {
+                        "name": name[0] if name else "",
+                        "line": _line(child),
+                        "attributes": _attributes(elements),
+                        "superclasses": superclasses,
+                        "help": _help(child.children, "meta.class.declaration.matlab"),
+                    }
+                )
+                walk(child, name[0] if name else None, {})
+            elif token == "meta.function.matlab":
+                declaration = next(child.find("meta.function.declaration.matlab", depth=1), None)
+                name = (
+                    _contents(declaration[0], "entity.name.function.matlab") if declaration else []
+                )
+                structures["functions"].append(
+                    {
+                        "name": name[0] if name else "",
+                        "class": cls,
+                        "line": _line(child),
+                        "attributes": attributes,
+                        "inputs": _contents(declaration[0], "variable.parameter.input.matlab")
+                        if declaration
+                        else [],
+                        "outputs": _contents(declaration[0], "variable.parameter.output.matlab")
+                        if declaration
+                        else [],
+                        "help": _help(child.children, "meta.function.declaration.matlab"),
+                    }
+                )
+                walk(child, cls, {})
+            elif token in ("meta.properties.matlab", "meta.methods.matlab"):
+                walk(child, cls, _attributes(child.begin))  # type: ignore
+            elif token == "meta.assignment.definition.property.matlab":
+                name = _contents(child, "variable.object.property.matlab")
+                types = _contents(child, "storage.type.matlab")
+                comments = [found for found in child.end if found.token.startswith("comment.")]  # type: ignore
+                structures["properties"].append(
+                    {
+                        "name": name[0] if name else "",
+                        "class": cls,
+                        "line": _line(child),
+                        "attributes": attributes,
+                        "type": types[0] if types else None,
+                        "comment": comments[0].content.lstrip("%").strip() if comments else "",
+                    }
+                )
+                walk(child, cls, attributes)
+            else:
+                walk(child, cls, attributes)
+
+    walk(element, None, {})
+    return structures
+
+
+class MatlabIndex:
+    """A persistent index of the classes, functions, properties and comments of MATLAB code trees.
+
+    The index is stored in a SQLite database. An update walks a directory tree once, compares the
+    modification times and sizes of the files with those in the index, and only parses the files that
+    were added or changed. The files that were removed from the tree are removed from the index.
+    """
+
+    def __init__(self, database: str | Path, parser: MatlabParser | None = None) -> None:
+        """
+        Initialize a new instance of the MatlabIndex class.
+
+        :param database: The path of the SQLite database, or ":memory:".
+        :param parser: The language parser. Defaults to None, for a MATLAB parser without cache.
+        """
+        if parser is None:
+            parser = MatlabParser()
+            parser._cache = NullCache()
+        self.parser = parser
+        self.connection = sqlite3.connect(str(database))
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        self.connection.execute("PRAGMA journal_mode = WAL")
+
+        (version,) = self.connection.execute("PRAGMA user_version").fetchone()
+        if version != SCHEMA_VERSION:
+            with self.connection:
+                for table in ["files", *TABLES]:
+                    self.connection.execute(f"DROP TABLE IF EXISTS {table}")
+                self.connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self.connection.executescript(SCHEMA)
+
+    def __enter__(self) -> MatlabIndex:
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Closes the database."""
+        self.connection.close()
+
+    def update(self, root: str | Path, workers: int = 1) -> IndexUpdate:
+        """
+        Updates the index with the files of a directory tree.
+
+        :param root: The root directory of the tree.
+        :param workers: The number of worker processes that parse the files. Defaults to 1.
+        :return: The added, changed and removed files, and the number of unchanged files.
+        """
+        root = str(Path(root).resolve())
+        scanned = scan(root, self.parser.file_types)
+
+        # Paths within the root directory sort between the root with a separator and the next character
+        indexed = {
+            path: (mtime, size)
+            for path, mtime, size in self.connection.execute(
+                "SELECT path, mtime, size FROM files WHERE path >= ? AND path < ?",
+                (root + os.sep, root + chr(ord(os.sep) + 1)),
+            )
+        }
+        added = [path for path in scanned if path not in indexed]
+        changed = [path for path in scanned if path in indexed and indexed[path] != scanned[path]]
+        removed = [path for path in indexed if path not in scanned]
+
+        with self.connection:
+            self.connection.executemany("DELETE FROM files WHERE path = ?", [(p,) for p in removed])
+
+        pending = added + changed
+        for start in range(0, len(pending), BATCH_FILES):
+            batch = pending[start : start + BATCH_FILES]
+            elements = self.parser.parse_files(batch, workers=workers)
+            with self.connection:
+                for path, (_, element) in zip(batch, elements):
+                    self._write(path, scanned[path], extract(element))
+
+        return IndexUpdate(added, changed, removed, len(scanned) - len(pending))
+
+    def _write(
+        self, path: str, stat: tuple[int, int], structures: dict[str, list[dict[str, Any]]]
+    ) -> None:
+        """Replaces the extracted structures of a file."""
+        self.connection.execute("DELETE FROM files WHERE path = ?", (path,))
+        self.connection.execute("INSERT INTO files VALUES (?, ?, ?)", (path, *stat))
+        for table, columns in TABLES.items():
+            self.connection.executemany(
+                f"INSERT INTO {table} (path, {', '.join(columns)}) "
+                f"VALUES (?{', ?' * len(columns)})",
+                [
+                    (
+                        path,
+                        *(
+                            json.dumps(row[column]) if column in _JSON_COLUMNS else row[column]
+                            for column in columns
+                        ),
+                    )
+                    for row in structures[table]
+                ],
+            )
+
+    def files(self) -> list[str]:
+        """Lists the indexed files."""
+        return [path for (path,) in self.connection.execute("SELECT path FROM files ORDER BY path")]
+
+    def lookup(self, table: str, **filters: Any) -> list[dict[str, Any]]:
+        """
+        Looks up the extracted structures of a table.
+
+        :param table: The table, one of ``TABLES``.
+        :param filters: The values of the columns to match, such as ``name`` or ``path``.
+        :return: The matching rows, with the path of their file, in the order of the files and lines.
+        :raises ValueError: If the table or a column is unknown.
+        """
+        if table not in TABLES:
+            raise ValueError(f"Unknown table {table}, expected one of {', '.join(TABLES)}")
+        for column in filters:
+            if column != "path" and column not in TABLES[table]:
+                raise ValueError(f"Unknown column {column} of table {table}")
+        where = " AND ".join(f"{column} IS ?" for column in filters) or "1"
+        rows = self.connection.execute(
+            f"SELECT path, {', '.join(TABLES[table])} FROM {table} WHERE {where} "
+            "ORDER BY path, line",
+            [str(value) if isinstance(value, Path) else value for value in filters.values()],
+        )
+        return [
+            {
+                key: json.loads(row[key]) if key in _JSON_COLUMNS else row[key]
+                for key in row.keys()  # noqa: SIM118
+            }
+            for row in rows
+        ]
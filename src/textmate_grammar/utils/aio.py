@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, AsyncIterator, Callable, Iterable
+
+from .cancellation import CancellationToken
+from .pool import _parse_in_worker, _parse_string_in_worker
+
+if TYPE_CHECKING:
+    from ..elements import ContentElement
+    from ..parsers.base import LanguageParser
+
+
+async def offload(
+    executor: Executor | None,
+    limiter: asyncio.Semaphore | None,
+    function: Callable[..., Any],
+    *args,
+    cancel: CancellationToken | None = None,
+    **kwargs,
+) -> Any:
+    """
+    Runs a parse function in an executor, without blocking the event loop.
+
+    When the awaiting task is cancelled, the parse is cancelled as well, such that the thread of the
+    executor is released at the next cancellation check of the parse. This requires a thread executor, as
+    a cancellation token cannot be passed to another process: with a process executor, cancelling the task
+    only stops waiting for the result, and the parse in the worker runs to completion.
+
+    :param executor: The executor, or None for the default executor of the event loop.
+    :param limiter: A semaphore that bounds the number of concurrent parses. Defaults to None.
+    :param function: The parse function, which accepts a cancellation token as ``cancel`` argument.
+    :param cancel: A token to cancel the parse. Defaults to None.
+    :return: The result of the parse function.
+    """
+    if limiter is not None:
+        async with limiter:
+            return await offload(executor, None, function, *args, cancel=cancel, **kwargs)
+
+    token = None
+    if cancel is None and not isinstance(executor, ProcessPoolExecutor):
+        token = cancel = CancellationToken()
+    loop = asyncio.get_running_loop()
+    future = loop.run_in_executor(executor, partial(function, *args, cancel=cancel, **kwargs))
+    try:
+        return await future
+    except asyncio.CancelledError:
+        if token is not None:
+            token.cancel()
+        raise
+
+
+async def aparse_file(
+    parser: LanguageParser,
+    filePath: str | Path,
+    executor: Executor | None = None,
+    limiter: asyncio.Semaphore | None = None,
+    **kwargs,
+) -> ContentElement | None:
+    """
+    Parses a file in an executor, while the cache is accessed in a thread of the event loop.
+
+    A process executor must be created by ``worker_pool``, of which each worker constructs the language
+    parser once. Its workers return the element tree as token array, and do not report progress.
+
+    :param parser: The language parser.
+    :param filePath: The path to the file to be parsed.
+    :param executor: The executor of the parse. Defaults to None, for the default executor.
+    :param limiter: A semaphore that bounds the number of concurrent parses. Defaults to None.
+    :param kwargs: The keyword arguments of ``parse_file``.
+    :return: The parsed element if successful, None otherwise.
+    """
+    filePath = parser._check_path(filePath)
+    loop = asyncio.get_running_loop()
+
+    if not (parser.profile or parser.tracer) and await loop.run_in_executor(
+        None, parser._cache.cache_valid, filePath
+    ):
+        return await loop.run_in_executor(None, parser._cache.load, filePath)
+
+    if isinstance(executor, ProcessPoolExecutor):
+        # The cancellation token and progress callback cannot be passed to another process
+        kwargs.pop("cancel", None)
+        kwargs.pop("progress", None)
+        tokens, _ = await offload(executor, limiter, _parse_in_worker, filePath, **kwargs)
+        element = None if tokens is None else tokens.to_element(parser._grammar_table)
+    else:
+        element = await offload(executor, limiter, parser._parse_path, filePath, **kwargs)
+    if element is not None:
+        await loop.run_in_executor(None, parser._cache.save, filePath, element)
+    return element
+
+
+async def aparse_string(
+    parser: LanguageParser,
+    input: str,
+    executor: Executor | None = None,
+    limiter: asyncio.Semaphore | None = None,
+    **kwargs,
+) -> ContentElement | None:
+    """
+    Parses an input string in an executor, see ``aparse_file`` for process executors.
+
+    :param parser: The language parser.
+    :param input: The input string to be parsed.
+    :param executor: The executor of the parse. Defaults to None, for the default executor.
+    :param limiter: A semaphore that bounds the number of concurrent parses. Defaults to None.
+    :param kwargs: The keyword arguments of ``parse_string``.
+    :return: The parsed element if successful, None otherwise.
+    """
+    if not isinstance(executor, ProcessPoolExecutor):
+        return await offload(executor, limiter, parser.parse_string, input, **kwargs)
+    kwargs.pop("cancel", None)
+    kwargs.pop("progress", None)
+    tokens = await offload(executor, limiter, _parse_string_in_worker, input, **kwargs)
+    return None if tokens is None else tokens.to_element(parser._grammar_table)
+
+
+async def aparse_files(
+    parser: LanguageParser,
+    paths: Iterable[str | Path],
+    executor: Executor | None = None,
+    limiter: asyncio.Semaphore | None = None,
+    concurrency: int = 4,
+    ordered: bool = True,
+) -> AsyncIterator[tuple[Path, ContentElement | None]]:
+    """
+    Parses many files in an executor, with a bounded number of parses in flight.
+
+    A parse is only started when a result is consumed, such that a slow consumer does not accumulate the
+    results of all files in memory.
+
+    :param parser: The language parser.
+    :param paths: The paths to the files to be parsed.
+    :param executor: The executor of the parses. Defaults to None, for the default executor.
+    :param limiter: A semaphore that bounds the number of concurrent parses. Defaults to None.
+    :param concurrency: The maximal number of parses in flight. Defaults to 4.
+    :param ordered: Whether to yield the results in the order of the paths, or as they complete.
+        Defaults to True.
+    :return: An asynchronous iterator of the resolved paths and their parsed elements.
+    :raises IncompatibleFileType: If any of the files has an unsupported file type.
+    """
+    checked = iter([parser._check_path(path) for path in paths])
+    pending: dict[asyncio.Task, Path] = {}
+
+    def submit() -> None:
+        for path in checked:
+            task = asyncio.ensure_future(aparse_file(parser, path, executor, limiter))
+            pending[task] = path
+            if len(pending) >= concurrency:
+                return
+
+    try:
+        submit()
+        while pending:
+            if ordered:
+                task = next(iter(pending))
+                await asyncio.wait([task])
+            else:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                task = done.pop()
+            path = pending.pop(task)
+            yield path, task.result()
+            submit()
+    finally:
+        for task in pending:
+            task.cancel()
@@ -1,11 +1,13 @@
 from __future__ import annotations
 
 import atexit
+import threading
 from pathlib import Path
 from pickle import UnpicklingError
 from typing import Protocol
 
 from ..elements import ContentElement
+from .keys import CacheKeys
 
 CACHE_DIR = (Path() / ".textmate_cache").resolve()
 CACHE_DIR.mkdir(parents=True, exist_ok=True)
@@ -15,6 +17,19 @@ def _path_to_key(path: Path) -> str:
     return str(path.resolve())
 
 
+def _entry(path: Path, keys: CacheKeys | None) -> tuple[str, float | str]:
+    """Gets the key of the cache entry of a file, and the stamp with which the entry is valid.
+
+    Without content keys, entries are stored by path and validated by modification time. With content
+    keys, entries are stored by content key and file type, such that files with the same content share
+    an entry, which is always valid.
+    """
+    if keys is None:
+        return _path_to_key(path), path.resolve().stat().st_mtime
+    key = keys.key(path)
+    return f"content:{key}{path.suffix}", key
+
+
 class TextmateCache(Protocol):
     """Interface for a Textmate cache."""
 
@@ -46,14 +61,71 @@ class TextmateCache(Protocol):
         """
         ...
 
+    def load_previous(self, filepath: Path) -> ContentElement | None:
+        """
+        Load the last content element that was saved for the given filepath, even if the file changed.
+
+        :param filepath: The path to the file.
+        :return: The last saved content element, or None if none was saved.
+        """
+        ...
+
+
+class NullCache(TextmateCache):
+    """A cache implementation that does not store any content elements."""
+
+    def cache_valid(self, filepath: Path) -> bool:
+        """The cache is never valid.
+
+        :param filepath: The filepath to check.
+        :return: False.
+        """
+        return False
+
+    def load(self, filepath: Path) -> ContentElement:
+        """Loading is not supported, as the cache is never valid.
+
+        :param filepath: The path for the cached content element.
+        :raises KeyError: Always.
+        """
+        raise KeyError(_path_to_key(filepath))
+
+    def save(self, filepath: Path, element: ContentElement) -> None:
+        """Discards the content element.
+
+        :param filepath: The filepath to save the content element to.
+        :param element: The content element to save.
+        """
+
+    def load_previous(self, filepath: Path) -> ContentElement | None:
+        """No content element is ever saved.
+
+        :param filepath: The path to the file.
+        :return: None.
+        """
+        return None
+
 
 class SimpleCache(TextmateCache):
-    """A simple cache implementation for storing content elements."""
+    """A simple cache implementation for storing content elements.
 
-    def __init__(self) -> None:
-        """Initialize the SimpleCache."""
-        self._element_cache: dict[str, ContentElement] = dict()
-        self._element_timestamp: dict[str, float] = dict()
+    The elements are stored together with their timestamps, such that the cache can be shared by
+    parses in different threads.
+    """
+
+    def __init__(self, keys: CacheKeys | None = None) -> None:
+        """Initialize the SimpleCache.
+
+        :param keys: The provider of content keys, instead of paths and timestamps. Defaults to None.
+        """
+        self.keys = keys
+        self._element_cache: dict[str, tuple[float | str, ContentElement]] = dict()
+        self._previous: dict[str, str] = dict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """The number of cached files."""
+        return len(self._element_cache)
 
     def cache_valid(self, filepath: Path) -> bool:
         """Check if the cache is valid for the given filepath.
@@ -61,11 +133,12 @@ class SimpleCache(TextmateCache):
         :param filepath: The filepath to check.
         :return: True if the cache is valid, False otherwise.
         """
-        key = _path_to_key(filepath)
-        if key not in self._element_cache:
+        key, stamp = _entry(filepath, self.keys)
+        with self._lock:
+            entry = self._element_cache.get(key)
+        if entry is None:
             return False
-        timestamp = filepath.resolve().stat().st_mtime
-        return timestamp == self._element_timestamp[key]
+        return stamp == entry[0]
 
     def load(self, filepath: Path) -> ContentElement:
         """Load the content element from the cache for the given filepath.
@@ -73,8 +146,9 @@ class SimpleCache(TextmateCache):
         :param filepath: The filepath to load the content element from.
         :return: The loaded content element.
         """
-        key = _path_to_key(filepath)
-        return self._element_cache[key]
+        key, _ = _entry(filepath, self.keys)
+        with self._lock:
+            return self._element_cache[key][1]
 
     def save(self, filepath: Path, element: ContentElement) -> None:
         """Save the content element to the cache for the given filepath.
@@ -83,24 +157,46 @@ class SimpleCache(TextmateCache):
         :param element: The content element to save.
         :return: None
         """
-        key = _path_to_key(filepath)
-        self._element_cache[key] = element
-        self._element_timestamp[key] = filepath.resolve().stat().st_mtime
+        key, stamp = _entry(filepath, self.keys)
+        with self._lock:
+            self._element_cache[key] = (stamp, element)
+            if self.keys is not None:
+                self._previous[_path_to_key(filepath)] = key
+
+    def load_previous(self, filepath: Path) -> ContentElement | None:
+        """Load the last content element that was saved for the given filepath, even if the file changed.
+
+        :param filepath: The path to the file.
+        :return: The last saved content element, or None if none was saved.
+        """
+        path = _path_to_key(filepath)
+        with self._lock:
+            entry = self._element_cache.get(self._previous.get(path, path))
+        return entry[1] if entry is not None else None
 
 
 class ShelveCache(TextmateCache):
-    """A cache implementation using the shelve module."""
+    """A cache implementation using the shelve module.
+
+    As shelve does not support concurrent access, the database is accessed under a lock.
+    """
+
+    def __init__(self, keys: CacheKeys | None = None) -> None:
+        """Initialize the ShelveCache.
 
-    def __init__(self) -> None:
-        """Initialize the ShelveCache."""
+        :param keys: The provider of content keys, instead of paths and timestamps. Defaults to None.
+        """
         import shelve
 
+        self.keys = keys
         database_path = CACHE_DIR / "textmate.db"
         self._database = shelve.open(str(database_path))
+        self._lock = threading.Lock()
 
         def exit():
-            self._database.sync()
-            self._database.close()
+            with self._lock:
+                self._database.sync()
+                self._database.close()
 
         atexit.register(exit)
 
@@ -110,16 +206,14 @@ class ShelveCache(TextmateCache):
         :param filepath: The filepath to check.
         :return: True if the cache is valid, False otherwise.
         """
-        key = _path_to_key(filepath)
-        if key not in self._database:
-            return False
-        timestamp = filepath.resolve().stat().st_mtime
-        try:
-            valid = timestamp == self._database[key][0]
-        except UnpicklingError:
-            valid = False
-        else:
-            valid = False
+        key, stamp = _entry(filepath, self.keys)
+        with self._lock:
+            if key not in self._database:
+                return False
+            try:
+                valid = stamp == self._database[key][0]
+            except UnpicklingError:
+                valid = False
         return valid
 
     def load(self, filepath: Path) -> ContentElement:
@@ -128,8 +222,9 @@ class ShelveCache(TextmateCache):
         :param filepath: The path for the cached content element.
         :return: The loaded content element.
         """
-        key = _path_to_key(filepath)
-        return self._database[key][1]
+        key, _ = _entry(filepath, self.keys)
+        with self._lock:
+            return self._database[key][1]
 
     def save(self, filepath: Path, element: ContentElement) -> None:
         """Save the content element to the cache for the given filepath.
@@ -138,26 +233,47 @@ class ShelveCache(TextmateCache):
         :param element: The content element to save.
         """
         element._dispatch(nested=True)
-        key = _path_to_key(filepath)
-        timestamp = filepath.resolve().stat().st_mtime
-        self._database[key] = (timestamp, element)
+        key, stamp = _entry(filepath, self.keys)
+        with self._lock:
+            self._database[key] = (stamp, element)
+            if self.keys is not None:
+                self._database[f"previous:{_path_to_key(filepath)}"] = key
+
+    def load_previous(self, filepath: Path) -> ContentElement | None:
+        """Load the last content element that was saved for the given filepath, even if the file changed.
+
+        :param filepath: The path to the file.
+        :return: The last saved content element, or None if none was saved.
+        """
+        path = _path_to_key(filepath)
+        with self._lock:
+            try:
+                entry = self._database.get(self._database.get(f"previous:{path}", path))
+            except UnpicklingError:
+                return None
+        return entry[1] if entry is not None else None
 
 
 CACHE: TextmateCache = SimpleCache()
 
 
-def init_cache(type: str = "simple") -> TextmateCache:
+def init_cache(type: str = "simple", keys: CacheKeys | None = None) -> TextmateCache:
     """
     Initialize the cache based on the given type.
 
-    :param type: The type of cache to initialize. Defaults to "simple".
+    :param type: The type of cache to initialize, one of "simple", "shelve" or "none". Defaults to
+        "simple".
+    :param keys: The provider of content keys, such as ``GitKeys``, by which the entries are stored and
+        validated instead of by path and modification time. Defaults to None.
     :return: The initialized cache object.
     """
     global CACHE
     if type == "shelve":
-        CACHE = ShelveCache()
+        CACHE = ShelveCache(keys)
     elif type == "simple":
-        CACHE = SimpleCache()
+        CACHE = SimpleCache(keys)
+    elif type == "none":
+        CACHE = NullCache()
     else:
         raise NotImplementedError(f"Cache type {type} not implemented.")
     return CACHE
@@ -0,0 +1,23 @@
+from __future__ import annotations
+
+from threading import Event
+
+
+class CancellationToken:
+    """A token to cancel a running parse from another thread or from a progress callback.
+
+    The parse loops check the token every few lines, and raise ``ParseCancelled`` once the token is
+    cancelled. A single token can be shared by several parses to cancel all of them at once.
+    """
+
+    def __init__(self) -> None:
+        self._event = Event()
+
+    def cancel(self) -> None:
+        """Cancels the parses that check this token."""
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        """Whether the token is cancelled."""
+        return self._event.is_set()
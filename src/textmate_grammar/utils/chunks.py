@@ -0,0 +1,250 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, NamedTuple
+
+from ..elements import Capture, ContentElement, _dispatch_list
+from ..handler import POS, ContentHandler, Diagnostic
+from . import pool
+from .tokens import TokenArray
+
+if TYPE_CHECKING:
+    from ..parsers.base import LanguageParser
+
+# The minimal number of lines of a chunk
+CHUNK_LINES = 2000
+
+#: The state of the language parser between two top-level elements: the position and the anchor.
+STATE = tuple[POS, int]
+
+
+class _Chunk(NamedTuple):
+    """The top-level elements of a part of the content, parsed from a state of the language parser.
+
+    The parse of a chunk visits a state before each search round. The elements and diagnostics that are
+    found from a visited state onwards are given by the offsets of the state.
+    """
+
+    #: The visited states of the language parser, of which the last is the state at which it stopped.
+    states: list[STATE]
+    #: The offsets of the elements found from each state.
+    offsets: list[int]
+    #: The offsets of the diagnostics of the parse and of the dispatch of the elements from each state.
+    diagnosed: list[tuple[int, int]]
+    #: Whether the parse stopped before the end of the content, at its last visited state.
+    stopped: bool
+    elements: list[ContentElement]
+    diagnostics: list[Diagnostic]
+    dispatched: list[Diagnostic]
+
+    def visited(self, state: STATE) -> int | None:
+        """Returns the index of a visited state, or None if the state was not visited."""
+        try:
+            return self.states.index(state)
+        except ValueError:
+            return None
+
+    def remainder(
+        self, index: int
+    ) -> tuple[list[ContentElement], list[Diagnostic], list[Diagnostic]]:
+        """Returns the elements and diagnostics found from a visited state onwards."""
+        diagnosed, dispatched = self.diagnosed[index]
+        return (
+            self.elements[self.offsets[index] :],
+            self.diagnostics[diagnosed:],
+            self.dispatched[dispatched:],
+        )
+
+
+def split_lines(handler: ContentHandler, chunks: int) -> list[int]:
+    """
+    Selects the first lines of the chunks of the content.
+
+    A chunk starts at an unindented line after a blank or unindented line, where the language parser is
+    likely to be in its root state, such as between two top-level statements.
+
+    :param handler: The content handler.
+    :param chunks: The maximal number of chunks.
+    :return: The first lines of the chunks, starting with line 0.
+    """
+    starts = [0]
+    for chunk in range(1, chunks):
+        line = max(chunk * len(handler.lines) // chunks, starts[-1] + CHUNK_LINES)
+        while line < len(handler.lines) - CHUNK_LINES:
+            previous = handler.lines[line - 1]
+            if not handler.lines[line][0].isspace() and (
+                previous == "\n" or not previous[0].isspace()
+            ):
+                starts.append(line)
+                break
+            line += 1
+    return starts
+
+
+def parse_chunk(
+    parser: LanguageParser,
+    handler: ContentHandler,
+    state: STATE,
+    stop: int | None = None,
+    resync: _Chunk | None = None,
+) -> _Chunk:
+    """
+    Parses the top-level elements of the content from a state of the language parser.
+
+    :param parser: The language parser.
+    :param handler: The content handler.
+    :param state: The state from which to parse.
+    :param stop: The line at which to stop the parse. Defaults to None, for the end of the content.
+    :param resync: A chunk of which the visited states stop the parse. Defaults to None.
+    :return: The parsed chunk, with its dispatched elements.
+    """
+    shared = set(resync.states) if resync is not None else set()
+    states: list[STATE] = []
+    counts: list[int] = []
+    diagnosed: list[int] = []
+    stopped = False
+
+    def until(current: POS, count: int) -> bool:
+        nonlocal stopped
+        states.append((current, handler.anchor))
+        counts.append(count)
+        diagnosed.append(len(handler.diagnostics))
+        if len(states) > 1 and states[-1] in shared or stop is not None and current >= (stop, 0):
+            stopped = True
+        return stopped
+
+    handler.anchor = state[1]
+    start = len(handler.diagnostics)
+    parsed, root, _ = parser.parse(handler, state[0], until=until)
+    captures: list[Capture | ContentElement] = root[0]._children_captures if parsed else []  # type: ignore
+    diagnostics = handler.diagnostics[start:]
+
+    # Dispatch the captures of the elements that are found from each visited state, without limits
+    skipped, time_limit = handler.skipped_lines, handler.line_time_limit
+    handler.skipped_lines, handler.line_time_limit = set(), None
+    elements: list[ContentElement] = []
+    offsets, dispatched = [], []
+    for index, count in enumerate(counts):
+        offsets.append(len(elements))
+        dispatched.append(len(handler.diagnostics))
+        following = counts[index + 1] if index + 1 < len(counts) else len(captures)
+        segment = _dispatch_list(captures[count:following])
+        for element in segment:
+            element._dispatch(nested=True)
+        elements.extend(segment)
+    handler.skipped_lines, handler.line_time_limit = skipped, time_limit
+
+    end = start + len(diagnostics)
+    return _Chunk(
+        states,
+        offsets,
+        [(count - start, offset - end) for count, offset in zip(diagnosed, dispatched)],
+        stopped,
+        elements,
+        diagnostics,
+        handler.diagnostics[end:],
+    )
+
+
+def _parse_in_worker(text: str, start: int, stop: int | None) -> tuple[_Chunk, TokenArray | None]:
+    """Parses a chunk in a worker process, of which the elements are returned as token array."""
+    parser = pool._PARSER
+    handler = ContentHandler(text)
+    handler.limit_lines(parser.max_line_length, parser.line_time_limit)  # type: ignore
+    chunk = parse_chunk(parser, handler, ((start, 0), 0), stop)  # type: ignore
+    if not chunk.elements:
+        return chunk, None
+
+    closing = (
+        chunk.states[-1][0] if chunk.stopped else (len(handler.lines) - 1, handler.line_lengths[-1])
+    )
+    root = ContentElement(
+        token=parser.token,  # type: ignore
+        grammar=parser.grammar,  # type: ignore
+        content="",
+        characters=handler.chars((start, 0), closing),
+        children=chunk.elements,  # type: ignore
+    )
+    return chunk._replace(elements=[]), TokenArray.from_element(root, parser._grammar_table)  # type: ignore
+
+
+def parse_chunked(
+    parser: LanguageParser,
+    handler: ContentHandler,
+    workers: int,
+    start_method: str | None = None,
+) -> ContentElement | None:
+    """
+    Parses the content in chunks in a pool of worker processes.
+
+    The content is split at lines where the language parser is likely to be in its root state, and the
+    chunks are parsed speculatively from that state. A chunk is only used from the first state that it
+    shares with the parse of the preceding content. Where the preceding parse stopped in a state that the
+    chunk did not visit, such as within a block that spans the first line of the chunk, the content is
+    parsed again until it reaches a state of the chunk. The result is the same element tree as of a
+    sequential parse. Content that is too short to split is parsed in the current process.
+
+    :param parser: The language parser.
+    :param handler: The content handler.
+    :param workers: The number of worker processes.
+    :param start_method: The multiprocessing start method. Defaults to the platform default.
+    :return: The parsed element if successful, None otherwise.
+    """
+    starts = split_lines(handler, workers)
+    if len(starts) == 1:
+        return parser._parse_language(handler)
+    stops: list[int | None] = [*starts[1:], None]
+    handler.limit_lines(parser.max_line_length, parser.line_time_limit)
+    limited = list(handler.diagnostics)
+
+    chunks: list[_Chunk] = []
+    executor = pool._executor(parser, len(starts), start_method)
+    try:
+        for chunk, tokens in executor.map(
+            _parse_in_worker, [handler.content] * len(starts), starts, stops
+        ):
+            if tokens is not None:
+                chunk = chunk._replace(elements=tokens.to_element(parser._grammar_table).children)
+            chunks.append(chunk)
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+    # Stitch the chunks from the states at which the preceding parse stopped
+    elements: list[ContentElement] = []
+    diagnostics: list[Diagnostic] = []
+    dispatched: list[Diagnostic] = []
+
+    def extend(chunk: _Chunk, index: int) -> None:
+        remainder = chunk.remainder(index)
+        elements.extend(remainder[0])
+        diagnostics.extend(remainder[1])
+        dispatched.extend(remainder[2])
+
+    extend(chunks[0], 0)
+    stopped, state = chunks[0].stopped, chunks[0].states[-1]
+    for chunk, stop in zip(chunks[1:], stops[1:]):
+        if not stopped:
+            break
+        index = chunk.visited(state)
+        if index is None:
+            reparsed = parse_chunk(parser, handler, state, stop, resync=chunk)
+            extend(reparsed, 0)
+            stopped, state = reparsed.stopped, reparsed.states[-1]
+            index = chunk.visited(state) if stopped else None
+            if index is None:
+                continue
+        extend(chunk, index)
+        stopped, state = chunk.stopped, chunk.states[-1]
+
+    if not elements:
+        return None
+    boundary = (len(handler.lines) - 1, handler.line_lengths[-1])
+    element = ContentElement(
+        token=parser.token,
+        grammar=parser.grammar,
+        content=handler.read_pos((0, 0), boundary),
+        characters=handler.chars((0, 0), boundary),
+        children=elements,  # type: ignore
+    )
+    element._dispatch()
+    element.diagnostics = limited + diagnostics + dispatched
+    return element
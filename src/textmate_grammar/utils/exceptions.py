@@ -70,3 +70,33 @@ class ImpossibleSpan(Exception):
             "The closing position cannot be less or equal than the starting position",
             **kwargs,
         )
+
+
+class ParseCancelled(Exception):
+    """Exception raised when a parse is cancelled."""
+
+    def __init__(
+        self, position: tuple[int, int] | None = None, reason: str = "cancelled", **kwargs
+    ) -> None:
+        """
+        Initialize the exception.
+
+        :param position: The position at which the parse was cancelled.
+        :param reason: The reason of the cancellation. Defaults to "cancelled".
+        :param kwargs: Additional keyword arguments.
+        """
+        self.position = position
+        super().__init__(f"Parse {reason} at {position}", **kwargs)
+
+
+class DeadlineExceeded(ParseCancelled):
+    """Exception raised when a parse is cancelled as its deadline has passed."""
+
+    def __init__(self, position: tuple[int, int] | None = None, **kwargs) -> None:
+        """
+        Initialize the exception.
+
+        :param position: The position at which the parse was cancelled.
+        :param kwargs: Additional keyword arguments.
+        """
+        super().__init__(position, reason="deadline exceeded", **kwargs)
@@ -0,0 +1,242 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, NamedTuple
+
+from ..elements import Capture, ContentBlockElement, ContentElement
+from ..handler import ContentHandler, Diagnostic
+from .chunks import STATE, _Chunk, parse_chunk
+from .tokens import _span
+
+if TYPE_CHECKING:
+    from ..parsers.base import LanguageParser
+
+
+class Snapshot(NamedTuple):
+    """The source lines and the root states of a parse, from which a changed source is parsed again.
+
+    The top-level elements and diagnostics that were found from each visited root state are given by
+    the offsets of the state, in the children and diagnostics of the root element of the parse.
+    """
+
+    lines: list[str]
+    states: list[STATE]
+    #: The offsets of the top-level elements found from each state.
+    offsets: list[int]
+    #: The offsets of the diagnostics of the parse and of the dispatch of the elements from each state.
+    diagnosed: list[tuple[int, int]]
+    #: The number of line limit diagnostics and of parse diagnostics, which precede those of the dispatch.
+    limited: int
+    parsed: int
+
+
+class _ShiftedCapture(Capture):
+    """The nested elements of a reused element, which are moved by a number of lines when dispatched."""
+
+    def __init__(self, handler: ContentHandler, elements: list[ContentElement], lines: int) -> None:
+        self.handler = handler
+        self.elements = elements
+        self.lines = lines
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, _ShiftedCapture) and self.elements == other.elements
+
+    def __repr__(self) -> str:
+        return f"@shifted<{len(self.elements)}:{self.lines:+d}>"
+
+    def dispatch(self) -> list[Capture | ContentElement]:
+        return [shift(element, self.handler, self.lines) for element in self.elements]
+
+
+def shift(element: ContentElement, handler: ContentHandler, lines: int) -> ContentElement:
+    """
+    Reuses an element of a previous parse, of which the source moved by a number of lines.
+
+    The nested elements are moved when they are first accessed.
+
+    :param element: The element of the previous parse.
+    :param handler: The content handler of the changed source.
+    :param lines: The number of lines by which the source of the element moved.
+    :return: A copy of the element at its position in the changed source.
+    """
+    if lines:
+        start, close = _span(element.characters)
+        characters = handler.chars((start[0] + lines, start[1]), (close[0] + lines, close[1]))
+    else:
+        characters = element.characters
+
+    def nested(group: list[ContentElement]) -> list[Capture | ContentElement]:
+        return [_ShiftedCapture(handler, group, lines)] if group else []
+
+    if isinstance(element, ContentBlockElement):
+        return ContentBlockElement(
+            token=element.token,
+            grammar=element.grammar,
+            content=element.content,
+            characters=characters,
+            children=nested(element.children),
+            begin=nested(element.begin),
+            end=nested(element.end),
+        )
+    return ContentElement(
+        token=element.token,
+        grammar=element.grammar,
+        content=element.content,
+        characters=characters,
+        children=nested(element.children),
+    )
+
+
+def _shift_diagnostic(diagnostic: Diagnostic, lines: int) -> Diagnostic:
+    if diagnostic.position is None or not lines:
+        return diagnostic
+    return diagnostic._replace(position=(diagnostic.position[0] + lines, diagnostic.position[1]))
+
+
+def changed_lines(previous: list[str], lines: list[str]) -> tuple[int, int]:
+    """
+    Compares the lines of two sources.
+
+    :param previous: The lines of the previous source.
+    :param lines: The lines of the changed source.
+    :return: The number of leading lines and of trailing lines that did not change.
+    """
+    common = min(len(previous), len(lines))
+    leading = 0
+    while leading < common and previous[leading] == lines[leading]:
+        leading += 1
+    trailing = 0
+    while trailing < common - leading and previous[-1 - trailing] == lines[-1 - trailing]:
+        trailing += 1
+    return leading, trailing
+
+
+def parse_incremental(
+    parser: LanguageParser, handler: ContentHandler, previous: ContentElement | None = None
+) -> ContentElement | None:
+    """
+    Parses the content, reusing the top-level elements of a previous parse of a similar source.
+
+    The top-level elements of the previous parse that end before the first changed line are reused as
+    is. The content is parsed from the last root state before the first changed line, until the parse
+    reaches a root state of the previous parse within the unchanged lines at the end of the source.
+    From that state onwards, the elements of the previous parse are reused, moved by the number of
+    inserted or deleted lines. The result is the same element tree as of a parse of the whole content.
+
+    :param parser: The language parser.
+    :param handler: The content handler.
+    :param previous: The root element of the previous parse, with its snapshot. Defaults to None, to
+        parse the whole content.
+    :return: The parsed element with the snapshot of its parse, or None if nothing was parsed.
+    """
+    handler.limit_lines(parser.max_line_length, parser.line_time_limit)
+    limited = list(handler.diagnostics)
+    snapshot = previous._snapshot if previous is not None else None
+
+    start: STATE = ((0, 0), 0)
+    prefix = suffix = None
+    lines = 0
+    resync = None
+    if snapshot is not None:
+        elements = previous.children  # type: ignore
+        diagnostics = previous.diagnostics or []  # type: ignore
+        boundary = snapshot.limited + snapshot.parsed
+        old = _Chunk(
+            snapshot.states,
+            snapshot.offsets,
+            snapshot.diagnosed,
+            False,
+            elements,
+            diagnostics[snapshot.limited : boundary],
+            diagnostics[boundary:],
+        )
+        leading, trailing = changed_lines(snapshot.lines, handler.lines)
+        lines = len(handler.lines) - len(snapshot.lines)
+
+        # The last state before the first changed line, of which the preceding elements are reused
+        prefix = max(
+            (index for index, state in enumerate(old.states) if state[0] < (leading, 0)), default=0
+        )
+        if prefix:
+            start = old.states[prefix]
+
+        # The states within the unchanged lines at the end, at their position in the changed source
+        unchanged = len(snapshot.lines) - trailing
+        shifted = [
+            ((state[0][0] + lines, state[0][1]), state[1]) if state[0][0] >= unchanged else None
+            for state in old.states
+        ]
+        resync = _Chunk([s for s in shifted if s is not None], [], [], False, [], [], [])
+
+    reparsed = parse_chunk(parser, handler, start, resync=resync)
+    if snapshot is not None and reparsed.stopped:
+        suffix = shifted.index(reparsed.states[-1])
+
+    # Join the reused prefix, the parsed middle and the reused suffix
+    states: list[STATE] = []
+    offsets: list[int] = []
+    diagnosed: list[tuple[int, int]] = []
+    joined: list[ContentElement] = []
+    parsed: list[Diagnostic] = []
+    dispatched: list[Diagnostic] = []
+
+    def extend(chunk: _Chunk, first: int, last: int | None, moved: int | None = None) -> None:
+        """Appends the states, elements and diagnostics of a chunk from a state up to another state.
+
+        The elements of the previous parse are copied, moved by a number of lines.
+        """
+        end = len(chunk.states) if last is None else last
+        base, (parse_base, dispatch_base) = chunk.offsets[first], chunk.diagnosed[first]
+        stop, (parse_stop, dispatch_stop) = (
+            (chunk.offsets[last], chunk.diagnosed[last])
+            if last is not None
+            else (None, (None, None))
+        )
+        for (position, anchor), offset, (parse_offset, dispatch_offset) in zip(
+            chunk.states[first:end], chunk.offsets[first:end], chunk.diagnosed[first:end]
+        ):
+            states.append(((position[0] + (moved or 0), position[1]), anchor))
+            offsets.append(len(joined) + offset - base)
+            diagnosed.append(
+                (
+                    len(parsed) + parse_offset - parse_base,
+                    len(dispatched) + dispatch_offset - dispatch_base,
+                )
+            )
+        elements = chunk.elements[base:stop]
+        if moved is None:
+            joined.extend(elements)
+        else:
+            joined.extend(shift(element, handler, moved) for element in elements)
+        parsed.extend(
+            _shift_diagnostic(diagnostic, moved or 0)
+            for diagnostic in chunk.diagnostics[parse_base:parse_stop]
+        )
+        dispatched.extend(
+            _shift_diagnostic(diagnostic, moved or 0)
+            for diagnostic in chunk.dispatched[dispatch_base:dispatch_stop]
+        )
+
+    if snapshot is not None and prefix:
+        extend(old, 0, prefix, 0)
+    extend(reparsed, 0, len(reparsed.states) - 1 if reparsed.stopped else None)
+    if suffix is not None:
+        extend(old, suffix, None, lines)
+
+    if not joined:
+        return None
+    closing = (len(handler.lines) - 1, handler.line_lengths[-1])
+    element = ContentElement(
+        token=parser.token,
+        grammar=parser.grammar,
+        content=handler.read_pos((0, 0), closing),
+        characters=handler.chars((0, 0), closing),
+        children=joined,  # type: ignore
+    )
+    element._dispatch()
+    element.diagnostics = limited + parsed + dispatched
+    element._snapshot = Snapshot(
+        handler.lines, states, offsets, diagnosed, len(limited), len(parsed)
+    )
+    if handler.progress is not None:
+        handler.progress(len(handler.lines), len(handler.lines))
+    return element
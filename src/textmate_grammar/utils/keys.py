@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import hashlib
+import subprocess
+from pathlib import Path
+from typing import Protocol
+
+from .logger import LOGGER
+
+# The modes of regular files in the git index, of which the blob is the content of the file
+_REGULAR_MODES = ("100644", "100755")
+
+
+class CacheKeys(Protocol):
+    """Interface for a provider of content keys, by which a cache stores and validates its entries."""
+
+    def key(self, filepath: Path) -> str:
+        """
+        Gets the content key of a file, which is the same for files with the same content.
+
+        :param filepath: The path to the file.
+        :return: The content key.
+        """
+        ...
+
+
+def blob_id(content: bytes) -> str:
+    """Computes the git blob ID of a content, the SHA-1 hash of its header and bytes."""
+    digest = hashlib.sha1(b"blob %d\0" % len(content), usedforsecurity=False)
+    digest.update(content)
+    return digest.hexdigest()
+
+
+class ContentKeys(CacheKeys):
+    """Content keys that are computed by hashing the files, as git blob IDs."""
+
+    def key(self, filepath: Path) -> str:
+        """Hashes a file.
+
+        :param filepath: The path to the file.
+        :return: The git blob ID of the file.
+        """
+        return blob_id(filepath.read_bytes())
+
+
+class GitKeys(ContentKeys):
+    """Content keys that are read from the git index of a repository.
+
+    The blob IDs of all files in the index are read with a single ``git ls-files``, such that the files
+    are not hashed. Files with uncommitted changes, untracked files and files outside the working tree
+    are hashed instead. The index is read when the keys are constructed, and again on ``refresh``, such
+    that changes to the files afterwards are only seen after a refresh.
+    """
+
+    def __init__(self, root: str | Path = ".") -> None:
+        """
+        Initialize a new instance of the GitKeys class.
+
+        :param root: A directory in the working tree of the repository, of which the files are read from
+            the index. Defaults to the current directory.
+        """
+        self.root = Path(root).resolve()
+        self._blobs: dict[str, str] = {}
+        self.refresh()
+
+    def __len__(self) -> int:
+        """The number of files of which the key is read from the index."""
+        return len(self._blobs)
+
+    def refresh(self) -> None:
+        """Reads the blob IDs of the unchanged files from the index.
+
+        If git is not installed or the root is not in a git working tree, all files are hashed.
+        """
+        try:
+            # With --modified, the entries of changed files are listed a second time after the index
+            output = subprocess.run(
+                ["git", "ls-files", "--stage", "--modified", "-z"],
+                cwd=self.root,
+                capture_output=True,
+                check=True,
+            ).stdout.decode("utf-8", errors="surrogateescape")
+        except (OSError, subprocess.CalledProcessError) as err:
+            LOGGER.logger.warning(
+                f"Cannot read the git index of {self.root}, files are hashed: {err}"
+            )
+            self._blobs = {}
+            return
+
+        blobs: dict[str, str] = {}
+        listed: set[str] = set()
+        for entry in output.split("\0"):
+            if not entry:
+                continue
+            info, name = entry.split("\t", 1)
+            mode, blob, stage = info.split(" ")
+            path = str(self.root / name)
+            if path in listed:
+                blobs.pop(path, None)
+                continue
+            listed.add(path)
+            if mode in _REGULAR_MODES and stage == "0":
+                blobs[path] = blob
+        self._blobs = blobs
+
+    def key(self, filepath: Path) -> str:
+        """Gets the blob ID of a file from the index, or hashes the file if it has changed.
+
+        :param filepath: The path to the file.
+        :return: The git blob ID of the file.
+        """
+        blob = self._blobs.get(str(filepath.resolve()))
+        return blob if blob is not None else super().key(filepath)
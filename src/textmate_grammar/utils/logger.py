@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 import logging
-from functools import wraps
+import threading
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
@@ -11,16 +11,6 @@ if TYPE_CHECKING:
 MAX_LENGTH = 79
 
 
-def track_depth(func):
-    """Simple decorator to track recusion depth."""
-
-    @wraps(func)
-    def wrapper(*args, depth: int = -1, **kwargs):
-        return func(*args, depth=depth + 1, **kwargs)
-
-    return wrapper
-
-
 class LogFormatter(logging.Formatter):
     """
     A custom log formatter that formats log records with color-coded messages.
@@ -54,19 +44,32 @@ class LogFormatter(logging.Formatter):
         return formatter.format(record)
 
 
+class LoggerConfiguration(threading.local):
+    """The configuration of the logger to a grammar and content, which is kept per thread."""
+
+    def __init__(self) -> None:
+        self.id: str | None = None
+        self.max_token_length = 50
+        self.line_decimals = 3
+        self.position_decimals = 3
+        self.scope = "UNKNOWN"
+
+
 class Logger:
     """
     The logger object for the grammar parsers.
+
+    Logging calls on the parse path are guarded as ``if __debug__ and LOGGER.debug_enabled:``, such
+    that messages are only constructed if the level is enabled, and such that the calls are removed
+    entirely when Python runs with optimizations (``python -O``). The configuration is kept per
+    thread, such that parses in different threads do not change each other's messages.
     """
 
     long_msg_div = "\x1b[1;32m ... \x1b[0m"
 
     def __init__(self, **kwargs) -> None:
-        self.id = None
-        self.max_token_length = 50
-        self.line_decimals = 3
-        self.position_decimals = 3
-        self.scope = "UNKNOWN"
+        self.config = LoggerConfiguration()
+        self._max_token_lengths: dict[str, int] = {}
         self.logger = logging.getLogger("textmate_grammar")
         channel = logging.StreamHandler()
         channel.setFormatter(LogFormatter())
@@ -74,14 +77,29 @@ class Logger:
 
     def configure(self, parser: GrammarParser, height: int, width: int, **kwargs) -> None:
         """Configures the logger to a specific grammar and content length"""
-        self.line_decimals = len(str(height))
-        self.position_decimals = len(str(width))
+        config = self.config
+        config.line_decimals = len(str(height))
+        config.position_decimals = len(str(width))
         id = parser.token if parser.token else parser.key
-        if self.id != id:
-            self.id = id
-            tokens = _gen_all_tokens(parser.grammar)
-            self.max_token_length = max(len(token) for token in tokens)
-            self.scope = parser.token
+        if config.id != id:
+            config.id = id
+            if id not in self._max_token_lengths:
+                tokens = _gen_all_tokens(parser.grammar)
+                self._max_token_lengths[id] = max(len(token) for token in tokens)
+            config.max_token_length = self._max_token_lengths[id]
+            config.scope = parser.token
+
+    @property
+    def debug_enabled(self) -> bool:
+        return self.logger.isEnabledFor(logging.DEBUG)
+
+    @property
+    def info_enabled(self) -> bool:
+        return self.logger.isEnabledFor(logging.INFO)
+
+    @property
+    def warning_enabled(self) -> bool:
+        return self.logger.isEnabledFor(logging.WARNING)
 
     def format_message(
         self,
@@ -99,20 +117,22 @@ class Logger:
         :param depth: The depth of the message in the logging hierarchy. Defaults to 0.
         :return: The formatted logging message.
         """
+        config = self.config
         if position:
             msg_pos = "{:{ll}d}-{:{lp}d}".format(
-                *position, ll=self.line_decimals, lp=self.position_decimals
+                *position, ll=config.line_decimals, lp=config.position_decimals
             ).replace(" ", "0")
         else:
-            msg_pos = "." * (self.line_decimals + self.position_decimals + 1)
+            msg_pos = "." * (config.line_decimals + config.position_decimals + 1)
 
         if parser:
             parser_id = parser.token if parser.token else parser.key
             msg_id = (
-                "." * (self.max_token_length - len(parser_id)) + parser_id[: self.max_token_length]
+                "." * (config.max_token_length - len(parser_id))
+                + parser_id[: config.max_token_length]
             )
         else:
-            msg_id = "." * self.max_token_length
+            msg_id = "." * config.max_token_length
 
         vb_message = f"{'|'*(depth-1)}{'-'*bool(depth)}{message}"
 
@@ -120,7 +140,7 @@ class Logger:
             half_length = min([(MAX_LENGTH - 6) // 2, (len(vb_message) - 6) // 2])
             vb_message = vb_message[:half_length] + self.long_msg_div + vb_message[-half_length:]
 
-        return f"{self.scope}:{msg_pos}:{msg_id}: {vb_message}"
+        return f"{config.scope}:{msg_pos}:{msg_id}: {vb_message}"
 
     def debug(self, *args, **kwargs) -> None:
         if self.logger.getEffectiveLevel() > logging.DEBUG:
@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+import multiprocessing
+import os
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+from pathlib import Path
+from time import perf_counter
+from typing import TYPE_CHECKING, Iterable, Iterator
+
+if TYPE_CHECKING:
+    from ..elements import ContentElement
+    from ..parsers.base import LanguageParser
+
+from .tokens import TokenArray
+
+# The language parser of a worker process, constructed once by the initializer of the pool
+_PARSER: LanguageParser | None = None
+
+
+def _initialize_worker(parser: LanguageParser) -> None:
+    """Sets the language parser of a worker process.
+
+    With the fork start method the parser of the parent process is inherited as is, with other start
+    methods the parser is pickled and reconstructed from its constructor arguments.
+    """
+    global _PARSER
+    _PARSER = parser
+
+
+def _parse_in_worker(path: Path, **kwargs) -> tuple[TokenArray | None, float]:
+    """Parses a file in a worker process, without caching the result in the worker.
+
+    The element tree is returned as token array, which is transferred to the parent process as a single
+    buffer instead of pickling every element, together with the parse time.
+    """
+    if _PARSER is None:
+        raise RuntimeError("The worker process has no language parser, see worker_pool")
+    started = perf_counter()
+    element = _PARSER._parse_path(path, **kwargs)
+    if element is None:
+        return None, perf_counter() - started
+    tokens = TokenArray.from_element(element, _PARSER._grammar_table)
+    return tokens, perf_counter() - started
+
+
+def _parse_string_in_worker(input: str, **kwargs) -> TokenArray | None:
+    """Parses an input string in a worker process, and returns the element tree as token array."""
+    if _PARSER is None:
+        raise RuntimeError("The worker process has no language parser, see worker_pool")
+    element = _PARSER.parse_string(input, **kwargs)
+    if element is None:
+        return None
+    return TokenArray.from_element(element, _PARSER._grammar_table)
+
+
+def _file_size(path: Path) -> int:
+    try:
+        return path.stat().st_size
+    except OSError:
+        return 0
+
+
+def parse_files(
+    parser: LanguageParser,
+    paths: Iterable[str | Path],
+    workers: int | None = None,
+    ordered: bool = True,
+    start_method: str | None = None,
+    timings: dict[Path, float] | None = None,
+) -> Iterator[tuple[Path, ContentElement | None]]:
+    """
+    Parses many files with a language parser in a pool of worker processes.
+
+    Cached files are loaded from the cache of the parser, and the parsed files are saved to it. The
+    remaining files are submitted to the pool from largest to smallest, such that a large file that is
+    submitted last does not delay the completion of the batch. With a single worker, or a single file
+    to parse, the files are parsed in the current process.
+
+    :param parser: The language parser.
+    :param paths: The paths to the files to be parsed.
+    :param workers: The number of worker processes. Defaults to the number of CPUs.
+    :param ordered: Whether to yield the results in the order of the paths, or as they complete.
+        Defaults to True.
+    :param start_method: The multiprocessing start method. Defaults to the platform default.
+    :param timings: A dictionary to which the parse time in seconds of every file that is not cached
+        is written. Defaults to None.
+    :return: An iterator of the resolved paths and their parsed elements.
+    :raises IncompatibleFileType: If any of the files has an unsupported file type.
+    """
+    checked = [parser._check_path(path) for path in paths]
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    cached = {path for path in checked if parser._cache.cache_valid(path)}
+    pending = sorted(set(checked) - cached, key=_file_size, reverse=True)
+    if timings is None:
+        timings = {}
+    return _iterate_results(
+        parser, checked, cached, pending, workers, ordered, start_method, timings
+    )
+
+
+def _iterate_results(
+    parser: LanguageParser,
+    checked: list[Path],
+    cached: set[Path],
+    pending: list[Path],
+    workers: int,
+    ordered: bool,
+    start_method: str | None,
+    timings: dict[Path, float],
+) -> Iterator[tuple[Path, ContentElement | None]]:
+    if workers <= 1 or len(pending) <= 1:
+        for path in checked:
+            started = perf_counter()
+            element = parser.parse_file(path)
+            if path not in cached:
+                timings[path] = perf_counter() - started
+            yield path, element
+        return
+
+    if not ordered:
+        for path in checked:
+            if path in cached:
+                yield path, parser._cache.load(path)
+
+    executor = _executor(parser, min(workers, len(pending)), start_method)
+    try:
+        futures: dict[Future, Path] = {
+            executor.submit(_parse_in_worker, path): path for path in pending
+        }
+        if ordered:
+            by_path = {path: future for future, path in futures.items()}
+            for path in checked:
+                if path in cached:
+                    yield path, parser._cache.load(path)
+                else:
+                    yield path, _collect(parser, path, by_path[path], timings)
+        else:
+            for future in as_completed(futures):
+                path = futures[future]
+                yield path, _collect(parser, path, future, timings)
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def worker_pool(
+    parser: LanguageParser, workers: int | None = None, start_method: str | None = None
+) -> ProcessPoolExecutor:
+    """
+    Creates a pool of worker processes for the asynchronous parse methods of a language parser.
+
+    Each worker constructs the language parser once when it starts, instead of for every parse.
+
+    :param parser: The language parser.
+    :param workers: The number of worker processes. Defaults to the number of CPUs.
+    :param start_method: The multiprocessing start method. Defaults to the platform default.
+    :return: The pool of worker processes.
+    """
+    return _executor(parser, workers or os.cpu_count() or 1, start_method)
+
+
+def _executor(
+    parser: LanguageParser, workers: int, start_method: str | None
+) -> ProcessPoolExecutor:
+    """Creates a pool of worker processes, of which each worker holds the language parser."""
+    context = multiprocessing.get_context(start_method)
+    if context.get_start_method() == "forkserver":
+        context.set_forkserver_preload([parser.__class__.__module__])  # type: ignore
+
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=context,
+        initializer=_initialize_worker,
+        initargs=(parser,),
+    )
+
+
+def _collect(
+    parser: LanguageParser, path: Path, future: Future, timings: dict[Path, float]
+) -> ContentElement | None:
+    """Gets the result of a worker and saves it to the cache of the parser."""
+    tokens, timings[path] = future.result()
+    if tokens is None:
+        return None
+    element = tokens.to_element(parser._grammar_table)
+    parser._cache.save(path, element)
+    return element
@@ -0,0 +1,388 @@
+from __future__ import annotations
+
+import re
+from typing import Iterable, NamedTuple
+
+ASCII = frozenset(chr(i) for i in range(128))
+WHITESPACE = frozenset("\t\n\v\f\r ")
+DIGITS = frozenset("0123456789")
+WORD = frozenset("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_")
+HEX = frozenset("0123456789abcdefABCDEF")
+
+_CLASS_ESCAPES = {
+    "s": WHITESPACE,
+    "d": DIGITS,
+    "w": WORD,
+    "h": HEX,
+}
+_CHAR_ESCAPES = {"n": "\n", "t": "\t", "r": "\r", "f": "\f", "v": "\v", "a": "\a", "e": "\x1b"}
+_ZERO_WIDTH_ESCAPES = set("AbBzZ")
+
+
+class CharFilter:
+    """A conservative set of characters at which a pattern match can start.
+
+    ASCII characters are stored explicitly, all non-ASCII characters are covered by a single flag.
+    """
+
+    __slots__ = ("chars", "non_ascii")
+
+    def __init__(self, chars: Iterable[str] = (), non_ascii: bool = False) -> None:
+        self.chars = frozenset(chars)
+        self.non_ascii = non_ascii
+
+    def __or__(self, other: CharFilter) -> CharFilter:
+        return CharFilter(self.chars | other.chars, self.non_ascii or other.non_ascii)
+
+    def __repr__(self) -> str:
+        return f"CharFilter({''.join(sorted(self.chars))!r}, non_ascii={self.non_ascii})"
+
+    @property
+    def is_any(self) -> bool:
+        return self.non_ascii and self.chars >= ASCII
+
+    def accepts(self, chars: frozenset[str]) -> bool:
+        """Whether any of the input characters can be the start of a match."""
+        if not self.chars.isdisjoint(chars):
+            return True
+        return self.non_ascii and any(ord(char) > 127 for char in chars)
+
+
+_EMPTY = CharFilter()
+_ANY = CharFilter(ASCII, non_ascii=True)
+
+
+class _Unsupported(Exception):
+    """Raised when a pattern uses syntax for which no safe filter can be derived."""
+
+
+class _FirstCharAnalyzer:
+    """Derives the first character set of an oniguruma pattern by recursive descent.
+
+    Each parsed (sub)expression results in a tuple (first, nullable), where ``first`` is the
+    set of characters the expression can start with and ``nullable`` whether it can match the
+    empty string. Lookarounds and anchors are zero-width and are treated as the empty string,
+    which can only enlarge the derived set.
+    """
+
+    def __init__(self, pattern: str) -> None:
+        self.pattern = pattern
+        self.pos = 0
+
+    def peek(self, offset: int = 0) -> str:
+        index = self.pos + offset
+        return self.pattern[index] if index < len(self.pattern) else ""
+
+    def analyze(self) -> tuple[CharFilter, bool]:
+        result = self.alternation()
+        if self.pos != len(self.pattern):
+            raise _Unsupported
+        return result
+
+    def alternation(self) -> tuple[CharFilter, bool]:
+        first, nullable = self.sequence()
+        while self.peek() == "|":
+            self.pos += 1
+            alt_first, alt_nullable = self.sequence()
+            first, nullable = first | alt_first, nullable or alt_nullable
+        return first, nullable
+
+    def sequence(self) -> tuple[CharFilter, bool]:
+        first, nullable = _EMPTY, True
+        while self.peek() not in ("", "|", ")"):
+            item_first, item_nullable = self.quantified()
+            if nullable:
+                first = first | item_first
+                nullable = item_nullable
+        return first, nullable
+
+    def quantified(self) -> tuple[CharFilter, bool]:
+        first, nullable = self.atom()
+        while True:
+            char = self.peek()
+            if char in ("*", "?"):
+                self.pos += 1
+                nullable = True
+            elif char == "+":
+                self.pos += 1
+            elif char == "{" and (min_zero := self._brace_quantifier()) is not None:
+                nullable = nullable or min_zero
+            else:
+                break
+            # Lazy and possessive modifiers
+            if self.peek() in ("?", "+"):
+                self.pos += 1
+        return first, nullable
+
+    def _brace_quantifier(self) -> bool | None:
+        """Consumes a {n,m} quantifier, returning whether its minimum is zero."""
+        close = self.pattern.find("}", self.pos)
+        if close == -1:
+            return None
+        lower, _, upper = self.pattern[self.pos + 1 : close].partition(",")
+        if not (lower or upper) or not all(part.isdigit() or not part for part in (lower, upper)):
+            return None
+        self.pos = close + 1
+        return not lower or int(lower) == 0
+
+    def atom(self) -> tuple[CharFilter, bool]:
+        char = self.peek()
+        if char == "(":
+            return self.group()
+        if char == "[":
+            return self.char_class(), False
+        if char == "\\":
+            return self.escape()
+        self.pos += 1
+        if char in ("^", "$"):
+            return _EMPTY, True
+        if char == ".":
+            return CharFilter(ASCII - {"\n"}, non_ascii=True), False
+        return _literal(char), False
+
+    def group(self) -> tuple[CharFilter, bool]:
+        self.pos += 1
+        zero_width = False
+        if self.peek() == "?":
+            self.pos += 1
+            kind = self.peek()
+            if kind == "#":
+                close = self.pattern.find(")", self.pos)
+                if close == -1:
+                    raise _Unsupported
+                self.pos = close + 1
+                return _EMPTY, True
+            elif kind in (":", ">"):
+                self.pos += 1
+            elif kind in ("=", "!"):
+                self.pos += 1
+                zero_width = True
+            elif kind == "<" and self.peek(1) in ("=", "!"):
+                self.pos += 2
+                zero_width = True
+            elif kind == "<":
+                close = self.pattern.find(">", self.pos)
+                if close == -1:
+                    raise _Unsupported
+                self.pos = close + 1
+            else:
+                # Inline options such as (?i) or (?x-i:...)
+                options = ""
+                while self.peek() and self.peek() not in (":", ")"):
+                    options += self.peek()
+                    self.pos += 1
+                enabled = options.split("-")[0]
+                if "i" in enabled or "x" in enabled or not self.peek():
+                    raise _Unsupported
+                if self.peek() == ")":
+                    self.pos += 1
+                    return _EMPTY, True
+                self.pos += 1
+
+        first, nullable = self.alternation()
+        if self.peek() != ")":
+            raise _Unsupported
+        self.pos += 1
+        if zero_width:
+            return _EMPTY, True
+        return first, nullable
+
+    def escape(self) -> tuple[CharFilter, bool]:
+        char = self.peek(1)
+        self.pos += 2
+        if not char:
+            raise _Unsupported
+        if char == "G":
+            raise _Unsupported
+        if char in _ZERO_WIDTH_ESCAPES:
+            return _EMPTY, True
+        if char.lower() in _CLASS_ESCAPES:
+            return _class_escape(char), False
+        if char in _CHAR_ESCAPES:
+            return _literal(_CHAR_ESCAPES[char]), False
+        if char.isalnum():
+            # Backreferences, hex/unicode escapes and properties can match anything
+            return _ANY, False
+        return _literal(char), False
+
+    def char_class(self) -> CharFilter:
+        self.pos += 1
+        negate = False
+        if self.peek() == "^":
+            negate = True
+            self.pos += 1
+
+        chars: set[str] = set()
+        non_ascii = False
+        first = True
+        while True:
+            char = self.peek()
+            if not char:
+                raise _Unsupported
+            if char == "]" and not first:
+                self.pos += 1
+                break
+            first = False
+            if char == "[" or (char == "&" and self.peek(1) == "&"):
+                # Nested sets, posix brackets and intersections
+                self._skip_class()
+                return _ANY
+            if char == "\\":
+                escaped = self.peek(1)
+                self.pos += 2
+                if escaped.lower() in _CLASS_ESCAPES:
+                    item = _class_escape(escaped)
+                    chars |= item.chars
+                    non_ascii = non_ascii or item.non_ascii
+                    continue
+                elif escaped in _CHAR_ESCAPES:
+                    start = _CHAR_ESCAPES[escaped]
+                elif escaped.isalnum() or not escaped:
+                    self._skip_class()
+                    return _ANY
+                else:
+                    start = escaped
+            else:
+                self.pos += 1
+                start = char
+
+            if self.peek() == "-" and self.peek(1) not in ("]", ""):
+                end = self.peek(1)
+                if end in ("\\", "["):
+                    self._skip_class()
+                    return _ANY
+                self.pos += 2
+                for code in range(ord(start), ord(end) + 1):
+                    if code > 127:
+                        non_ascii = True
+                        break
+                    chars.add(chr(code))
+            elif ord(start) > 127:
+                non_ascii = True
+            else:
+                chars.add(start)
+
+        if negate:
+            return CharFilter(ASCII - chars, non_ascii=True)
+        return CharFilter(chars, non_ascii)
+
+    def _skip_class(self) -> None:
+        """Skips to the end of the current (possibly nested) character class."""
+        level = 1
+        while level and self.pos < len(self.pattern):
+            char = self.peek()
+            if char == "\\":
+                self.pos += 2
+                continue
+            if char == "[":
+                level += 1
+            elif char == "]":
+                level -= 1
+            self.pos += 1
+
+
+def _literal(char: str) -> CharFilter:
+    if ord(char) > 127:
+        return CharFilter(non_ascii=True)
+    return CharFilter(char)
+
+
+def _class_escape(char: str) -> CharFilter:
+    chars = _CLASS_ESCAPES[char.lower()]
+    if char.isupper():
+        chars = ASCII - chars
+    return CharFilter(chars, non_ascii=True)
+
+
+def first_chars(pattern: str) -> CharFilter | None:
+    """Derives the set of characters at which a match of the pattern can start.
+
+    The result is conservative: whenever the pattern matches, the matched span starts with a
+    character accepted by the filter. Returns None if no such guarantee can be given, which is the
+    case for patterns that can match the empty string, that are anchored with ``\\G`` or that use
+    unsupported syntax.
+
+    :param pattern: The oniguruma regex pattern.
+    :return: The character filter, or None if the pattern must always be tried.
+    """
+    try:
+        first, nullable = _FirstCharAnalyzer(pattern).analyze()
+    except (_Unsupported, IndexError, ValueError):
+        return None
+    if nullable or first.is_any:
+        return None
+    return first
+
+
+_KEYWORD_ALTERNATION = re.compile(
+    r"(?:\(\?<!(?P<guard>\\[^A-Za-z0-9\s]|[^\\()\[\]|.*+?{}^$\s])\))?"
+    r"(?P<left>\\b)?"
+    r"(?P<open>\((?:\?:)?)?"
+    r"(?P<words>[A-Za-z0-9_]+(?:\|[A-Za-z0-9_]+)*)"
+    r"(?(open)\))"
+    r"(?P<right>\\b)?"
+)
+
+
+class KeywordSpec(NamedTuple):
+    """A pattern that consists of a plain alternation of literal words."""
+
+    words: tuple[str, ...]
+    guard: str | None
+    left_boundary: bool
+    right_boundary: bool
+
+
+def keyword_spec(pattern: str) -> KeywordSpec | None:
+    """Detects patterns of the form ``(?<!g)\\b(word1|word2|...)\\b``.
+
+    The negative lookbehind on a single character and the word boundaries are optional.
+
+    :param pattern: The oniguruma regex pattern.
+    :return: The keyword specification, or None if the pattern is not a plain keyword alternation.
+    """
+    matching = _KEYWORD_ALTERNATION.fullmatch(pattern)
+    if matching is None:
+        return None
+    guard, left, open_group, words, right = matching.group(
+        "guard", "left", "open", "words", "right"
+    )
+    if not open_group and "|" in words and (guard or left or right):
+        # Without a group, the alternation would split the lookbehind and boundaries
+        return None
+    return KeywordSpec(
+        words=tuple(words.split("|")),
+        guard=guard[-1] if guard else None,
+        left_boundary=bool(left),
+        right_boundary=bool(right),
+    )
+
+
+class PatternIndex:
+    """Dispatch index over a list of parsers.
+
+    Given the set of characters at which a match can start in the current search, the index returns
+    the (ordered) subset of parsers that can possibly match. Parsers without a character filter are
+    always included. Lookups are cached per character set.
+    """
+
+    max_cache_size = 4096
+
+    def __init__(self, parsers: list) -> None:
+        self.parsers = parsers
+        self._entries = [(parser, getattr(parser, "prefilter", None)) for parser in parsers]
+        self._cache: dict[frozenset[str], list] = {}
+
+    def select(self, chars: frozenset[str]) -> list:
+        """Returns the parsers that can start a match on any of the input characters."""
+        selected = self._cache.get(chars)
+        if selected is None:
+            selected = [
+                parser
+                for parser, char_filter in self._entries
+                if char_filter is None or char_filter.accepts(chars)
+            ]
+            if len(self._cache) >= self.max_cache_size:
+                self._cache.clear()
+            self._cache[chars] = selected
+        return selected
@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+from time import perf_counter
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from ..handler import ContentHandler
+
+SORT_KEYS = ("attempts", "matches", "searches", "cumulative_time", "self_time", "greedy_fallbacks")
+
+
+class RuleProfile:
+    """The profiling counters of a single grammar rule."""
+
+    __slots__ = (
+        "rule",
+        "attempts",
+        "matches",
+        "searches",
+        "cumulative_time",
+        "self_time",
+        "greedy_fallbacks",
+        "_active",
+    )
+
+    def __init__(self, rule: str) -> None:
+        """
+        Initialize the counters of a rule.
+
+        :param rule: The description of the grammar rule.
+
+        :ivar attempts: The number of parse attempts of the rule.
+        :ivar matches: The number of successful parse attempts of the rule.
+        :ivar searches: The number of regex searches performed by the rule itself.
+        :ivar cumulative_time: The time spent in the rule, including its nested rules.
+        :ivar self_time: The time spent in the rule, excluding its nested rules.
+        :ivar greedy_fallbacks: The number of times the rule retried its patterns allowing for any
+            leading characters, after no pattern was found directly at the current position.
+        """
+        self.rule = rule
+        self.attempts = 0
+        self.matches = 0
+        self.searches = 0
+        self.cumulative_time = 0.0
+        self.self_time = 0.0
+        self.greedy_fallbacks = 0
+        self._active = 0
+
+    def __repr__(self) -> str:
+        return (
+            f"{self.__class__.__name__}({self.rule}, attempts={self.attempts}, "
+            f"matches={self.matches}, searches={self.searches}, "
+            f"cumulative_time={self.cumulative_time:.6f}, self_time={self.self_time:.6f}, "
+            f"greedy_fallbacks={self.greedy_fallbacks})"
+        )
+
+    def to_dict(self) -> dict:
+        """Converts the counters to a dictionary."""
+        return {"rule": self.rule, **{key: getattr(self, key) for key in SORT_KEYS}}
+
+
+class ProfileReport:
+    """The per-rule profiling report of a parse."""
+
+    def __init__(self, rules: list[RuleProfile]) -> None:
+        self.rules = rules
+
+    def __iter__(self):
+        return iter(self.rules)
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    def sorted(self, key: str = "self_time", reverse: bool = True) -> list[RuleProfile]:
+        """
+        Sorts the rules by one of their counters.
+
+        :param key: The counter to sort by. Defaults to "self_time".
+        :param reverse: Whether to sort in descending order. Defaults to True.
+        :return: The sorted list of rule profiles.
+        """
+        if key not in SORT_KEYS:
+            raise ValueError(f"Sort key must be one of {', '.join(SORT_KEYS)}")
+        return sorted(self.rules, key=lambda profile: getattr(profile, key), reverse=reverse)
+
+    def format(self, key: str = "self_time", limit: int | None = 20) -> str:
+        """
+        Formats the report as a table of the hottest rules.
+
+        :param key: The counter to sort by. Defaults to "self_time".
+        :param limit: The maximum number of rules to include. Defaults to 20.
+        :return: The formatted table.
+        """
+        rows = [
+            f"{'attempts':>9} {'matches':>9} {'searches':>9} {'cumtime':>9} {'selftime':>9} "
+            f"{'greedy':>7}  rule"
+        ]
+        for profile in self.sorted(key)[:limit]:
+            rows.append(
+                f"{profile.attempts:9d} {profile.matches:9d} {profile.searches:9d} "
+                f"{profile.cumulative_time:9.4f} {profile.self_time:9.4f} "
+                f"{profile.greedy_fallbacks:7d}  {profile.rule}"
+            )
+        return "\n".join(rows)
+
+    def print(self, key: str = "self_time", limit: int | None = 20) -> None:
+        """Prints the report as a table of the hottest rules."""
+        print(self.format(key=key, limit=limit))
+
+
+class Profiler:
+    """Collects per-rule profiling counters during a parse.
+
+    The profiler is attached to a content handler as a parse hook, which is notified whenever a rule
+    starts and finishes a parse attempt. Parsing without any hooks is unaffected.
+    """
+
+    def __init__(self) -> None:
+        self._profiles: dict[int, RuleProfile] = {}
+        self._stack: list[list] = []
+        self.current: RuleProfile | None = None
+
+    def rule(self, parser: Any) -> RuleProfile:
+        """Gets the counters of a grammar rule."""
+        profile = self._profiles.get(id(parser))
+        if profile is None:
+            profile = self._profiles[id(parser)] = RuleProfile(repr(parser))
+        return profile
+
+    def attach(self, handler: ContentHandler) -> None:
+        """Attaches the profiler to a content handler, counting its regex searches per rule."""
+        search = handler.search
+
+        def profiled_search(*args, **kwargs):
+            if self.current is not None:
+                self.current.searches += 1
+            return search(*args, **kwargs)
+
+        handler.search = profiled_search  # type: ignore
+        handler.profiler = self
+        handler.hooks.append(self)
+
+    def enter(self, parser: Any, starting: tuple[int, int], depth: int) -> None:
+        """Records the start of a parse attempt of a rule.
+
+        :param parser: The grammar rule.
+        :param starting: The starting position of the attempt.
+        :param depth: The depth of the rule in the rule stack.
+        """
+        profile = self.current = self.rule(parser)
+        profile.attempts += 1
+        profile._active += 1
+        self._stack.append([profile, perf_counter(), 0.0])
+
+    def exit(self, parser: Any, result: tuple) -> None:
+        """Records the end of the last started parse attempt.
+
+        :param parser: The grammar rule.
+        :param result: The parse result of the attempt.
+        """
+        profile, start, nested_time = self._stack.pop()
+        elapsed = perf_counter() - start
+        profile._active -= 1
+        if result[0]:
+            profile.matches += 1
+        profile.self_time += elapsed - nested_time
+        # For rules that are nested in themselves, only the outermost attempt adds to the total
+        if not profile._active:
+            profile.cumulative_time += elapsed
+        if self._stack:
+            self._stack[-1][2] += elapsed
+            self.current = self._stack[-1][0]
+        else:
+            self.current = None
+
+    def report(self) -> ProfileReport:
+        """Creates the report of the collected counters."""
+        return ProfileReport(list(self._profiles.values()))
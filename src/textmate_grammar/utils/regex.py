@@ -0,0 +1,230 @@
+from __future__ import annotations
+
+import re
+import warnings
+from typing import NamedTuple, Union
+
+from onigurumacffi import _Match as OnigMatch
+from onigurumacffi import _Pattern as OnigPattern
+from onigurumacffi import compile as onig_compile
+
+BACKENDS = ("auto", "oniguruma")
+
+_SIMPLE_ESCAPES = set("sSdDwWbBntrfva")
+_CLASS_ESCAPES = set("sSdDwWntrfva")
+_SPECIAL = set("\\[](){}|.*+?^$")
+
+
+class Incompatible(Exception):
+    """Raised when a pattern cannot be proven to behave identically under Python's re module."""
+
+
+class _Translator:
+    """Checks an oniguruma pattern against a whitelist of syntax and translates it to Python's re.
+
+    The whitelist contains the syntax that is known to behave identically in both engines for ASCII
+    subject strings: literals, escaped punctuation, ``\\s\\d\\w\\b`` and their negations, simple
+    character classes, (non-)capturing groups, lookarounds, numbered backreferences and quantifiers.
+    The only syntax that needs translation is ``^``, which in oniguruma does not match after a trailing
+    newline at the end of the subject.
+    """
+
+    def __init__(self, pattern: str) -> None:
+        self.pattern = pattern
+        self.pos = 0
+        self.output: list[str] = []
+
+    def peek(self, offset: int = 0) -> str:
+        index = self.pos + offset
+        return self.pattern[index] if index < len(self.pattern) else ""
+
+    def emit(self, text: str, length: int | None = None) -> None:
+        self.output.append(text)
+        self.pos += len(text) if length is None else length
+
+    def translate(self) -> str:
+        if not self.pattern.isascii():
+            raise Incompatible("non-ASCII pattern")
+        while self.pos < len(self.pattern):
+            char = self.peek()
+            if char == "\\":
+                self.escape()
+            elif char == "[":
+                self.char_class()
+            elif char == "(":
+                self.group()
+            elif char == "{":
+                self.brace()
+            elif char == "^":
+                self.emit(r"(?:\A|^(?!\Z))", 1)
+            else:
+                self.emit(char)
+        return "".join(self.output)
+
+    def escape(self) -> None:
+        char = self.peek(1)
+        simple = char in _SIMPLE_ESCAPES or (char and not char.isalnum() and char not in "<>")
+        backreference = char.isdigit() and char != "0" and not self.peek(2).isdigit()
+        if simple or backreference:
+            self.emit("\\" + char)
+        else:
+            raise Incompatible(f"escape \\{char}")
+
+    def char_class(self) -> None:
+        start = self.pos
+        self.pos += 1
+        if self.peek() == "^":
+            self.pos += 1
+        if self.peek() == "]":
+            self.pos += 1
+        while True:
+            char = self.peek()
+            if not char:
+                raise Incompatible("unterminated character class")
+            if char == "]":
+                self.pos += 1
+                break
+            if char == "[":
+                raise Incompatible("nested character class")
+            if char in "&-|~" and self.peek(1) == char:
+                raise Incompatible("character class set operation")
+            if char == "\\":
+                escaped = self.peek(1)
+                if not (escaped in _CLASS_ESCAPES or escaped in _SPECIAL or not escaped.isalnum()):
+                    raise Incompatible(f"escape \\{escaped} in character class")
+                self.pos += 2
+                continue
+            self.pos += 1
+        self.output.append(self.pattern[start : self.pos])
+
+    def group(self) -> None:
+        if self.peek(1) != "?":
+            self.emit("(")
+            return
+        kind = self.peek(2)
+        if kind in (":", "=", "!"):
+            self.emit("(?" + kind)
+        elif kind == "<" and self.peek(3) in ("=", "!"):
+            self.emit("(?<" + self.peek(3))
+        elif kind == "#":
+            close = self.pattern.find(")", self.pos)
+            if close == -1:
+                raise Incompatible("unterminated comment")
+            self.pos = close + 1
+        else:
+            raise Incompatible(f"group (?{kind}")
+
+    def brace(self) -> None:
+        close = self.pattern.find("}", self.pos)
+        body = self.pattern[self.pos + 1 : close] if close != -1 else ""
+        lower, _, upper = body.partition(",")
+        if not lower.isdigit() or not (upper.isdigit() or not upper):
+            raise Incompatible("brace quantifier")
+        if self.pattern[close + 1 : close + 2] in ("?", "+"):
+            # Oniguruma reads {n}? as optional and {n,m}+ as repeated, rather than lazy or possessive
+            raise Incompatible("modified brace quantifier")
+        self.emit(self.pattern[self.pos : close + 1])
+
+
+def translate(pattern: str) -> str:
+    """Translates an oniguruma pattern to an equivalent Python pattern for ASCII subject strings.
+
+    :param pattern: The oniguruma regex pattern.
+    :return: The Python regex pattern.
+    :raises Incompatible: If the pattern uses syntax outside of the verified whitelist.
+    """
+    return _Translator(pattern).translate()
+
+
+class PythonPattern:
+    """A pattern that is matched by Python's re module on ASCII lines, and by oniguruma otherwise."""
+
+    def __init__(self, pattern: str, compiled: re.Pattern, fallback: OnigPattern) -> None:
+        self._pattern = pattern
+        self._compiled = compiled
+        self._fallback = fallback
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self._pattern!r})"
+
+    def number_of_captures(self) -> int:
+        return self._compiled.groups
+
+    def search(self, line: str, start: int = 0) -> Match | None:
+        if line.isascii():
+            return self._compiled.search(line, start)
+        return self._fallback.search(line, start=start)
+
+    def match(self, line: str, start: int = 0) -> Match | None:
+        if line.isascii():
+            return self._compiled.match(line, start)
+        return self._fallback.match(line, start=start)
+
+
+Pattern = Union[OnigPattern, PythonPattern]  # noqa: UP007
+Match = Union[OnigMatch, re.Match]  # noqa: UP007
+
+
+class BackendDecision(NamedTuple):
+    """The regex backend chosen for a single pattern of a grammar rule."""
+
+    rule: str
+    pattern: str
+    backend: str
+    reason: str
+
+
+def check_compatibility(pattern: str) -> tuple[re.Pattern | None, str]:
+    """Checks whether a pattern can be matched by Python's re module with identical results.
+
+    :param pattern: The oniguruma regex pattern.
+    :return: A tuple of the compiled Python pattern, or None if the pattern is incompatible, and the
+        reason for the decision.
+    """
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            compiled = re.compile(translate(pattern), re.ASCII | re.MULTILINE)
+    except Incompatible as err:
+        return None, str(err)
+    except (re.error, FutureWarning, RecursionError, OverflowError) as err:
+        return None, f"re.compile failed: {err}"
+    if compiled.groups != onig_compile(pattern).number_of_captures():
+        return None, "different number of capture groups"
+    return compiled, "compatible syntax"
+
+
+def compile_pattern(pattern: str, backend: str = "auto") -> Pattern:
+    """Compiles a pattern with the fastest backend that is guaranteed to give identical matches.
+
+    With the ``auto`` backend, patterns that only use syntax with identical semantics in Python's re
+    module are matched natively on ASCII lines. All other patterns use oniguruma.
+
+    :param pattern: The oniguruma regex pattern.
+    :param backend: The backend, either "auto" or "oniguruma". Defaults to "auto".
+    :return: The compiled pattern.
+    """
+    if backend not in BACKENDS:
+        raise NotImplementedError(f"Regex backend {backend} not implemented.")
+
+    onig_pattern = onig_compile(pattern)
+    if backend == "auto":
+        compiled, _ = check_compatibility(pattern)
+        if compiled is not None:
+            return PythonPattern(pattern, compiled, onig_pattern)
+    return onig_pattern
+
+
+def decide_backend(rule: str, pattern: Pattern) -> BackendDecision:
+    """Explains the backend decision of a compiled pattern.
+
+    :param rule: The description of the grammar rule the pattern belongs to.
+    :param pattern: The compiled pattern.
+    :return: The backend decision.
+    """
+    if isinstance(pattern, PythonPattern):
+        return BackendDecision(rule, pattern._pattern, "python", "compatible syntax")
+    compiled, reason = check_compatibility(pattern._pattern)
+    if compiled is not None:
+        reason = "oniguruma backend selected"
+    return BackendDecision(rule, pattern._pattern, "oniguruma", reason)
@@ -0,0 +1,365 @@
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from enum import IntEnum
+from pathlib import Path
+from time import monotonic
+from typing import TYPE_CHECKING, Any, Callable
+
+from .cancellation import CancellationToken
+from .exceptions import ParseCancelled
+
+if TYPE_CHECKING:
+    from ..elements import ContentElement
+    from ..parsers.base import LanguageParser
+
+
+class Priority(IntEnum):
+    """The priority classes of jobs, of which the lower values are scheduled first."""
+
+    VISIBLE = 0
+    NORMAL = 1
+    BACKGROUND = 2
+
+
+class Job:
+    """A scheduled parse, of which the result is available through its future.
+
+    The queue time is the time that the job waited for a worker, including the waits after it was
+    preempted, and the parse time is the duration of the completed parse.
+    """
+
+    def __init__(
+        self,
+        scheduler: Scheduler,
+        function: Callable[..., Any],
+        args: tuple,
+        kwargs: dict,
+        priority: Priority,
+        client: str,
+        document: str | None,
+    ) -> None:
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs
+        self.priority = priority
+        self.client = client
+        self.document = document
+        self.future: Future = Future()
+        self.submitted = monotonic()
+        self.started: float | None = None
+        self.finished: float | None = None
+        self.parse_time: float | None = None
+        self.preemptions = 0
+        self._scheduler = scheduler
+        self._token: CancellationToken | None = None
+        self._preempted = False
+
+    def __repr__(self) -> str:
+        return f"Job<{self.priority.name}:{self.client}:{self.document}>"
+
+    @property
+    def queue_time(self) -> float | None:
+        """The time in seconds that the job waited for a worker, or None if it did not finish."""
+        if self.finished is None or self.parse_time is None:
+            return None
+        return self.finished - self.submitted - self.parse_time
+
+    def cancel(self) -> bool:
+        """Cancels the job, and its parse if it is running. Returns False if the job already finished."""
+        return self._scheduler._cancel(self)
+
+    def result(self, timeout: float | None = None) -> Any:
+        """Waits for the result of the job.
+
+        :param timeout: The time in seconds to wait. Defaults to None, to wait until the job is done.
+        :raises CancelledError: If the job was cancelled or superseded.
+        """
+        return self.future.result(timeout)
+
+    def done(self) -> bool:
+        """Whether the job finished or was cancelled."""
+        return self.future.done()
+
+
+class Scheduler:
+    """A scheduler of parse jobs, which runs the jobs of the highest priority class first.
+
+    Within a priority class, the clients are served in turn, such that a client with many jobs does not
+    delay the jobs of other clients. A job for a document supersedes the unfinished job of the same
+    client for that document, which is cancelled. When all workers are busy, a new job preempts the
+    running job of the lowest priority class below its own, which is cancelled and scheduled again.
+    """
+
+    def __init__(self, parser: LanguageParser, workers: int = 1, preempt: bool = True) -> None:
+        """
+        Initialize a new instance of the Scheduler class.
+
+        :param parser: The language parser.
+        :param workers: The number of worker threads. Defaults to 1.
+        :param preempt: Whether jobs preempt running jobs of a lower priority class. Defaults to True.
+        """
+        self.parser = parser
+        self.preempt = preempt
+        self._queues: dict[Priority, OrderedDict[str, deque[Job]]] = {
+            priority: OrderedDict() for priority in Priority
+        }
+        self._documents: dict[tuple[str, str], Job] = {}
+        self._running: set[Job] = set()
+        # The running aggregates of the finished jobs per priority class, such that no job is kept
+        self._totals: dict[Priority, dict[str, float]] = {
+            priority: dict.fromkeys(
+                (
+                    "finished",
+                    "preemptions",
+                    "queue_time_sum",
+                    "queue_time_max",
+                    "parse_time_sum",
+                    "parse_time_max",
+                ),
+                0,
+            )
+            for priority in Priority
+        }
+        self._condition = threading.Condition(threading.RLock())
+        self._closed = False
+        self._threads = [
+            threading.Thread(target=self._work, name=f"scheduler_{index}", daemon=True)
+            for index in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def parse_file(
+        self,
+        filePath: str | Path,
+        priority: Priority = Priority.NORMAL,
+        client: str = "",
+        **kwargs,
+    ) -> Job:
+        """
+        Schedules the parse of a file, which supersedes the unfinished job of the client for the file.
+
+        :param filePath: The path to the file to be parsed.
+        :param priority: The priority class. Defaults to NORMAL.
+        :param client: The client of the job. Defaults to "".
+        :param kwargs: The keyword arguments of ``parse_file``.
+        :return: The job, of which the result is the parsed element.
+        """
+        return self.submit(
+            self.parser.parse_file,
+            filePath,
+            priority=priority,
+            client=client,
+            document=str(Path(filePath).resolve()),
+            **kwargs,
+        )
+
+    def parse_string(
+        self,
+        input: str,
+        document: str | None = None,
+        priority: Priority = Priority.NORMAL,
+        client: str = "",
+        **kwargs,
+    ) -> Job:
+        """
+        Schedules the parse of an input string, such as the unsaved content of a document.
+
+        :param input: The input string to be parsed.
+        :param document: The document of the input, of which the unfinished job of the client is
+            superseded. Defaults to None.
+        :param priority: The priority class. Defaults to NORMAL.
+        :param client: The client of the job. Defaults to "".
+        :param kwargs: The keyword arguments of ``parse_string``.
+        :return: The job, of which the result is the parsed element.
+        """
+        return self.submit(
+            self.parser.parse_string,
+            input,
+            priority=priority,
+            client=client,
+            document=document,
+            **kwargs,
+        )
+
+    def submit(
+        self,
+        function: Callable[..., ContentElement | None],
+        *args,
+        priority: Priority = Priority.NORMAL,
+        client: str = "",
+        document: str | None = None,
+        **kwargs,
+    ) -> Job:
+        """
+        Schedules a parse function.
+
+        :param function: The parse function, which accepts a cancellation token as ``cancel`` argument.
+        :param priority: The priority class. Defaults to NORMAL.
+        :param client: The client of the job. Defaults to "".
+        :param document: The document of the job, of which the unfinished job of the client is
+            superseded. Defaults to None.
+        :return: The job.
+        :raises RuntimeError: If the scheduler is shut down.
+        """
+        job = Job(self, function, args, kwargs, Priority(priority), client, document)
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Cannot schedule jobs after shutdown")
+            if document is not None:
+                superseded = self._documents.get((client, document))
+                if superseded is not None:
+                    self._cancel(superseded)
+                self._documents[(client, document)] = job
+            self._enqueue(job)
+            if self.preempt and len(self._running) >= len(self._threads):
+                self._preempt(job.priority)
+            self._condition.notify()
+        return job
+
+    def shutdown(self, wait: bool = True) -> None:
+        """
+        Stops the workers after their running jobs, and cancels the scheduled jobs.
+
+        :param wait: Whether to wait for the running jobs. Defaults to True.
+        """
+        with self._condition:
+            self._closed = True
+            for queues in self._queues.values():
+                for queue in queues.values():
+                    for job in queue:
+                        job.future.cancel()
+                queues.clear()
+            self._condition.notify_all()
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+    def stats(self) -> dict[str, dict[str, Any]]:
+        """
+        Reports the queue and parse times of the finished jobs per priority class.
+
+        :return: The number of finished jobs, the number of preemptions, and the mean and maximal queue
+            and parse times in seconds, per priority class.
+        """
+        with self._condition:
+            totals = {priority: dict(total) for priority, total in self._totals.items()}
+            pending = {
+                priority: sum(len(queue) for queue in queues.values())
+                for priority, queues in self._queues.items()
+            }
+        stats = {}
+        for priority, total in totals.items():
+            finished = int(total["finished"])
+            stats[priority.name.lower()] = {
+                "pending": pending[priority],
+                "finished": finished,
+                "preemptions": int(total["preemptions"]),
+                "queue_time_mean": total["queue_time_sum"] / finished if finished else None,
+                "queue_time_max": total["queue_time_max"] if finished else None,
+                "parse_time_mean": total["parse_time_sum"] / finished if finished else None,
+                "parse_time_max": total["parse_time_max"] if finished else None,
+            }
+        return stats
+
+    def _record(self, job: Job) -> None:
+        """Adds a finished job to the running aggregates of its priority class."""
+        total = self._totals[job.priority]
+        total["finished"] += 1
+        total["preemptions"] += job.preemptions
+        for name, value in (("queue_time", job.queue_time), ("parse_time", job.parse_time)):
+            total[f"{name}_sum"] += value  # type: ignore
+            total[f"{name}_max"] = max(total[f"{name}_max"], value)  # type: ignore
+
+    def _enqueue(self, job: Job, first: bool = False) -> None:
+        queues = self._queues[job.priority]
+        queue = queues.setdefault(job.client, deque())
+        if first:
+            queue.appendleft(job)
+        else:
+            queue.append(job)
+
+    def _next(self) -> Job | None:
+        """Takes the next job of the highest priority class, from the client that is next in turn."""
+        for queues in self._queues.values():
+            while queues:
+                client, queue = next(iter(queues.items()))
+                job = queue.popleft()
+                if queue:
+                    queues.move_to_end(client)
+                else:
+                    del queues[client]
+                if not job.future.cancelled():
+                    return job
+        return None
+
+    def _preempt(self, priority: Priority) -> None:
+        """Preempts the running job of the lowest priority class below a priority class."""
+        candidates = [
+            job for job in self._running if job.priority > priority and not job._preempted
+        ]
+        if candidates:
+            job = max(candidates, key=lambda job: (job.priority, job.started))
+            job._preempted = True
+            job._token.cancel()  # type: ignore
+
+    def _cancel(self, job: Job) -> bool:
+        with self._condition:
+            if job.future.done():
+                return False
+            job.future.cancel()
+            if job in self._running:
+                job._token.cancel()  # type: ignore
+            if job.document is not None and self._documents.get((job.client, job.document)) is job:
+                del self._documents[(job.client, job.document)]
+            return True
+
+    def _work(self) -> None:
+        while True:
+            # The result of the previous job is not kept while waiting for the next job
+            result, error = None, None
+            with self._condition:
+                job = self._next()
+                while job is None and not self._closed:
+                    self._condition.wait()
+                    job = self._next()
+                if job is None:
+                    return
+                job._token = CancellationToken()
+                self._running.add(job)
+                if job.started is None:
+                    job.started = monotonic()
+
+            started = monotonic()
+            try:
+                result = job.function(*job.args, cancel=job._token, **job.kwargs)
+            except BaseException as err:
+                error = err
+            finished = monotonic()
+
+            with self._condition:
+                self._running.discard(job)
+                if job.future.cancelled():
+                    continue
+                if job._preempted and isinstance(error, ParseCancelled):
+                    job._preempted = False
+                    job.preemptions += 1
+                    self._enqueue(job, first=True)
+                    self._condition.notify()
+                    continue
+                job.parse_time, job.finished = finished - started, finished
+                self._record(job)
+                # The arguments, such as the source text, are not kept once the job finished
+                job.args, job.kwargs = (), {}
+                if (
+                    job.document is not None
+                    and self._documents.get((job.client, job.document)) is job
+                ):
+                    del self._documents[(job.client, job.document)]
+                if error is None:
+                    job.future.set_result(result)
+                else:
+                    job.future.set_exception(error)
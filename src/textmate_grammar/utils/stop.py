@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Callable, Iterable, Union
+
+from ..elements import ContentElement, _dispatch_list
+
+if TYPE_CHECKING:
+    from ..handler import POS, ContentHandler
+
+#: A condition at which a parse stops: a number of lines, a set of scope names, or a predicate on the
+#: top-level elements.
+StopCondition = Union[int, Iterable[str], Callable[[ContentElement], bool]]
+
+
+class StopCheck:
+    """Stops a parse at the end of the first accepted element that meets a stop condition.
+
+    The parse loops pass the elements that they accept into their results to the check, such that parse
+    attempts that are discarded, such as pattern options that are not chosen, do not stop the parse. The
+    parse stops at the end of the first element with one of the scope names, or of the first top-level
+    element that meets the predicate.
+    """
+
+    def __init__(
+        self,
+        handler: ContentHandler,
+        scopes: Iterable[str] = (),
+        predicate: Callable[[ContentElement], bool] | None = None,
+    ) -> None:
+        """
+        Initialize a new instance of the StopCheck class.
+
+        :param handler: The content handler of the parse.
+        :param scopes: The scope names of the rules of which the first element stops the parse.
+        :param predicate: A predicate on the top-level elements, of which the first element for which it
+            is True stops the parse. Defaults to None.
+        """
+        self.handler = handler
+        self.scopes = frozenset(scopes)
+        self.predicate = predicate
+        self._dispatching = False
+
+    def attach(self) -> None:
+        """Attaches the check to its content handler."""
+        self.handler.stop_check = self
+
+    def accept(self, elements: list, span: tuple[POS, POS], top_level: bool = False) -> None:
+        """Stops the parse at the end of accepted elements that meet the stop condition.
+
+        The captures of the accepted elements are dispatched in place, as the elements with the scope names
+        may be captured.
+
+        :param elements: The elements accepted by a parse loop.
+        :param span: The span of the accepted elements.
+        :param top_level: Whether the elements are accepted by the loop of the language parser.
+        """
+        if self._dispatching or not (self.scopes or self.predicate is not None and top_level):
+            return
+        # Dispatching the captures moves the anchor and runs the parse loops, which accept the elements
+        # that are checked here already
+        anchor = self.handler.anchor
+        self._dispatching = True
+        try:
+            elements[:] = _dispatch_list(elements)
+            predicate = self.predicate if top_level else None
+            if (self.scopes and self._has_scope(elements)) or (
+                predicate is not None and any(predicate(element) for element in elements)
+            ):
+                self.handler.stop(span[1])
+        finally:
+            self.handler.anchor = anchor
+            self._dispatching = False
+
+    def _has_scope(self, elements: list[ContentElement]) -> bool:
+        """Returns whether any of the elements or their descendants has one of the scope names."""
+        pending = list(elements)
+        while pending:
+            element = pending.pop()
+            if element.token in self.scopes:
+                return True
+            pending.extend(element.children)
+        return False
+
+
+def stop_parse(handler: ContentHandler, condition: StopCondition) -> None:
+    """
+    Stops the parse of a content handler once a stop condition is met.
+
+    :param handler: The content handler of the parse.
+    :param condition: The number of lines to parse, the scope names of the rules of which the first
+        element stops the parse, or a predicate on the top-level elements of which the first element for
+        which it is True stops the parse.
+    """
+    if isinstance(condition, bool):
+        raise ValueError("Stop condition must be a number of lines, scope names or a predicate")
+    # The stop condition is checked within the contents of blocks, which are not parsed if lazy
+    handler.lazy_blocks = False
+    if isinstance(condition, int):
+        handler.stop((condition, 0))
+    elif callable(condition):
+        StopCheck(handler, predicate=condition).attach()
+    else:
+        StopCheck(handler, [condition] if isinstance(condition, str) else condition).attach()
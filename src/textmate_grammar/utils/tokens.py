@@ -0,0 +1,263 @@
+from __future__ import annotations
+
+from array import array
+from pickle import PickleBuffer
+from typing import Any
+
+from ..elements import Capture, ContentBlockElement, ContentElement
+from ..handler import POS, ContentHandler, Diagnostic
+
+# The fields of an element in the flat array of a token array
+FIELDS = 12
+(
+    KIND,
+    TOKEN,
+    GRAMMAR,
+    START_LINE,
+    START_COLUMN,
+    CLOSE_LINE,
+    CLOSE_COLUMN,
+    CONTENT,
+    SIZE,
+    CHILDREN,
+    BEGIN,
+    END,
+) = range(FIELDS)
+
+# The kinds of elements
+ELEMENT, BLOCK_ELEMENT = 0, 1
+
+
+def grammar_table(grammar: dict) -> list[dict]:
+    """
+    Lists the nested grammar dictionaries of a language grammar in a deterministic order.
+
+    The grammar of an element is referred to by its index in this table, which is the same in every
+    process that loads the same language grammar.
+
+    :param grammar: The language grammar.
+    :return: The grammar dictionaries, in depth-first order.
+    """
+    table: list[dict] = []
+    stack: list[Any] = [grammar]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, dict):
+            table.append(item)
+            stack.extend(reversed(list(item.values())))
+        elif isinstance(item, list):
+            stack.extend(reversed(item))
+    return table
+
+
+class TokenArray:
+    """A parsed element tree, encoded as a flat array of integers.
+
+    Every element is stored as a record of its kind, token, grammar, span, content and number of nested
+    elements, in depth-first order, such that the nested elements of an element directly follow it.
+    Tokens and grammars are stored once in tables, the source is stored once as text, and the grammars of
+    the language are referred to by their index in the grammar table of the language.
+
+    The array is pickled as a single buffer, out-of-band with pickle protocol 5, such that the element
+    tree is transferred between processes without pickling every element. The elements are rebuilt from
+    the array when they are first accessed.
+    """
+
+    def __init__(
+        self,
+        buffer: Any,
+        tokens: list[str],
+        grammars: list[int | dict],
+        contents: dict[int, str],
+        text: str,
+        diagnostics: list[Diagnostic] | None = None,
+    ) -> None:
+        """
+        Initialize a new instance of the TokenArray class.
+
+        :param buffer: The flat array of the element records, or a buffer of its bytes.
+        :param tokens: The tokens of the elements.
+        :param grammars: The grammars of the elements, by index in the grammar table of the language, or
+            as dictionary if not in the grammar table.
+        :param contents: The contents of the elements that differ from the source of their span.
+        :param text: The source of the root element.
+        :param diagnostics: The diagnostics of the parse. Defaults to None.
+        """
+        self.nodes = memoryview(buffer).cast("B").cast("i")
+        self.tokens = tokens
+        self.grammars = grammars
+        self.contents = contents
+        self.text = text
+        self.diagnostics = diagnostics
+
+    def __len__(self) -> int:
+        return len(self.nodes) // FIELDS
+
+    def __reduce_ex__(self, protocol):
+        buffer = PickleBuffer(self.nodes) if protocol >= 5 else self.nodes.tobytes()
+        return TokenArray, (
+            buffer,
+            self.tokens,
+            self.grammars,
+            self.contents,
+            self.text,
+            self.diagnostics,
+        )
+
+    @classmethod
+    def from_element(cls, element: ContentElement, table: list[dict]) -> TokenArray:
+        """
+        Encodes a parsed element tree.
+
+        :param element: The root element, of which all nested elements are dispatched.
+        :param table: The grammar table of the language.
+        :return: The token array of the element tree.
+        """
+        text = _source_text(element.characters)
+        handler = ContentHandler(text)
+        table_keys = {id(grammar): index for index, grammar in enumerate(table)}
+        token_keys: dict[str, int] = {}
+        grammar_keys: dict[int, int] = {}
+        grammars: list[int | dict] = []
+        contents: dict[int, str] = {}
+
+        records: list[list[int]] = []
+        parents: list[int] = []
+        stack: list[tuple[ContentElement, int]] = [(element, -1)]
+        while stack:
+            nested, parent = stack.pop()
+            index = len(records)
+
+            if id(nested.grammar) not in grammar_keys:
+                grammar_keys[id(nested.grammar)] = len(grammars)
+                grammars.append(table_keys.get(id(nested.grammar), nested.grammar))
+
+            start, close = _span(nested.characters)
+            if nested.content != handler.read_pos(start, close):
+                contents[index] = nested.content
+
+            if isinstance(nested, ContentBlockElement):
+                kind, groups = BLOCK_ELEMENT, [nested.children, nested.begin, nested.end]
+            else:
+                kind, groups = ELEMENT, [nested.children, [], []]
+            records.append(
+                [
+                    kind,
+                    token_keys.setdefault(nested.token, len(token_keys)),
+                    grammar_keys[id(nested.grammar)],
+                    *start,
+                    *close,
+                    index in contents,
+                    1,
+                    *(len(group) for group in groups),
+                ]
+            )
+            parents.append(parent)
+            stack.extend((child, index) for group in reversed(groups) for child in reversed(group))
+
+        # The size of an element is the number of elements of its subtree
+        for index in range(len(records) - 1, 0, -1):
+            records[parents[index]][SIZE] += records[index][SIZE]
+
+        nodes = array("i", [field for record in records for field in record])
+        return cls(nodes, list(token_keys), grammars, contents, text, element.diagnostics)
+
+    def to_element(self, table: list[dict]) -> ContentElement:
+        """
+        Decodes the element tree.
+
+        :param table: The grammar table of the language.
+        :return: The root element, of which the nested elements are rebuilt when they are first accessed.
+        """
+        grammars = [table[key] if isinstance(key, int) else key for key in self.grammars]
+        element = _TokenTree(self, grammars).element(0)
+        element.diagnostics = self.diagnostics
+        return element
+
+
+class _TokenTree:
+    """The decoded grammars and source of a token array, from which its elements are rebuilt."""
+
+    def __init__(self, tokens: TokenArray, grammars: list[dict]) -> None:
+        self.tokens = tokens
+        self.grammars = grammars
+        self.handler = ContentHandler(tokens.text)
+
+    def __reduce__(self):
+        return _TokenTree, (self.tokens, self.grammars)
+
+    def element(self, index: int) -> ContentElement:
+        """Rebuilds an element, with captures of its nested elements."""
+        record = self.tokens.nodes[index * FIELDS : (index + 1) * FIELDS]
+        start, close = (
+            (record[START_LINE], record[START_COLUMN]),
+            (record[CLOSE_LINE], record[CLOSE_COLUMN]),
+        )
+        content = (
+            self.tokens.contents[index] if record[CONTENT] else self.handler.read_pos(start, close)
+        )
+        groups: list[list[Capture | ContentElement]] = []
+        nested = index + 1
+        for count in (record[CHILDREN], record[BEGIN], record[END]):
+            indices = []
+            for _ in range(count):
+                indices.append(nested)
+                nested += self.tokens.nodes[nested * FIELDS + SIZE]
+            groups.append([_TokenCapture(self, indices)] if indices else [])
+
+        kwargs: dict[str, Any] = {"begin": groups[1], "end": groups[2]} if record[KIND] else {}
+        element_class = ContentBlockElement if record[KIND] else ContentElement
+        return element_class(
+            token=self.tokens.tokens[record[TOKEN]],
+            grammar=self.grammars[record[GRAMMAR]],
+            content=content,
+            characters=self.handler.chars(start, close),
+            children=groups[0],
+            **kwargs,
+        )
+
+
+class _TokenCapture(Capture):
+    """The nested elements of a rebuilt element, which are rebuilt when the element is dispatched."""
+
+    def __init__(self, tree: _TokenTree, indices: list[int]) -> None:
+        self.tree = tree
+        self.indices = indices
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, _TokenCapture) and self.indices == other.indices
+
+    def __repr__(self) -> str:
+        return f"@tokens<{len(self.indices)}>"
+
+    def dispatch(self) -> list[Capture | ContentElement]:
+        return [self.tree.element(index) for index in self.indices]
+
+
+def _span(characters: dict[POS, str]) -> tuple[POS, POS]:
+    """Gets the start and close position of the characters of an element."""
+    if not characters:
+        return (0, 0), (0, 0)
+    first, last = next(iter(characters)), next(reversed(characters))
+    return first, (last[0], last[1] + 1)
+
+
+def _source_text(characters: dict[POS, str]) -> str:
+    """Reconstructs the source of the characters of the root element.
+
+    Positions that are not part of the root element are filled with spaces, such that the positions of
+    the nested elements are kept.
+    """
+    lines: list[list[str]] = []
+    for (ln, lp), char in characters.items():
+        while len(lines) <= ln:
+            lines.append([])
+        line = lines[ln]
+        if len(line) < lp:
+            line.extend(" " * (lp - len(line)))
+        # The newline character is read as an empty string
+        line.append(char or "\n")
+    for line in lines:
+        if not line or line[-1] != "\n":
+            line.append("\n")
+    return "".join("".join(line) for line in lines)[:-1]
@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import json
+import threading
+from collections import deque
+from pathlib import Path
+from time import perf_counter
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from ..handler import ContentHandler
+
+
+class Tracer:
+    """Records the parse attempts of grammar rules as Chrome Trace Event Format events.
+
+    Each parse attempt is recorded as a complete event, with its start time and duration, such that the
+    saved trace can be opened as a flame chart in Perfetto (https://ui.perfetto.dev) or chrome://tracing.
+    The events of every parse are recorded on a separate track.
+
+    To keep tracing of large files practical, the events are stored in a ring buffer that only keeps the
+    latest events, and the recorded events can be limited to attempts that take a minimal duration or
+    that start on a sample of the lines. A tracer can be shared by parses in different threads, as the
+    rule stack and track are kept per thread.
+    """
+
+    def __init__(
+        self, buffer_size: int = 1_000_000, min_duration: float = 0.0, sample_lines: int = 1
+    ) -> None:
+        """
+        Initialize a tracer.
+
+        :param buffer_size: The maximum number of events to keep. Defaults to 1_000_000.
+        :param min_duration: The minimal duration in seconds of a recorded attempt. Defaults to 0.0.
+        :param sample_lines: Only record attempts that start on every n-th line. Defaults to 1.
+
+        :ivar events: The ring buffer of recorded events.
+        :ivar recorded: The total number of recorded events, including those dropped from the buffer.
+        """
+        self.events: deque[tuple] = deque(maxlen=buffer_size)
+        self.min_duration = min_duration
+        self.sample_lines = sample_lines
+        self.recorded = 0
+        self._origin = perf_counter()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._names: dict[int, str] = {}
+        self._tracks: list[str] = []
+
+    @property
+    def _stack(self) -> list[tuple[float, tuple[int, int], int]]:
+        """The stack of started parse attempts of the current thread."""
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def attach(self, handler: ContentHandler, name: str = "") -> None:
+        """
+        Attaches the tracer to a content handler, recording the parse on a new track.
+
+        :param handler: The content handler of the parse.
+        :param name: The name of the track. Defaults to "parse <number>".
+        """
+        with self._lock:
+            self._tracks.append(name or f"parse {len(self._tracks) + 1}")
+            self._local.track = len(self._tracks)
+        handler.hooks.append(self)
+
+    def enter(self, parser: Any, starting: tuple[int, int], depth: int) -> None:
+        """Records the start of a parse attempt of a rule."""
+        self._stack.append((perf_counter(), starting, depth))
+
+    def exit(self, parser: Any, result: tuple) -> None:
+        """Records the end of the last started parse attempt of a rule."""
+        start, starting, depth = self._stack.pop()
+        duration = perf_counter() - start
+        if duration < self.min_duration or starting[0] % self.sample_lines:
+            return
+        name = self._names.get(id(parser))
+        if name is None:
+            name = self._names[id(parser)] = repr(parser)
+        event = (name, start, duration, self._local.track, starting, depth, bool(result[0]))
+        with self._lock:
+            self.recorded += 1
+            self.events.append(event)
+
+    def abort(self) -> None:
+        """Discards the parse attempts that started but did not finish, such as of a cancelled parse."""
+        self._stack.clear()
+
+    @property
+    def dropped(self) -> int:
+        """The number of events that were dropped from the ring buffer."""
+        return self.recorded - len(self.events)
+
+    def to_dict(self) -> dict:
+        """
+        Converts the recorded events to the Chrome Trace Event Format.
+
+        :return: The trace as a dictionary, with timestamps and durations in microseconds.
+        """
+        trace_events: list[dict] = [
+            {"name": "thread_name", "ph": "M", "pid": 1, "tid": tid, "args": {"name": name}}
+            for tid, name in enumerate(self._tracks, start=1)
+        ]
+        for name, start, duration, tid, starting, depth, parsed in self.events:
+            trace_events.append(
+                {
+                    "name": name,
+                    "cat": "parse",
+                    "ph": "X",
+                    "ts": round((start - self._origin) * 1e6, 3),
+                    "dur": round(duration * 1e6, 3),
+                    "pid": 1,
+                    "tid": tid,
+                    "args": {
+                        "line": starting[0] + 1,
+                        "column": starting[1],
+                        "depth": depth,
+                        "parsed": parsed,
+                    },
+                }
+            )
+        return {"traceEvents": trace_events, "displayTimeUnit": "ms"}
+
+    def save(self, path: str | Path) -> None:
+        """
+        Saves the recorded events as a Chrome Trace Event Format JSON file.
+
+        :param path: The path of the trace file.
+        """
+        with open(path, "w") as file:
+            json.dump(self.to_dict(), file)
@@ -0,0 +1,118 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import pytest
+from textmate_grammar.parsers.matlab import MatlabParser
+from textmate_grammar.utils.exceptions import ParseCancelled
+from textmate_grammar.utils.pool import worker_pool
+
+from ...unit import MSG_NO_MATCH
+
+
+class CountingExecutor(ThreadPoolExecutor):
+    """A thread executor that records its futures and the maximal number of running functions."""
+
+    def __init__(self):
+        super().__init__(max_workers=8)
+        self.futures = []
+        self.running = self.maximum = 0
+        self.lock = threading.Lock()
+
+    def submit(self, fn, *args, **kwargs):
+        def counted():
+            with self.lock:
+                self.running += 1
+                self.maximum = max(self.maximum, self.running)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self.lock:
+                    self.running -= 1
+
+        future = super().submit(counted)
+        self.futures.append(future)
+        return future
+
+
+@pytest.fixture
+def paths(tmp_path):
+    paths = []
+    for index in range(6):
+        path = tmp_path / f"check{index}.m"
+        path.write_text(f"x{index} = {index};\n" * (index + 1))
+        paths.append(path.resolve())
+    return paths
+
+
+def test_aparse_string(parser):
+    """Test that an input string is parsed in an executor"""
+    element = asyncio.run(parser.aparse_string("x = 'one';"))
+    assert element == parser.parse_string("x = 'one';"), MSG_NO_MATCH
+
+
+def test_aparse_file_cached(parser, paths):
+    """Test that a file parsed in an executor is cached by the parser"""
+    element = asyncio.run(parser.aparse_file(paths[0]))
+    assert parser._cache.cache_valid(paths[0])
+    assert element == parser.parse_file(paths[0]), MSG_NO_MATCH
+
+
+@pytest.mark.parametrize("ordered", [True, False])
+def test_aparse_files(parser, paths, ordered):
+    """Test that no more files are parsed at once than the concurrency of the call"""
+    executor = CountingExecutor()
+
+    async def collect():
+        return [
+            result
+            async for result in parser.aparse_files(paths, executor, concurrency=2, ordered=ordered)
+        ]
+
+    results = asyncio.run(collect())
+    assert {path for path, _ in results} == set(paths)
+    if ordered:
+        assert [path for path, _ in results] == paths
+    assert all(element is not None for _, element in results), MSG_NO_MATCH
+    assert executor.maximum <= 2
+
+
+def test_cancelled(parser):
+    """Test that the parse in the executor is cancelled with the awaiting task"""
+    executor = CountingExecutor()
+    started = threading.Event()
+
+    async def cancel():
+        task = asyncio.ensure_future(
+            parser.aparse_string("x = 1;\n" * 5000, executor, progress=lambda *_: started.set())
+        )
+        await asyncio.get_running_loop().run_in_executor(None, started.wait)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel())
+    wait(executor.futures)
+    assert isinstance(executor.futures[0].exception(), ParseCancelled)
+
+
+def test_worker_pool(parser, paths, monkeypatch):
+    """Test that the workers of a process pool parse with the parser they constructed once"""
+    reduced = []
+    monkeypatch.setattr(MatlabParser, "__reduce__", lambda self: reduced.append(self))
+    executor = worker_pool(parser, workers=2, start_method="fork")
+
+    async def collect():
+        elements = [await parser.aparse_file(path, executor) for path in paths]
+        elements.append(await parser.aparse_string("x = 'one';", executor))
+        return elements
+
+    try:
+        elements = asyncio.run(collect())
+    finally:
+        executor.shutdown()
+    assert reduced == []
+    assert [element.flatten() for element in elements[:-1]] == [
+        MatlabParser().parse_file(path).flatten() for path in paths
+    ], MSG_NO_MATCH
+    assert elements[-1].flatten() == parser.parse_string("x = 'one';").flatten(), MSG_NO_MATCH
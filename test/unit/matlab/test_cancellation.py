@@ -0,0 +1,74 @@
+import pytest
+from textmate_grammar.parsers.matlab import MatlabParser
+from textmate_grammar.utils.cancellation import CancellationToken
+from textmate_grammar.utils.exceptions import DeadlineExceeded, ParseCancelled
+from textmate_grammar.utils.tracer import Tracer
+
+from ...unit import MSG_NO_MATCH
+
+check = "x = 1;\n" * 250
+
+
+def test_cancel(parser):
+    """Test that a cancelled token cancels the parse"""
+    token = CancellationToken()
+    token.cancel()
+    with pytest.raises(ParseCancelled):
+        parser.parse_string(check, cancel=token)
+
+
+def test_cancel_during_parse(parser):
+    """Test that a parse is cancelled during the parse and that progress is reported"""
+    token = CancellationToken()
+    reported = []
+
+    def progress(lines, total):
+        reported.append((lines, total))
+        if lines >= 100:
+            token.cancel()
+
+    with pytest.raises(ParseCancelled) as info:
+        parser.parse_string(check, cancel=token, progress=progress)
+    assert info.value.position[0] >= 100
+    assert reported == [(0, 251), (100, 251)]
+
+
+def test_timeout(parser):
+    """Test that a parse is cancelled after its timeout"""
+    with pytest.raises(DeadlineExceeded):
+        parser.parse_string(check, timeout=0.0)
+
+
+def test_progress(parser):
+    """Test that the progress of a completed parse is reported up to the total number of lines"""
+    reported = []
+    element = parser.parse_string(check, progress=lambda *args: reported.append(args))
+    assert element, MSG_NO_MATCH
+    assert reported == [(0, 251), (100, 251), (200, 251), (251, 251)]
+
+
+def test_cancelled_file_not_cached(parser, tmp_path):
+    """Test that a cancelled parse of a file is not cached"""
+    path = tmp_path / "check.m"
+    path.write_text(check)
+    with pytest.raises(DeadlineExceeded):
+        parser.parse_file(path, timeout=0.0)
+    assert not parser._cache.cache_valid(path)
+
+    element = parser.parse_file(path)
+    assert element, MSG_NO_MATCH
+    assert parser._cache.cache_valid(path)
+
+
+def test_cancelled_trace():
+    """Test that a tracer records the parses after a cancelled parse"""
+    tracer = Tracer()
+    parser = MatlabParser(tracer=tracer)
+    with pytest.raises(DeadlineExceeded):
+        parser.parse_string(check, timeout=0.0)
+    recorded = tracer.recorded
+
+    element = parser.parse_string("x = 1;")
+    assert element, MSG_NO_MATCH
+    assert tracer.recorded > recorded
+    assert not tracer._stack
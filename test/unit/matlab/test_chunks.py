@@ -0,0 +1,36 @@
+import pytest
+from textmate_grammar.utils import chunks
+
+from ...unit import MSG_NO_MATCH
+
+STATEMENTS = "x = 1;\ny = 'two';\nz = [3 4];\n" * 4
+CHECKS = {
+    "statements": STATEMENTS,
+    "comment": "%{\n" + STATEMENTS + "%}\n" + STATEMENTS,
+    "function": "function f\n" + STATEMENTS + "end\n" + STATEMENTS,
+}
+
+
+@pytest.fixture(autouse=True)
+def chunk_lines(monkeypatch):
+    monkeypatch.setattr(chunks, "CHUNK_LINES", 4)
+
+
+@pytest.mark.parametrize("check", CHECKS.values(), ids=CHECKS.keys())
+def test_chunked(parser, tmp_path, check):
+    """Test that a file parsed in chunks equals the sequentially parsed file"""
+    path = tmp_path / "check.m"
+    path.write_text(check)
+    expected = parser._parse_path(path.resolve())
+    element = parser.parse_file_chunked(path, workers=3)
+    assert element == expected, MSG_NO_MATCH
+    assert element.to_dict(all_content=True) == expected.to_dict(all_content=True), MSG_NO_MATCH
+    assert element.diagnostics == expected.diagnostics
+
+
+def test_split_lines(parser):
+    """Test that chunks start at unindented lines after blank or unindented lines"""
+    handler = chunks.ContentHandler(CHECKS["function"])
+    starts = chunks.split_lines(handler, 3)
+    assert starts[0] == 0 and len(starts) == 3
+    assert all(not handler.lines[line][0].isspace() for line in starts)
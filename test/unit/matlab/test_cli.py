@@ -0,0 +1,83 @@
+import io
+import json
+import struct
+
+import pytest
+from textmate_grammar.cli import collect_paths, main, tokenize
+from textmate_grammar.daemon import compact_tokens
+from textmate_grammar.utils.cache import SimpleCache
+from textmate_grammar.utils.exceptions import IncompatibleFileType
+
+from ...unit import MSG_NO_MATCH
+
+
+@pytest.fixture
+def tree(tmp_path):
+    (tmp_path / "sub").mkdir()
+    for name in ["one.m", "two.m", "sub/three.m"]:
+        (tmp_path / name).write_text(f"x = '{name}';\ny = 1;\n")
+    (tmp_path / "sub" / "notes.txt").write_text("notes")
+    return tmp_path
+
+
+def test_collect_paths(tree):
+    """Test that files, directories and glob patterns are collected without duplicates"""
+    paths = collect_paths([str(tree / "one.m"), str(tree), str(tree / "*.m")], ["m"])
+    assert paths == [(tree / name).resolve() for name in ["one.m", "sub/three.m", "two.m"]]
+    with pytest.raises(IncompatibleFileType):
+        collect_paths([str(tree / "sub" / "notes.txt")], ["m"])
+    with pytest.raises(FileNotFoundError):
+        collect_paths([str(tree / "missing.m")], ["m"])
+    with pytest.raises(FileNotFoundError):
+        collect_paths([str(tree / "one.m"), str(tree / "nope" / "*.m")], ["m"])
+    with pytest.raises(FileNotFoundError):
+        collect_paths([str(tree / "sub" / "*.txt")], ["m"])
+
+
+def test_jsonl(parser, tree):
+    """Test that the flattened tokens of every file are written as a JSON line"""
+    paths = collect_paths([str(tree)], ["m"])
+    stream = io.BytesIO()
+    tokenize(parser, paths, stream, "jsonl")
+    records = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert [record["path"] for record in records] == [str(path) for path in paths]
+    expected = json.loads(json.dumps(parser.parse_file(paths[0]).flatten()))
+    assert records[0]["tokens"] == expected, MSG_NO_MATCH
+
+
+def test_binary(parser, tree):
+    """Test that the compact tokens of a file are written as a binary record"""
+    path = (tree / "one.m").resolve()
+    stream = io.BytesIO()
+    tokenize(parser, [path], stream, "binary")
+    data = stream.getvalue()
+    (size,) = struct.unpack_from("<I", data)
+    header = json.loads(data[4 : 4 + size])
+    (count,) = struct.unpack_from("<I", data, 4 + size)
+    values = struct.unpack_from(f"<{4 * count}i", data, 8 + size)
+    expected = compact_tokens(parser.parse_file(path))
+    assert header == {"path": str(path), "scopes": expected["scopes"]}
+    assert [list(values[i : i + 4]) for i in range(0, len(values), 4)] == expected["tokens"]
+
+
+def test_stats(parser, tree):
+    """Test that the throughput statistics report the lines, cache hits and slowest files"""
+    parser._cache = SimpleCache()
+    paths = collect_paths([str(tree)], ["m"])
+    stats = tokenize(parser, paths, io.BytesIO())
+    assert stats["files"] == 3 and stats["lines"] == 9
+    assert stats["cache_hit_rate"] == 0 and len(stats["slowest"]) == 3
+    stats = tokenize(parser, paths, io.BytesIO())
+    assert stats["cache_hit_rate"] == 1 and stats["slowest"] == []
+
+
+def test_main(tree, capsys):
+    """Test that the console script writes the tokens to the output file and the summary to stderr"""
+    output = tree / "tokens.jsonl"
+    assert main([str(tree / "*.m"), "-f", "dict", "-o", str(output), "--stats"]) == 0
+    records = [json.loads(line) for line in output.read_text().splitlines()]
+    assert [record["element"]["token"] for record in records] == ["source.matlab"] * 2
+    assert "files: 2" in capsys.readouterr().err
+    with pytest.raises(SystemExit) as exc_info:
+        main([str(tree / "one.m"), str(tree / "nope" / "*.m")])
+    assert exc_info.value.code != 0
@@ -0,0 +1,138 @@
+import io
+import json
+import socket
+import sys
+import threading
+import time
+
+import pytest
+from textmate_grammar import daemon as daemon_module
+from textmate_grammar.daemon import INVALID_PARAMS, METHOD_NOT_FOUND, PARSE_ERROR, Daemon
+
+from ...unit import MSG_NO_MATCH
+
+
+@pytest.fixture
+def daemon(parser):
+    daemon = Daemon(content_cache_size=2)
+    daemon.parsers["matlab"] = parser
+    return daemon
+
+
+def request(method, id=1, **params):
+    return {"jsonrpc": "2.0", "id": id, "method": method, "params": params}
+
+
+def test_parse_content(daemon, parser):
+    """Test that a content is parsed to flattened or compact tokens"""
+    flattened = daemon.handle(request("parse", content="x = 1;"))["result"]
+    assert flattened == parser.parse_string("x = 1;").flatten(), MSG_NO_MATCH
+    compact = daemon.handle(request("parse", content="x = 1;", format="compact"))["result"]
+    tokens = [
+        [line, column, len(content), compact["scopes"].index(list(keys))]
+        for (line, column), content, keys in flattened
+    ]
+    assert compact["tokens"] == tokens, MSG_NO_MATCH
+
+
+def test_parse_file(daemon, parser, tmp_path):
+    """Test that a file is parsed and cached"""
+    path = tmp_path / "check.m"
+    path.write_text("x = 'one';\n")
+    for _ in range(2):
+        result = daemon.handle(request("parse", path=str(path)))["result"]
+    assert json.loads(json.dumps(result)) == json.loads(
+        json.dumps(parser.parse_file(path).flatten())
+    )
+    cache = daemon.stats()["cache"]["file"]
+    assert (cache["hits"], cache["misses"], cache["entries"]) == (1, 1, 1)
+
+
+def test_content_cache(daemon):
+    """Test that the most recently parsed contents are cached"""
+    for content in ["x = 1;", "x = 1;", "y = 2;", "z = 3;", "x = 1;"]:
+        daemon.handle(request("parse", content=content))
+    cache = daemon.stats()["cache"]["content"]
+    assert (cache["hits"], cache["misses"], cache["entries"]) == (1, 4, 2)
+
+
+def test_errors(daemon):
+    """Test that invalid requests are answered with JSON-RPC errors"""
+    assert daemon.handle(request("unknown"))["error"]["code"] == METHOD_NOT_FOUND
+    assert (
+        daemon.handle(request("parse", language="cobol", content=""))["error"]["code"]
+        == INVALID_PARAMS
+    )
+    assert daemon.handle(request("parse", unknown=True))["error"]["code"] == INVALID_PARAMS
+    assert json.loads(daemon.handle_line("{"))["error"]["code"] == PARSE_ERROR
+    assert daemon.handle({"jsonrpc": "2.0", "method": "stats"}) is None
+    assert daemon.stats()["errors"] == 4
+
+
+def test_stats(daemon):
+    """Test that the latency percentiles are reported per method"""
+    daemon.handle(request("parse", content="x = 1;"))
+    stats = daemon.handle(request("stats"))["result"]
+    assert stats["requests"]["parse"]["count"] == 1
+    assert set(stats["requests"]["parse"]) == {"count", "p50", "p90", "p99", "max"}
+
+
+def test_serve(daemon):
+    """Test that the requests of a stream are served until shutdown"""
+    lines = [
+        json.dumps(request("parse", id=1, content="x")),
+        json.dumps(request("shutdown", id=2)),
+        json.dumps(request("stats", id=3)),
+    ]
+    output = io.StringIO()
+    daemon.serve(io.StringIO("\n".join(lines) + "\n"), output)
+    assert [json.loads(line)["id"] for line in output.getvalue().splitlines()] == [1, 2]
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="Unix domain sockets")
+def test_serve_socket(daemon, tmp_path):
+    """Test that the requests of a Unix domain socket are served until shutdown"""
+    path = tmp_path / "daemon.sock"
+    server = threading.Thread(target=daemon.serve_socket, args=(path,))
+    server.start()
+    deadline = time.monotonic() + 10
+    while not path.exists():
+        assert server.is_alive() and time.monotonic() < deadline, "The server is not listening"
+        time.sleep(0.01)
+    with socket.socket(socket.AF_UNIX) as client:
+        client.connect(str(path))
+        stream = client.makefile("rw")
+        for message in [request("parse", content="x = 1;"), request("shutdown")]:
+            stream.write(json.dumps(message) + "\n")
+            stream.flush()
+            assert "result" in json.loads(stream.readline())
+    server.join(timeout=10)
+    assert not server.is_alive() and not path.exists()
+
+
+def test_parser_construction(daemon, monkeypatch):
+    """Test that the construction of a language parser does not block the other requests"""
+    constructing, release = threading.Event(), threading.Event()
+
+    def load_parser(language):
+        constructing.set()
+        release.wait()
+        return daemon.parsers["matlab"]
+
+    monkeypatch.setattr(daemon_module, "load_parser", load_parser)
+    constructor = threading.Thread(target=daemon.parser, args=("slow",))
+    constructor.start()
+    constructing.wait()
+    responses = []
+    try:
+        client = threading.Thread(
+            target=lambda: responses.append(daemon.handle(request("parse", content="x = 1;")))
+        )
+        client.start()
+        client.join(timeout=10)
+        assert responses and "result" in responses[0]
+        assert daemon.stats()["requests"]["parse"]["count"] == 1
+    finally:
+        release.set()
+        constructor.join()
+    assert daemon.parser("slow") is daemon.parsers["matlab"]
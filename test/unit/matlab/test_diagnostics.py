@@ -0,0 +1,32 @@
+import logging
+
+from textmate_grammar.utils.logger import LOGGER
+
+from ...unit import MSG_NO_MATCH
+
+
+def test_diagnostics(parser):
+    """Test that content that cannot be parsed is reported as a diagnostic"""
+    element = parser.parse_string("a = $b;")
+    assert element, MSG_NO_MATCH
+    assert element.diagnostics
+    assert all(diagnostic.kind == "skipped" for diagnostic in element.diagnostics)
+    assert all(diagnostic.position[0] == 0 for diagnostic in element.diagnostics)
+
+
+def test_no_diagnostics(parser):
+    """Test that no diagnostics are reported for valid content"""
+    element = parser.parse_string("a = b;")
+    assert element, MSG_NO_MATCH
+    assert element.diagnostics == []
+
+
+def test_disabled_logging(parser, monkeypatch, caplog):
+    """Test that no log messages are constructed when logging is disabled"""
+    calls = []
+    monkeypatch.setattr(LOGGER, "debug", lambda *args, **kwargs: calls.append(args))
+    monkeypatch.setattr(LOGGER, "info", lambda *args, **kwargs: calls.append(args))
+    caplog.set_level(logging.ERROR, logger="textmate_grammar")
+    element = parser.parse_string("a = $b;")
+    assert element, MSG_NO_MATCH
+    assert not calls
@@ -0,0 +1,78 @@
+import pytest
+from textmate_grammar.utils import incremental
+from textmate_grammar.utils.cache import SimpleCache
+from textmate_grammar.utils.keys import ContentKeys
+
+from ...unit import MSG_NO_MATCH
+
+STATEMENTS = "x = 1;\ny = 'two';\nz = [3 4];\n"
+SOURCE = (
+    STATEMENTS * 3
+    + "function f(a)\n"
+    + STATEMENTS
+    + "end\n"
+    + "%{\nblock comment\n%}\n"
+    + STATEMENTS * 3
+)
+LINES = SOURCE.splitlines(keepends=True)
+EDITS = {
+    "start": "w = 0;\n" + SOURCE,
+    "middle": "".join(LINES[:4] + ["q = 'changed';\n"] + LINES[5:]),
+    "end": SOURCE + "v = 5;\n",
+    "delete": "".join(LINES[:2] + LINES[6:]),
+    "function": SOURCE.replace("function f(a)\n", "function f(a, b)\n% help\n"),
+    "comment": SOURCE.replace("%}\n", ""),
+    "string": SOURCE.replace("y = 'two';\nz", "y = 'two;\nz", 1),
+}
+
+
+@pytest.fixture
+def path(parser, tmp_path):
+    parser._cache = SimpleCache(ContentKeys())
+    path = tmp_path / "check.m"
+    path.write_text(SOURCE)
+    return path
+
+
+@pytest.mark.parametrize("check", EDITS.values(), ids=EDITS.keys())
+def test_incremental(parser, path, check):
+    """Test that a changed file parsed from its previous parse equals the fully parsed file"""
+    parser.parse_file(path)
+    path.write_text(check)
+    element = parser.parse_file(path)
+    expected = parser._parse_path(path.resolve())
+    assert element == expected, MSG_NO_MATCH
+    assert element.to_dict(all_content=True) == expected.to_dict(all_content=True), MSG_NO_MATCH
+    assert element.flatten() == expected.flatten(), MSG_NO_MATCH
+    assert element.diagnostics == expected.diagnostics
+
+    # The snapshot of the incremental parse is reused by the next parse
+    path.write_text(SOURCE)
+    assert parser.parse_file(path).flatten() == parser.parse_string(SOURCE).flatten(), MSG_NO_MATCH
+
+
+def test_reused(parser, path, monkeypatch):
+    """Test that only the changed part of the file is parsed again"""
+    previous = parser.parse_file(path)
+    path.write_text(EDITS["middle"])
+
+    starts = []
+    parse_chunk = incremental.parse_chunk
+    monkeypatch.setattr(
+        incremental,
+        "parse_chunk",
+        lambda parser, handler, state, **kwargs: starts.append(state)
+        or parse_chunk(parser, handler, state, **kwargs),
+    )
+    element = parser.parse_file(path)
+    assert len(starts) == 1 and (3, 0) <= starts[0][0] < (4, 0)
+    assert element.children[0].characters is previous.children[0].characters
+    assert element.children[-1] == previous.children[-1]
+
+
+def test_changed_lines():
+    """Test that the unchanged leading and trailing lines are counted"""
+    assert incremental.changed_lines(LINES, LINES) == (len(LINES), 0)
+    assert incremental.changed_lines(LINES, LINES[:4] + ["x\n"] + LINES[5:]) == (4, len(LINES) - 5)
+    assert incremental.changed_lines(LINES, LINES[:4] + LINES[4:]) == (len(LINES), 0)
+    assert incremental.changed_lines(["a\n", "a\n"], ["a\n", "a\n", "a\n"]) == (2, 0)
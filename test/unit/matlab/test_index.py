@@ -0,0 +1,112 @@
+import os
+
+import pytest
+from textmate_grammar.parsers.matlab.index import MatlabIndex, extract
+
+CLASS = """classdef (Sealed = true, Hidden) Sample < handle & matlab.mixin.Copyable
+    % SAMPLE A sample class
+    properties (SetAccess = private, Dependent)
+        Name string % the name
+    end
+    methods (Static)
+        function [a, b] = compute(x)
+            % COMPUTE Computes a and b
+            a = x; b = x;
+        end
+    end
+end
+"""
+
+FUNCTION = """function out = func(in1, varargin)
+% FUNC Does things
+%   More help
+out = in1;
+end
+"""
+
+
+@pytest.fixture
+def tree(tmp_path):
+    (tmp_path / "src" / ".hidden").mkdir(parents=True)
+    (tmp_path / "src" / "Sample.m").write_text(CLASS)
+    (tmp_path / "src" / "func.m").write_text(FUNCTION)
+    (tmp_path / "src" / ".hidden" / "skipped.m").write_text(FUNCTION)
+    (tmp_path / "src" / "notes.txt").write_text("notes")
+    return tmp_path / "src"
+
+
+@pytest.fixture
+def index(tmp_path):
+    with MatlabIndex(tmp_path / "index.db") as index:
+        yield index
+
+
+def test_extract(parser, tree):
+    """Test that the classes, functions and properties of a file are extracted"""
+    structures = extract(parser.parse_file(tree / "Sample.m"))
+    assert structures["classes"] == [
+        {
+            "name": "Sample",
+            "line": 0,
+            "attributes": {"Sealed": "true", "Hidden": True},
+            "superclasses": ["handle", "matlab.mixin.Copyable"],
+            "help": "SAMPLE A sample class",
+        }
+    ]
+    assert structures["functions"] == [
+        {
+            "name": "compute",
+            "class": "Sample",
+            "line": 6,
+            "attributes": {"Static": True},
+            "inputs": ["x"],
+            "outputs": ["a", "b"],
+            "help": "COMPUTE Computes a and b",
+        }
+    ]
+    assert structures["properties"] == [
+        {
+            "name": "Name",
+            "class": "Sample",
+            "line": 3,
+            "attributes": {"SetAccess": "private", "Dependent": True},
+            "type": "string",
+            "comment": "the name",
+        }
+    ]
+    assert [comment["line"] for comment in structures["comments"]] == [1, 3, 7]
+
+
+def test_help(parser, tree):
+    """Test that the help text of a function is the block of comments after its declaration"""
+    (function,) = extract(parser.parse_file(tree / "func.m"))["functions"]
+    assert function["help"] == "FUNC Does things\n  More help"
+    assert function["inputs"] == ["in1", "varargin"] and function["outputs"] == ["out"]
+
+
+def test_update(index, tree):
+    """Test that only added and changed files are parsed, and removed files are removed"""
+    update = index.update(tree)
+    assert sorted(update.added) == [str(tree / "Sample.m"), str(tree / "func.m")]
+    assert index.files() == sorted(update.added)
+    assert index.update(tree) == ([], [], [], 2)
+
+    (tree / "func.m").write_text(FUNCTION.replace("func(", "renamed("))
+    stat = (tree / "func.m").stat()
+    os.utime(tree / "func.m", ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    (tree / "Sample.m").unlink()
+    (tree / "other.m").write_text(FUNCTION.replace("func(", "other("))
+    update = index.update(tree)
+    assert update == ([str(tree / "other.m")], [str(tree / "func.m")], [str(tree / "Sample.m")], 0)
+    assert [function["name"] for function in index.lookup("functions")] == ["renamed", "other"]
+    assert index.lookup("classes") == [] and index.lookup("properties") == []
+
+
+def test_lookup(index, tree):
+    """Test that the structures are looked up by column values"""
+    index.update(tree)
+    (function,) = index.lookup("functions", name="compute")
+    assert function["path"] == str(tree / "Sample.m") and function["class"] == "Sample"
+    assert len(index.lookup("comments", path=tree / "func.m")) == 2
+    with pytest.raises(ValueError):
+        index.lookup("functions", unknown=1)
@@ -0,0 +1,76 @@
+import shutil
+import subprocess
+
+import pytest
+from textmate_grammar.utils.cache import SimpleCache
+from textmate_grammar.utils.keys import ContentKeys, GitKeys, blob_id
+
+from ...unit import MSG_NO_MATCH
+
+pytestmark = pytest.mark.skipif(shutil.which("git") is None, reason="git is not installed")
+
+
+def git(repository, *args):
+    return subprocess.run(
+        ["git", "-c", "user.name=test", "-c", "user.email=test@example.com", *args],
+        cwd=repository,
+        capture_output=True,
+        check=True,
+        text=True,
+    ).stdout.strip()
+
+
+@pytest.fixture
+def repository(tmp_path):
+    git(tmp_path, "init", "-q")
+    (tmp_path / "clean.m").write_text("x = 1;\n")
+    (tmp_path / "changed.m").write_text("y = 2;\n")
+    git(tmp_path, "add", ".")
+    git(tmp_path, "commit", "-q", "-m", "initial")
+    (tmp_path / "changed.m").write_text("y = 3;\n")
+    (tmp_path / "untracked.m").write_text("z = 4;\n")
+    return tmp_path
+
+
+def test_blob_id(repository):
+    """Test that hashed keys are git blob IDs"""
+    for name in ["clean.m", "changed.m", "untracked.m"]:
+        path = repository / name
+        assert ContentKeys().key(path) == git(repository, "hash-object", name)
+        assert blob_id(path.read_bytes()) == git(repository, "hash-object", name)
+
+
+def test_git_keys(repository, monkeypatch):
+    """Test that the keys of unchanged files are read from the index, and other files are hashed"""
+    keys = GitKeys(repository)
+    assert len(keys) == 1
+
+    hashed = []
+    key = ContentKeys.key
+    monkeypatch.setattr(
+        ContentKeys, "key", lambda self, path: hashed.append(path.name) or key(self, path)
+    )
+    for name in ["clean.m", "changed.m", "untracked.m"]:
+        assert keys.key(repository / name) == git(repository, "hash-object", name)
+    assert hashed == ["changed.m", "untracked.m"]
+
+
+def test_git_keys_fallback(tmp_path):
+    """Test that all files are hashed outside of a git working tree"""
+    (tmp_path / "check.m").write_text("x = 1;\n")
+    keys = GitKeys(tmp_path)
+    assert len(keys) == 0
+    assert keys.key(tmp_path / "check.m") == blob_id(b"x = 1;\n")
+
+
+def test_content_keyed_cache(parser, repository):
+    """Test that files with the same content share the entry of a content keyed cache"""
+    (repository / "copy.m").write_text("x = 1;\n")
+    parser._cache = SimpleCache(GitKeys(repository))
+    element = parser.parse_file(repository / "clean.m")
+    assert parser._cache.cache_valid(repository / "copy.m")
+    assert parser.parse_file(repository / "copy.m") is element
+    assert not parser._cache.cache_valid(repository / "changed.m")
+    assert parser.parse_file(repository / "changed.m") == parser.parse_string(
+        "y = 3;\n"
+    ), MSG_NO_MATCH
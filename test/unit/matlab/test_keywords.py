@@ -0,0 +1,32 @@
+import pytest
+from textmate_grammar.parser import KeywordsParser
+from textmate_grammar.parsers.matlab import MatlabParser
+
+test_vector = [
+    "x = pi;",
+    "x = s.pi;",
+    "y = [Inf, -inf, NaN nat]",
+    "f(end) + nargin",
+    "z = piano + epsilon",
+    "a = true || false",
+    "b = {on, off}",
+    "c = é + pi",
+    "d = [pié, piè]",
+    "if x, pi, end",
+]
+
+
+@pytest.fixture(scope="module")
+def unmerged_parser():
+    return MatlabParser(merge_keywords=False)
+
+
+def test_merged(parser):
+    """Test that adjacent keyword rules are merged"""
+    assert any(isinstance(pattern, KeywordsParser) for pattern in parser._index.parsers)
+
+
+@pytest.mark.parametrize("check", test_vector)
+def test_keywords(parser, unmerged_parser, check):
+    """Test that merged keyword rules produce identical tokens"""
+    assert parser.parse_string(check).to_dict() == unmerged_parser.parse_string(check).to_dict()
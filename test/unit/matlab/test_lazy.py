@@ -0,0 +1,128 @@
+import pickle
+
+import pytest
+from textmate_grammar.elements import LazyBlockElement
+from textmate_grammar.parsers.matlab import MatlabParser
+
+from ...unit import MSG_NO_MATCH
+
+CLASS = """classdef (Sealed) Sample < handle
+    % SAMPLE the end of it
+    properties (Access = private)
+        Name = 'end' % end
+    end
+    methods
+        function obj = Sample(x)
+            arguments
+                x double = 1
+            end
+            if x > 1, obj.Name = x'; end
+            for i = 1:10
+                y = x(end) + "for end";
+            end
+            %{
+            if end
+            %}
+            switch lower(x)
+                case 1
+                    z = [1 2 ...
+                        3];
+            end
+        end
+        function r = other(obj)
+            r = obj.Name';
+        end
+    end
+end
+"""
+FUNCTIONS = """function helper(a)
+    while a < 1
+        a = a + 1; s.end = a;
+    end
+end
+function out = other(b)
+    out = {b, 'end'};
+end
+"""
+CHECKS = {
+    "class": CLASS,
+    "functions": FUNCTIONS,
+    "unterminated": "function f(a)\n    x = a;\n",
+    "unterminated_string": "function f()\nx = 'abc;\ny = \"q;\nend\n",
+    "command_syntax": "function f()\ndisp end\nend\n",
+}
+
+
+@pytest.fixture
+def lazy_parser():
+    return MatlabParser(lazy_blocks=["meta.function.matlab", "meta.if.matlab"])
+
+
+@pytest.mark.parametrize("check", CHECKS.values(), ids=CHECKS.keys())
+def test_lazy(parser, lazy_parser, check):
+    """Test that a lazily parsed element equals the fully parsed element"""
+    expected = parser.parse_string(check)
+    element = lazy_parser.parse_string(check)
+    assert element.to_dict(all_content=True) == expected.to_dict(all_content=True), MSG_NO_MATCH
+    assert element.flatten() == expected.flatten(), MSG_NO_MATCH
+    assert sorted(element.diagnostics, key=repr) == sorted(expected.diagnostics, key=repr)
+
+
+def test_contents_parsed_on_access(lazy_parser):
+    """Test that the contents of lazy blocks are parsed when their children are first accessed"""
+    element = lazy_parser.parse_string(FUNCTIONS)
+    functions = element.children
+    assert all(isinstance(function, LazyBlockElement) for function in functions)
+    assert not any(function.parsed for function in functions)
+    assert [child.token for child in functions[1].leading] == ["meta.function.declaration.matlab"]
+    assert not functions[1].parsed
+
+    assert [child.token for child in functions[0].children][-1] == "meta.while.matlab"
+    assert functions[0].parsed and not functions[1].parsed
+    assert functions[0].leading == functions[0].children[:1]
+
+
+def test_unterminated(lazy_parser):
+    """Test that a block of which the end is not located is parsed in full"""
+    element = lazy_parser.parse_string(CHECKS["unterminated"])
+    assert not isinstance(element.children[0], LazyBlockElement)
+
+
+def test_command_syntax(parser):
+    """Test that a block of which the grammar finds an end within a statement is parsed in full"""
+    check = "classdef (Abstract) C < handle\ndisp end\nend\n"
+    expected = parser.parse_string(check)
+    element = MatlabParser(lazy_blocks=["meta.class.matlab"]).parse_string(check)
+    assert not isinstance(element.children[0], LazyBlockElement)
+    assert element.children[-1].token == "variable.other.readwrite.matlab"
+    assert element.to_dict(all_content=True) == expected.to_dict(all_content=True), MSG_NO_MATCH
+    assert element.flatten() == expected.flatten(), MSG_NO_MATCH
+    assert sorted(element.diagnostics, key=repr) == sorted(expected.diagnostics, key=repr)
+
+
+def test_lazy_mismatch(parser, lazy_parser, monkeypatch):
+    """Test that a block that is parsed elsewhere than it was located is diagnosed"""
+    # The end of the while block is located as the end of the first function
+    monkeypatch.setattr(
+        MatlabParser,
+        "_skim_block",
+        lambda self, parser, handler, begin_span, *args: (3, 4)
+        if begin_span[0] == (0, 0)
+        else None,
+    )
+    element = lazy_parser.parse_string(FUNCTIONS)
+    assert not any(diagnostic.kind == "lazy_mismatch" for diagnostic in element.diagnostics)
+    function = element.children[0]
+    function.children
+    assert any(diagnostic.kind == "lazy_mismatch" for diagnostic in element.diagnostics)
+
+    # The element takes the content and end of the block as it is parsed in full
+    expected = parser.parse_string(FUNCTIONS).children[0]
+    assert function.to_dict(all_content=True) == expected.to_dict(all_content=True), MSG_NO_MATCH
+    assert pickle.loads(pickle.dumps(function)) == expected, MSG_NO_MATCH
+
+
+def test_pickle(parser, lazy_parser):
+    """Test that the contents of lazy blocks are parsed when pickled"""
+    element = pickle.loads(pickle.dumps(lazy_parser.parse_string(CLASS)))
+    assert element.flatten() == parser.parse_string(CLASS).flatten(), MSG_NO_MATCH
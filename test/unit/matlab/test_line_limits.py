@@ -0,0 +1,83 @@
+import time
+
+import pytest
+from textmate_grammar.parsers.matlab import MatlabParser
+
+from ...unit import MSG_NO_MATCH
+
+check = "x = [" + "1.5 " * 100 + "];\ny = 2;\n"
+
+
+def test_max_line_length():
+    """Test that a line longer than the maximum is a single plain token"""
+    parser = MatlabParser(max_line_length=100)
+    element = parser.parse_string(check)
+    assert element, MSG_NO_MATCH
+    assert [(diagnostic.kind, diagnostic.position) for diagnostic in element.diagnostics] == [
+        ("line_too_long", (0, 0))
+    ]
+
+    tokens = element.flatten()
+    assert tokens[0] == ((0, 0), check.split("\n")[0], ["source.matlab"])
+    assert tokens[1] == (
+        (1, 0),
+        "y",
+        [
+            "source.matlab",
+            "meta.assignment.variable.single.matlab",
+            "variable.other.readwrite.matlab",
+        ],
+    )
+
+
+def test_line_time_limit():
+    """Test that the tokenization of a line is aborted after the time limit"""
+    parser = MatlabParser(line_time_limit=0.0)
+    element = parser.parse_string(check)
+    assert element, MSG_NO_MATCH
+    assert {diagnostic.kind for diagnostic in element.diagnostics} == {"line_time_limit"}
+    assert {diagnostic.position[0] for diagnostic in element.diagnostics} == {0, 1}
+
+
+def test_no_limits(parser):
+    """Test that lines within the limits are tokenized as usual"""
+    limited = MatlabParser(max_line_length=1000, line_time_limit=60.0)
+    element = limited.parse_string(check)
+    assert element, MSG_NO_MATCH
+    assert element.diagnostics == []
+    assert element.flatten() == parser.parse_string(check).flatten()
+
+
+def test_line_time_limit_ordinary(parser):
+    """Test that ordinary lines are never skipped by a real time limit"""
+    check = (
+        "function f(x)\n"
+        + "    try\n        y = x' + [1 2 3];\n    catch err\n        disp('end');\n    end\n" * 200
+        + "end\n"
+    )
+    limited = MatlabParser(line_time_limit=0.05)
+    element = limited.parse_string(check)
+    expected = parser.parse_string(check)
+    assert element, MSG_NO_MATCH
+    assert "line_time_limit" not in {diagnostic.kind for diagnostic in element.diagnostics}
+    assert element.diagnostics == expected.diagnostics
+    assert element.flatten() == expected.flatten(), MSG_NO_MATCH
+
+
+@pytest.mark.parametrize("limits", [{"max_line_length": 1000}, {"line_time_limit": 0.01}])
+@pytest.mark.parametrize(
+    "generate",
+    [lambda size: "x = [" + "1.5 " * size + "];\n", lambda size: "x = " + "'a' + " * size + "1;\n"],
+    ids=["numbers", "strings"],
+)
+def test_long_line_bounded(limits, generate):
+    """Test that the limits bound the parse time of a long line, which takes seconds without"""
+    parser = MatlabParser(**limits)
+    started = time.perf_counter()
+    element = parser.parse_string(generate(4000))
+    assert time.perf_counter() - started < 0.5
+    assert element, MSG_NO_MATCH
+    assert {diagnostic.kind for diagnostic in element.diagnostics} & {
+        "line_too_long",
+        "line_time_limit",
+    }
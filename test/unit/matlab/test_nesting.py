@@ -0,0 +1,70 @@
+import pickle
+import sys
+
+from ...unit import MSG_NO_MATCH
+
+
+def nested(levels):
+    return "if a\n" * levels + "x = 1;\n" + "end\n" * levels
+
+
+def test_deep_nesting(parser):
+    """Test that the nesting depth of the input is not limited by the recursion limit"""
+    levels = 300
+    assert levels * 2 > sys.getrecursionlimit() // 2
+    element = parser.parse_string(nested(levels))
+    assert element, MSG_NO_MATCH
+
+    tokens = {starting: scopes for starting, _, scopes in element.flatten()}
+    assert tokens[(levels, 0)].count("meta.if.matlab") == levels
+    assert tokens[(2 * levels, 0)] == [
+        "source.matlab",
+        "meta.if.matlab",
+        "keyword.control.end.if.matlab",
+    ]
+
+
+def test_deep_to_dict(parser):
+    """Test that a deeply nested element is converted to a dictionary"""
+    levels = 300
+    element = parser.parse_string(nested(levels))
+    assert element, MSG_NO_MATCH
+
+    blocks = 0
+    pending = [element.to_dict()]
+    while pending:
+        converted = pending.pop()
+        blocks += converted["token"] == "meta.if.matlab"
+        pending.extend(converted.get("children", []))
+    assert blocks == levels
+    assert element.to_dict(depth=3) == parser.parse_string(nested(levels)).to_dict(depth=3)
+
+
+def test_deep_pickle(parser):
+    """Test that a deeply nested element is pickled, as by the cache"""
+    levels = 300
+    element = parser.parse_string(nested(levels))
+    assert element, MSG_NO_MATCH
+
+    loaded = pickle.loads(pickle.dumps(element))
+    assert loaded == element, MSG_NO_MATCH
+    assert loaded.flatten() == element.flatten()
+    assert loaded.diagnostics == element.diagnostics
+    child = loaded.children[0]
+    assert child.parent is loaded and child.children[0].parent is child
+
+    nested_element = element.children[0].children[0]
+    loaded = pickle.loads(pickle.dumps(nested_element))
+    assert loaded == nested_element, MSG_NO_MATCH
+    assert loaded.parent.parent.token == "source.matlab"
+
+
+def test_deep_find(parser):
+    """Test that the elements of a deeply nested element are found"""
+    levels = 1000
+    element = parser.parse_string(nested(levels))
+    assert element, MSG_NO_MATCH
+
+    found = element.findall("keyword.control.end.if.matlab")
+    assert len(found) == levels
+    assert max(len(stack) for _, stack in found) == levels + 1
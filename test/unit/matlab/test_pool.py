@@ -0,0 +1,49 @@
+import pickle
+
+import pytest
+from textmate_grammar.parsers.matlab import MatlabParser
+from textmate_grammar.utils.exceptions import IncompatibleFileType
+
+from ...unit import MSG_NO_MATCH
+
+
+@pytest.fixture
+def paths(tmp_path):
+    paths = []
+    for index in range(4):
+        path = tmp_path / f"check{index}.m"
+        path.write_text(f"x{index} = {index};\n" * (index + 1))
+        paths.append(path)
+    return paths
+
+
+def test_pickle():
+    """Test that a parser is pickled by its constructor arguments"""
+    parser = MatlabParser(remove_line_continuations=True, block_line_budget=10)
+    copy = pickle.loads(pickle.dumps(parser))
+    assert isinstance(copy, MatlabParser)
+    assert copy._rlc and copy.block_line_budget == 10
+
+
+@pytest.mark.parametrize("ordered", [True, False])
+def test_parse_files(parser, paths, ordered):
+    """Test that files parsed in worker processes equal the sequentially parsed files"""
+    expected = {path: MatlabParser().parse_file(path).flatten() for path in paths}
+    results = list(parser.parse_files(paths, workers=2, ordered=ordered))
+    assert all(element for _, element in results), MSG_NO_MATCH
+    assert {path: element.flatten() for path, element in results} == expected
+    if ordered:
+        assert [path for path, _ in results] == paths
+
+
+def test_parse_files_cached(parser, paths):
+    """Test that files parsed in worker processes are cached by the parser"""
+    results = dict(parser.parse_files(paths, workers=2))
+    assert all(parser._cache.cache_valid(path) for path in paths)
+    assert dict(parser.parse_files(paths, workers=2)) == results
+
+
+def test_parse_files_incompatible(parser, tmp_path):
+    """Test that files of another language are rejected before parsing"""
+    with pytest.raises(IncompatibleFileType):
+        parser.parse_files([tmp_path / "check.txt"], workers=2)
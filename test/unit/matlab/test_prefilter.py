@@ -0,0 +1,52 @@
+import onigurumacffi
+import pytest
+from textmate_grammar.utils.prefilter import first_chars
+
+test_vector = {
+    ",": ",",
+    "\\(": "(",
+    "true|false": "ft",
+    "(?<!\\.)\\b(on|off)\\b": "o",
+    "(?<=\\s)\\(": "(",
+    "[a-c][0-9]*": "abc",
+    "(?:x)?y": "xy",
+    "\\s*({)": "\t\n\x0b\x0c\r {",
+}
+
+
+@pytest.mark.parametrize("pattern,expected", test_vector.items())
+def test_first_chars(pattern, expected):
+    """Test derived first character sets"""
+    char_filter = first_chars(pattern)
+    assert char_filter is not None
+    assert char_filter.chars == frozenset(expected)
+
+
+@pytest.mark.parametrize("pattern", ["\\G\\[", "^", "(?=;)", "a*", "(?i)end", "\\1"])
+def test_no_filter(pattern):
+    """Test patterns for which every position must be tried"""
+    assert first_chars(pattern) is None
+
+
+def test_conservative(parser):
+    """Test that every match of the grammar patterns starts on an accepted character"""
+    lines = ["x = [1, 2];  % comment\n", "  end\n", "if a>=b, disp('é'); end\n", "\n"]
+    patterns = {
+        parser.exp_match._pattern
+        for parser in parser.repository.values()
+        if hasattr(parser, "exp_match")
+    } | {
+        parser.exp_begin._pattern
+        for parser in parser.repository.values()
+        if hasattr(parser, "exp_begin")
+    }
+    for pattern in patterns:
+        char_filter = first_chars(pattern)
+        if char_filter is None:
+            continue
+        compiled = onigurumacffi.compile(pattern)
+        for line in lines:
+            for start in range(len(line)):
+                matching = compiled.search(line, start=start)
+                if matching and matching.start() < len(line):
+                    assert char_filter.accepts(frozenset(line[matching.start()])), pattern
@@ -0,0 +1,61 @@
+import pytest
+
+from textmate_grammar.handler import ContentHandler
+from textmate_grammar.parsers.matlab import MatlabParser
+
+from ...unit import MSG_NO_MATCH
+
+check = """function y = f(x)
+    if x > 0
+        y = sqrt(x); % comment
+    else
+        y = 0;
+    end
+end
+"""
+
+
+@pytest.fixture(scope="module")
+def profiled_parser():
+    return MatlabParser(profile=True)
+
+
+def test_report(profiled_parser, monkeypatch):
+    """Test that the report accounts for all parse attempts and regex searches"""
+    searches = []
+    search = ContentHandler.search
+
+    def counted_search(self, *args, **kwargs):
+        searches.append(args)
+        return search(self, *args, **kwargs)
+
+    monkeypatch.setattr(ContentHandler, "search", counted_search)
+    element = profiled_parser.parse_string(check)
+    assert element, MSG_NO_MATCH
+
+    report = profiled_parser.profile_report
+    assert report is not None
+    assert sum(profile.searches for profile in report) == len(searches)
+    assert all(profile.matches <= profile.attempts for profile in report)
+    assert all(profile.self_time <= profile.cumulative_time + 1e-6 for profile in report)
+
+    rules = {profile.rule: profile for profile in report}
+    assert rules["BeginEndParser:meta.function.matlab"].matches == 1
+    assert rules["BeginEndParser:meta.if.matlab"].matches == 1
+
+
+def test_sorted(profiled_parser):
+    """Test sorting of the report by its counters"""
+    profiled_parser.parse_string(check)
+    report = profiled_parser.profile_report
+    attempts = [profile.attempts for profile in report.sorted("attempts")]
+    assert attempts == sorted(attempts, reverse=True)
+    assert len(report.format(limit=5).splitlines()) == 6
+    with pytest.raises(ValueError):
+        report.sorted("unknown")
+
+
+def test_disabled(parser):
+    """Test that no report is created without profiling"""
+    parser.parse_string(check)
+    assert parser.profile_report is None
@@ -0,0 +1,75 @@
+import pytest
+from textmate_grammar.handler import ContentHandler
+from textmate_grammar.parsers.matlab import MatlabParser
+
+from ...unit import MSG_NO_MATCH
+
+check = "function f\n" + "x = 1;\n" * 20
+
+
+@pytest.mark.parametrize("budget", [5, {"meta.function.matlab": 5}])
+def test_line_budget(budget):
+    """Test that a block without end is closed after its line budget"""
+    parser = MatlabParser(block_line_budget=budget)
+    element = parser.parse_string(check)
+    assert element, MSG_NO_MATCH
+    assert [(diagnostic.kind, diagnostic.position) for diagnostic in element.diagnostics] == [
+        ("recovered", (0, 0))
+    ]
+
+    tokens = {starting: scopes for starting, _, scopes in element.flatten()}
+    assert "meta.function.matlab" in tokens[(5, 0)]
+    assert "meta.function.matlab" not in tokens[(6, 0)]
+    assert tokens[(12, 0)] == [
+        "source.matlab",
+        "meta.assignment.variable.single.matlab",
+        "variable.other.readwrite.matlab",
+    ]
+
+
+def test_no_line_budget(parser):
+    """Test that a block without end continues up to its boundary by default"""
+    element = parser.parse_string(check)
+    assert element, MSG_NO_MATCH
+    assert element.diagnostics == []
+
+    tokens = {starting: scopes for starting, _, scopes in element.flatten()}
+    assert "meta.function.matlab" in tokens[(20, 0)]
+
+
+def test_unterminated_retries(parser, monkeypatch):
+    """Test that retried blocks without end are not scanned again"""
+    searches = []
+    search = ContentHandler.search
+
+    def counted_search(self, *args, **kwargs):
+        searches.append(args)
+        return search(self, *args, **kwargs)
+
+    monkeypatch.setattr(ContentHandler, "search", counted_search)
+    counts = []
+    for lines in [10, 20]:
+        searches.clear()
+        element = parser.parse_string("function f\n" + "x = 1; $ y = [\n" * lines)
+        assert element, MSG_NO_MATCH
+        counts.append(len(searches))
+    assert counts[1] < 2.5 * counts[0]
+
+
+def test_nested_line_budget():
+    """Test that nested blocks without end are closed within the line budget of the outer block"""
+    parser = MatlabParser(block_line_budget=5)
+    element = parser.parse_string("function f\n" + "x = 1; $ y = [\n" * 20)
+    assert element, MSG_NO_MATCH
+    assert [
+        (diagnostic.kind, diagnostic.position)
+        for diagnostic in element.diagnostics
+        if diagnostic.kind != "skipped"
+    ] == [("recovered", (0, 0)), ("recovered", (6, 13)), ("recovered", (12, 13))]
+
+    pending = list(element.children)
+    while pending:
+        child = pending.pop()
+        lines = {position[0] for position in child.characters}
+        assert max(lines) - min(lines) <= 6
+        pending.extend(child.children)
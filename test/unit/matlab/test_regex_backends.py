@@ -0,0 +1,87 @@
+from pathlib import Path
+
+import onigurumacffi
+import pytest
+
+from textmate_grammar.parsers.matlab import MatlabParser
+from textmate_grammar.utils.regex import PythonPattern, compile_pattern, translate
+
+REGRESSION = Path(__file__).parents[2] / "regression" / "matlab"
+
+test_lines = [
+    "x = [1, 2];  % comment\n",
+    "  end\n",
+    "if a>=b, disp('a''b'); end\n",
+    'str = "quoted ""text""" + s.field;\n',
+    "function [a, b] = f(varargin) %#ok\n",
+    "y = x.' * 1e-3i ... continuation\n",
+    "%{\n",
+    "\n",
+]
+
+
+def _spans(matching, groups):
+    # Oniguruma may report a stale empty span for groups that did not participate in the match,
+    # empty captures are skipped by the parser so these are equivalent to unmatched groups
+    spans = [matching.span(i) for i in groups]
+    return [span if i == 0 or span[0] != span[1] else (-1, -1) for i, span in enumerate(spans)]
+
+
+@pytest.mark.parametrize(
+    "pattern,expected",
+    [("^end", "(?:\\A|^(?!\\Z))end"), ("(?#comment)\\b[a-z]{2,}", "\\b[a-z]{2,}")],
+)
+def test_translate(pattern, expected):
+    """Test translation of oniguruma syntax to Python's re"""
+    assert translate(pattern) == expected
+
+
+@pytest.mark.parametrize(
+    "pattern", ["\\Gx", "(?x) a", "(?>a)", "\\h", "[a&&b]", "a\\Z", "a{2}?b", "a{1,2}+b"]
+)
+def test_oniguruma_only(pattern):
+    """Test that patterns with syntax outside of the whitelist use oniguruma"""
+    assert not isinstance(compile_pattern(pattern), PythonPattern)
+
+
+@pytest.mark.parametrize("pattern,line", [("a{2}?b", "b"), ("a{1,2}+b", "aaab")])
+def test_brace_modifiers(pattern, line):
+    """Test that modified brace quantifiers match as oniguruma does"""
+    expected = onigurumacffi.compile(pattern).search(line)
+    result = compile_pattern(pattern).search(line)
+    assert (result and result.span()) == (expected and expected.span())
+
+
+def test_report(parser):
+    """Test that the backend report covers patterns of both backends"""
+    backends = {decision.backend for decision in parser.backend_report()}
+    assert backends == {"python", "oniguruma"}
+    forced = MatlabParser(regex_backend="oniguruma").backend_report()
+    assert {decision.backend for decision in forced} == {"oniguruma"}
+
+
+def test_differential(parser):
+    """Test that patterns matched by Python's re give identical spans as oniguruma"""
+    lines = test_lines + [
+        line
+        for path in sorted(REGRESSION.glob("*.m"))
+        for line in path.read_text().splitlines(keepends=True)
+    ]
+    patterns = [d.pattern for d in parser.backend_report() if d.backend == "python"]
+    assert patterns
+    for pattern in patterns:
+        python_pattern = compile_pattern(pattern)
+        onig_pattern = onigurumacffi.compile(pattern)
+        groups = range(onig_pattern.number_of_captures() + 1)
+        for line in lines:
+            for start in range(len(line) + 1):
+                for method in ("search", "match"):
+                    expected = getattr(onig_pattern, method)(line, start=start)
+                    result = getattr(python_pattern, method)(line, start)
+                    assert (result is None) == (expected is None), (pattern, line, start)
+                    if expected is not None:
+                        assert _spans(result, groups) == _spans(expected, groups), (
+                            pattern,
+                            line,
+                            start,
+                        )
@@ -0,0 +1,32 @@
+import pytest
+from benchmarks.corpus import ADVERSARIAL
+from benchmarks.scaling import fit_exponent
+
+from ...unit import MSG_NO_MATCH
+
+
+@pytest.mark.parametrize("power", [1, 2])
+def test_fit_exponent(power):
+    """Test that the growth exponent of the parse time is recovered"""
+    sizes = [100, 200, 400, 800]
+    times = [1e-6 * size**power for size in sizes]
+    assert fit_exponent(sizes, times) == pytest.approx(power)
+
+
+@pytest.mark.parametrize("name", list(ADVERSARIAL["matlab"]))
+def test_adversarial(parser, name):
+    """Test that the adversarial inputs are parsed"""
+    element = parser.parse_string(ADVERSARIAL["matlab"][name](20))
+    assert element, MSG_NO_MATCH
+
+
+def test_blank_lines(parser):
+    """Test that the statements between blank lines are parsed"""
+    element = parser.parse_string("a = 1;\n\n\n\nb = 2;\n\n")
+    assert element, MSG_NO_MATCH
+    tokens = {starting: scopes for starting, _, scopes in element.flatten()}
+    assert tokens[(4, 0)] == [
+        "source.matlab",
+        "meta.assignment.variable.single.matlab",
+        "variable.other.readwrite.matlab",
+    ]
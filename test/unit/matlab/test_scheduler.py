@@ -0,0 +1,140 @@
+import gc
+import threading
+import weakref
+from concurrent.futures import CancelledError
+
+import pytest
+from textmate_grammar.utils.scheduler import Priority, Scheduler
+
+from ...unit import MSG_NO_MATCH
+
+
+@pytest.fixture
+def scheduler(parser):
+    scheduler = Scheduler(parser)
+    yield scheduler
+    scheduler.shutdown()
+
+
+def block(scheduler, priority=Priority.VISIBLE):
+    """Occupies the worker of the scheduler until the returned event is set."""
+    release, started = threading.Event(), threading.Event()
+
+    def blocking(cancel):
+        started.set()
+        release.wait()
+
+    scheduler.submit(blocking, priority=priority, client="block")
+    started.wait()
+    return release
+
+
+def recorder(order, name):
+    def record(cancel):
+        order.append(name)
+        return name
+
+    return record
+
+
+def test_parse_string(parser, scheduler):
+    """Test that a scheduled parse reports its queue time separately from its parse time"""
+    job = scheduler.parse_string("x = 'one';")
+    assert job.result() == parser.parse_string("x = 'one';"), MSG_NO_MATCH
+    assert job.parse_time > 0 and job.queue_time >= 0
+    assert scheduler.stats()["normal"]["finished"] == 1
+
+
+def test_stats(scheduler):
+    """Test that the stats aggregate the queue and parse times of the finished jobs"""
+    jobs = [scheduler.parse_string(f"x = {index};") for index in range(3)]
+    [job.result() for job in jobs]
+    stats = scheduler.stats()["normal"]
+    assert stats["pending"] == 0 and stats["finished"] == 3
+    queue_times = [job.queue_time for job in jobs]
+    parse_times = [job.parse_time for job in jobs]
+    assert stats["queue_time_mean"] == pytest.approx(sum(queue_times) / 3)
+    assert stats["queue_time_max"] == max(queue_times)
+    assert stats["parse_time_mean"] == pytest.approx(sum(parse_times) / 3)
+    assert stats["parse_time_max"] == max(parse_times)
+    assert scheduler.stats()["background"]["finished"] == 0
+    assert scheduler.stats()["background"]["parse_time_mean"] is None
+
+
+def test_priority(scheduler):
+    """Test that jobs of a higher priority class are run first"""
+    order = []
+    release = block(scheduler)
+    jobs = [
+        scheduler.submit(recorder(order, "background"), priority=Priority.BACKGROUND),
+        scheduler.submit(recorder(order, "normal"), priority=Priority.NORMAL),
+        scheduler.submit(recorder(order, "visible"), priority=Priority.VISIBLE),
+    ]
+    release.set()
+    [job.result() for job in jobs]
+    assert order == ["visible", "normal", "background"]
+
+
+def test_fair_share(scheduler):
+    """Test that the clients of a priority class are served in turn"""
+    order = []
+    release = block(scheduler)
+    jobs = [scheduler.submit(recorder(order, f"a{index}"), client="a") for index in range(3)]
+    jobs.append(scheduler.submit(recorder(order, "b0"), client="b"))
+    release.set()
+    [job.result() for job in jobs]
+    assert order == ["a0", "b0", "a1", "a2"]
+
+
+def test_superseded(scheduler):
+    """Test that a job for a document cancels the unfinished job of the client for that document"""
+    order = []
+    release = block(scheduler)
+    first = scheduler.submit(recorder(order, "first"), client="a", document="check.m")
+    other = scheduler.submit(recorder(order, "other"), client="b", document="check.m")
+    second = scheduler.submit(recorder(order, "second"), client="a", document="check.m")
+    release.set()
+    assert second.result() == "second" and other.result() == "other"
+    with pytest.raises(CancelledError):
+        first.result()
+    assert order == ["other", "second"]
+
+
+def test_superseded_running(scheduler):
+    """Test that a superseded job is cancelled while it is parsed"""
+    started = threading.Event()
+    first = scheduler.parse_string(
+        "x = 1;\n" * 5000, document="check.m", progress=lambda *_: started.set()
+    )
+    started.wait()
+    second = scheduler.parse_string("x = 2;", document="check.m")
+    assert second.result() is not None, MSG_NO_MATCH
+    with pytest.raises(CancelledError):
+        first.result()
+
+
+def test_preempted(parser, scheduler):
+    """Test that a running job of a lower priority class is preempted and scheduled again"""
+    started = threading.Event()
+    background = scheduler.parse_string(
+        "x = 1;\n" * 5000, priority=Priority.BACKGROUND, progress=lambda *_: started.set()
+    )
+    started.wait()
+    visible = scheduler.parse_string("x = 2;", priority=Priority.VISIBLE)
+    assert visible.result() == parser.parse_string("x = 2;"), MSG_NO_MATCH
+    assert background.result() is not None, MSG_NO_MATCH
+    assert background.preemptions == 1
+    assert visible.finished < background.finished
+    assert scheduler.stats()["background"]["preemptions"] == 1
+
+
+def test_finished_not_kept(scheduler):
+    """Test that the scheduler does not keep the finished jobs and their results"""
+    job = scheduler.parse_string("x = 'one';")
+    element = job.result()
+    reference = weakref.ref(element)
+    assert job.args == ()
+    scheduler.submit(lambda cancel: None).result()
+    del job, element
+    gc.collect()
+    assert reference() is None
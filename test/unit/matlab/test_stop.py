@@ -0,0 +1,77 @@
+import pytest
+from textmate_grammar.parsers.matlab import MatlabParser
+from textmate_grammar.utils.cache import SimpleCache
+
+from ...unit import MSG_NO_MATCH
+
+HEADER = "function out = f(x)\n% F Computes things\n%   More help\n"
+SOURCE = HEADER + "out = x;\n" + "if x > 1\n    y = 'text';\nend\n" * 20 + "end\n"
+
+
+def test_line_limit(parser):
+    """Test that the parse stops at a line, closing the open blocks"""
+    element = parser.parse_string(SOURCE, stop_when=3)
+    assert element.content == HEADER[:-1]
+    (function,) = element.children
+    assert [child.token for child in function.children] == [
+        "meta.function.declaration.matlab",
+        "comment.line.percentage.matlab",
+        "comment.line.percentage.matlab",
+    ]
+    assert function.end == []
+    assert element.flatten() == parser.parse_string(SOURCE).flatten()[: len(element.flatten())]
+
+
+@pytest.mark.parametrize(
+    "stop_when", [["meta.function.declaration.matlab"], "meta.function.declaration.matlab"]
+)
+def test_scope_names(parser, stop_when):
+    """Test that the parse stops at the end of the first element with one of the scope names"""
+    element = parser.parse_string(SOURCE, stop_when=stop_when)
+    assert element.content == "function out = f(x)"
+    assert [child.token for child in element.children[0].children] == [
+        "meta.function.declaration.matlab"
+    ]
+
+
+def test_predicate(parser):
+    """Test that the parse stops after the first top-level element that meets the predicate"""
+    source = "x = 1;\ny = 2;\nz = 3;\n"
+    element = parser.parse_string(source, stop_when=lambda element: "y" in element.content)
+    assert element.content == "x = 1;\ny"
+    assert [child.content for child in element.children][-1] == "y"
+
+
+def test_partial_not_cached(parser, tmp_path):
+    """Test that a partial element tree is not cached"""
+    parser._cache = SimpleCache()
+    path = tmp_path / "check.m"
+    path.write_text(SOURCE)
+    assert parser.parse_file(path, stop_when=3).content == HEADER[:-1]
+    assert not parser._cache.cache_valid(path)
+    element = parser.parse_file(path)
+    assert parser.parse_file(path, stop_when=3) is element, MSG_NO_MATCH
+
+
+@pytest.mark.parametrize("stop_when", [3, ["meta.function.declaration.matlab"]])
+def test_lazy_blocks(parser, stop_when):
+    """Test that the contents of lazy blocks are parsed up to the stop condition"""
+    lazy = MatlabParser(lazy_blocks=["meta.function.matlab"])
+    element = lazy.parse_string(SOURCE, stop_when=stop_when)
+    expected = parser.parse_string(SOURCE, stop_when=stop_when)
+    assert element.content == expected.content
+    assert element.flatten() == expected.flatten(), MSG_NO_MATCH
+
+
+def test_discarded_attempts(parser):
+    """Test that elements of discarded parse attempts do not stop the parse"""
+    # The continuation is first tried as an accessor, which is discarded
+    source = "classdef C < handle & other ...\n        & more\nend\nx = s.y;\nz = 1;\n"
+    element = parser.parse_string(source, stop_when=["punctuation.accessor.dot.matlab"])
+    assert element.content == source[: source.index(";")]
+
+
+def test_bool(parser):
+    """Test that a bool is not accepted as a number of lines"""
+    with pytest.raises(ValueError):
+        parser.parse_string(SOURCE, stop_when=True)
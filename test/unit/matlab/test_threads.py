@@ -0,0 +1,88 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from textmate_grammar.parsers.base import _gen_parsers
+from textmate_grammar.parsers.matlab import MatlabParser
+from textmate_grammar.utils.tracer import Tracer
+
+from ...unit import MSG_NO_MATCH
+
+checks = [
+    f"function y = f{index}(x)\n    if x > {index}\n        y = 'text';\n    end\nend\n" * 5
+    for index in range(16)
+]
+
+
+def test_shared_parser(parser):
+    """Test that a parser shared by several threads gives the same results as sequential parses"""
+    expected = [parser.parse_string(check).flatten() for check in checks]
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        elements = list(executor.map(parser.parse_string, checks))
+    assert all(elements), MSG_NO_MATCH
+    assert [element.flatten() for element in elements] == expected
+
+
+def test_initialized():
+    """Test that all grammar rules are initialized by the construction, before any parse"""
+    fresh = MatlabParser()
+    assert all(rule.initialized for rule in _gen_parsers(fresh))
+
+
+def counts(report):
+    return {(rule.rule, rule.attempts, rule.matches) for rule in report}
+
+
+def test_shared_profiler():
+    """Test that each thread of a shared parser sees the profiling report of its own parse"""
+    parser = MatlabParser(profile=True)
+    expected = []
+    for index in range(4):
+        parser.parse_string(checks[index] * (index + 1))
+        expected.append(counts(parser.profile_report))
+    barrier = threading.Barrier(4)
+
+    def parse(index):
+        barrier.wait()
+        parser.parse_string(checks[index] * (index + 1))
+        # All parses are done before any thread reads its report
+        barrier.wait()
+        return counts(parser.profile_report)
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        reports = list(executor.map(parse, range(4)))
+    assert reports == expected
+
+
+def test_shared_cache(parser, tmp_path):
+    """Test that files parsed in several threads are cached"""
+    paths = []
+    for index, check in enumerate(checks):
+        path = tmp_path / f"check{index}.m"
+        path.write_text(check)
+        paths.append(path)
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        elements = list(executor.map(parser.parse_file, paths))
+    assert all(elements), MSG_NO_MATCH
+    assert all(parser._cache.cache_valid(path) for path in paths)
+    assert [parser.parse_file(path) for path in paths] == elements
+
+
+def test_shared_tracer():
+    """Test that a tracer shared by several threads records each parse on its own track"""
+    tracer = Tracer()
+    parser = MatlabParser(tracer=tracer)
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        elements = list(executor.map(parser.parse_string, checks))
+    assert all(elements), MSG_NO_MATCH
+
+    events = tracer.to_dict()["traceEvents"]
+    tracks = {event["tid"] for event in events if event["ph"] == "X"}
+    assert tracks == set(range(1, len(checks) + 1))
+    # The outermost attempt of each track is the parse of the whole input
+    for track in tracks:
+        outermost = [
+            event
+            for event in events
+            if event["ph"] == "X" and event["tid"] == track and event["args"]["depth"] == 0
+        ]
+        assert len(outermost) == 1
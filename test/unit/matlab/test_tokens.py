@@ -0,0 +1,50 @@
+import pickle
+
+import pytest
+from textmate_grammar.utils.tokens import TokenArray
+
+from ...unit import MSG_NO_MATCH
+
+CHECK = """function y = check(x)
+    % Comment
+    if x > 1
+        y = {'a', "b"};
+    end
+end
+"""
+
+
+@pytest.mark.parametrize("protocol", [4, 5])
+def test_round_trip(parser, protocol):
+    """Test that a pickled token array rebuilds the parsed element tree"""
+    element = parser.parse_string(CHECK)
+    tokens = pickle.loads(
+        pickle.dumps(TokenArray.from_element(element, parser._grammar_table), protocol)
+    )
+    rebuilt = tokens.to_element(parser._grammar_table)
+    assert rebuilt == element, MSG_NO_MATCH
+    assert rebuilt.to_dict(all_content=True) == element.to_dict(all_content=True), MSG_NO_MATCH
+    assert rebuilt.flatten() == element.flatten(), MSG_NO_MATCH
+    assert rebuilt.diagnostics == element.diagnostics
+
+
+def test_out_of_band(parser):
+    """Test that the elements of a token array are pickled as a single out-of-band buffer"""
+    tokens = TokenArray.from_element(parser.parse_string(CHECK), parser._grammar_table)
+    buffers: list[pickle.PickleBuffer] = []
+    data = pickle.dumps(tokens, protocol=5, buffer_callback=buffers.append)
+    assert len(buffers) == 1 and buffers[0].raw().nbytes == tokens.nodes.nbytes
+    assert pickle.loads(data, buffers=buffers).nodes.obj is buffers[0].raw().obj
+
+
+def test_lazy(parser):
+    """Test that the nested elements of a token array are rebuilt when first accessed"""
+    element = parser.parse_string(CHECK)
+    rebuilt = TokenArray.from_element(element, parser._grammar_table).to_element(
+        parser._grammar_table
+    )
+    assert not rebuilt._dispatched
+    assert [child.token for child in rebuilt.children] == [
+        child.token for child in element.children
+    ]
+    assert all(not child._dispatched for child in rebuilt.children)
@@ -0,0 +1,54 @@
+import json
+
+from textmate_grammar.parsers.matlab import MatlabParser
+from textmate_grammar.utils.tracer import Tracer
+
+from ...unit import MSG_NO_MATCH
+
+check = """function y = f(x)
+    if x > 0
+        y = sqrt(x); % comment
+    else
+        y = 0;
+    end
+end
+"""
+
+
+def test_trace(tmp_path):
+    """Test that the trace contains nested complete events of the parse"""
+    tracer = Tracer()
+    element = MatlabParser(tracer=tracer).parse_string(check)
+    assert element, MSG_NO_MATCH
+
+    path = tmp_path / "trace.json"
+    tracer.save(path)
+    events = [event for event in json.loads(path.read_text())["traceEvents"] if event["ph"] == "X"]
+    assert len(events) == tracer.recorded
+
+    # Captures are dispatched after the parse of the language rule
+    (root,) = [event for event in events if event["name"] == "MatlabParser:MATLAB"]
+    assert root["args"]["depth"] == 0
+    nested = [event for event in events if event["ts"] < root["ts"] + root["dur"]]
+    assert any(event["name"] == "BeginEndParser:meta.if.matlab" for event in nested)
+    for event in nested:
+        assert root["ts"] <= event["ts"]
+        assert event["ts"] + event["dur"] <= root["ts"] + root["dur"] + 1e-3
+
+
+def test_ring_buffer():
+    """Test that the ring buffer keeps the latest events"""
+    tracer, full_tracer = Tracer(buffer_size=10), Tracer()
+    MatlabParser(tracer=tracer).parse_string(check)
+    MatlabParser(tracer=full_tracer).parse_string(check)
+    assert len(tracer.events) == 10
+    assert tracer.dropped == full_tracer.recorded - 10
+    assert [event[0] for event in tracer.events] == [event[0] for event in full_tracer.events][-10:]
+
+
+def test_sampling():
+    """Test that only attempts on sampled lines are recorded"""
+    tracer = Tracer(sample_lines=3)
+    MatlabParser(tracer=tracer).parse_string(check)
+    assert tracer.recorded
+    assert all(starting[0] % 3 == 0 for _, _, _, _, starting, _, _ in tracer.events)